@@ -0,0 +1,112 @@
+"""
+Synthetic corpora generators used by benchmarks. Every generator takes number of lines and random seed,
+and returns pair of line lists (a, b) modelling a realistic diff case.
+"""
+import random
+from typing import List, Tuple, Callable, Dict
+
+Corpus = Tuple[List[str], List[str]]
+
+WORDS = ('self', 'return', 'value', 'item', 'index', 'result', 'config', 'data', 'for', 'in', 'if', 'else',
+         'name', 'path', 'line', 'opcode', 'print', 'append', 'None', 'True', 'False', 'import', 'from', 'class')
+
+
+def random_line(rnd: random.Random, min_words: int = 2, max_words: int = 10) -> str:
+    indent = ' ' * 4 * rnd.randint(0, 3)
+    return indent + ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(min_words, max_words))) \
+        + f' {rnd.randint(0, 10 ** 6)}'
+
+
+def random_lines(n: int, rnd: random.Random) -> List[str]:
+    return [random_line(rnd) for _ in range(n)]
+
+
+def sparse_edits(n: int, seed: int = 0) -> Corpus:
+    """Few changed, inserted and deleted lines (about 1% of lines) scattered over the file."""
+    rnd = random.Random(seed)
+    a = random_lines(n, rnd)
+    b = a[:]
+    for _ in range(max(n // 100, 1)):
+        pos = rnd.randrange(len(b))
+        op = rnd.randint(0, 2)
+        if op == 0:
+            b[pos] = b[pos] + ' changed'
+        elif op == 1:
+            b.insert(pos, random_line(rnd))
+        else:
+            del b[pos]
+    return a, b
+
+
+def block_moves(n: int, seed: int = 0) -> Corpus:
+    """Blocks of lines moved to another positions."""
+    rnd = random.Random(seed)
+    a = random_lines(n, rnd)
+    b = a[:]
+    for _ in range(max(n // 200, 1)):
+        size = rnd.randint(1, 20)
+        start = rnd.randrange(max(len(b) - size, 1))
+        block = b[start:start + size]
+        del b[start:start + size]
+        target = rnd.randrange(len(b) + 1)
+        b[target:target] = block
+    return a, b
+
+
+def duplicate_heavy(n: int, seed: int = 0) -> Corpus:
+    """Source code like files with many duplicated lines (blank lines, braces) and sparse edits."""
+    rnd = random.Random(seed)
+    common = ('', '{', '}', '    }', '        }', '    return;', 'else', '')
+    a = [rnd.choice(common) if rnd.random() < 0.6 else random_line(rnd) for _ in range(n)]
+    b = a[:]
+    for _ in range(max(n // 50, 1)):
+        pos = rnd.randrange(len(b))
+        if rnd.random() < 0.5:
+            b.insert(pos, rnd.choice(common))
+        else:
+            del b[pos]
+    return a, b
+
+
+def full_shuffle(n: int, seed: int = 0) -> Corpus:
+    """The same lines in completely different order."""
+    rnd = random.Random(seed)
+    a = random_lines(n, rnd)
+    b = a[:]
+    rnd.shuffle(b)
+    return a, b
+
+
+def long_single_lines(n: int, seed: int = 0) -> Corpus:
+    """Small number of very long lines with small in-line changes ("n" is total number of words)."""
+    rnd = random.Random(seed)
+    lines_number = 4
+    words = n // lines_number
+    a = [' '.join(rnd.choice(WORDS) for _ in range(words)) for _ in range(lines_number)]
+    b = []
+    for line in a:
+        line_words = line.split(' ')
+        for _ in range(max(words // 100, 1)):
+            line_words[rnd.randrange(len(line_words))] = rnd.choice(WORDS)
+        b.append(' '.join(line_words))
+    return a, b
+
+
+def large_replace_block(n: int, seed: int = 0) -> Corpus:
+    """Large block of lines replaced with similar lines (every line slightly changed)."""
+    rnd = random.Random(seed)
+    a = random_lines(n, rnd)
+    block_start = n // 4
+    block_stop = block_start + max(n // 10, 1)
+    b = a[:block_start] + [line + ' changed' for line in a[block_start:block_stop]] + a[block_stop:]
+    return a, b
+
+
+corpora: Dict[str, Callable[[int, int], Corpus]] = {
+    'sparse_edits': sparse_edits,
+    'block_moves': block_moves,
+    'duplicate_heavy': duplicate_heavy,
+    'full_shuffle': full_shuffle,
+    'long_single_lines': long_single_lines,
+    'large_replace_block': large_replace_block,
+}
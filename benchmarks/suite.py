@@ -0,0 +1,268 @@
+"""
+Benchmark suite measuring execution time and peak memory of sequence matchers and text diff
+for synthetic corpora at several input sizes. It fits scaling exponents (t ~ n^k) and compares results
+with stored baseline to detect performance regressions. Times are compared relative to the time of a fixed
+reference workload measured in the same run, so baseline recorded on another machine can be used.
+
+Usage:
+    python -m benchmarks                        # run and compare with benchmarks/baseline.json
+    python -m benchmarks --update-baseline      # run and store results as a new baseline
+    python -m benchmarks --sizes 4000 8000 --corpus sparse_edits --target heckel
+"""
+import argparse
+import gc
+import json
+import math
+import statistics
+import sys
+import time
+import tracemalloc
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Optional, Tuple
+
+from benchmarks.corpora import corpora
+from mdiff import HeckelSequenceMatcher, DisplacementSequenceMatcher, diff_lines_with_similarities
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+DEFAULT_SIZES = (4000, 8000, 16000, 32000)
+DEFAULT_REPEAT = 5
+# times shorter than MIN_SECONDS are dominated by timer and scheduler noise, they aren't used by time checks
+MIN_SECONDS = 0.05
+
+Target = Callable[[List[str], List[str]], None]
+
+
+def run_heckel(a: List[str], b: List[str]):
+    HeckelSequenceMatcher(a, b).get_opcodes()
+
+
+def run_displacement(a: List[str], b: List[str]):
+    DisplacementSequenceMatcher(a, b).get_opcodes()
+
+
+def run_difflib(a: List[str], b: List[str]):
+    SequenceMatcher(None, a, b).get_opcodes()
+
+
+def run_diff_lines_with_similarities(a: List[str], b: List[str]):
+    diff_lines_with_similarities('\n'.join(a), '\n'.join(b), cutoff=0.75)
+
+
+targets: Dict[str, Target] = {
+    'heckel': run_heckel,
+    'displacement': run_displacement,
+    'difflib': run_difflib,
+    'diff_lines_with_similarities': run_diff_lines_with_similarities,
+}
+# targets measured for comparison only, their results are not checked for regressions
+UNGATED_TARGETS = frozenset({'difflib'})
+LINE_TARGETS = frozenset({'heckel', 'displacement', 'difflib'})
+# corpora which measure only in-line diff (they have a few lines), so they aren't run for line level targets
+INLINE_CORPORA = frozenset({'long_single_lines'})
+# benchmarks of quadratic in-line diff of all lines are run for sizes divided by divisor
+SIZE_DIVISORS: Dict[Tuple[str, str], int] = {
+    ('long_single_lines', 'diff_lines_with_similarities'): 16,
+    ('large_replace_block', 'diff_lines_with_similarities'): 16,
+}
+
+
+def run_time(target: Callable[..., None], *args) -> float:
+    """Returns execution time of a single run, garbage collector is disabled during the run (like in timeit)."""
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        target(*args)
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def reference_workload(n: int = 200000):
+    """Fixed pure Python workload (hashing, dict and list operations) measuring speed of interpreter."""
+    symbols = {}
+    ids = [symbols.setdefault(f'line {i % 5000}', len(symbols)) for i in range(n)]
+    ids.sort()
+
+
+def measure_times(target: Target, inputs: Sequence[Tuple[List[str], List[str]]], repeat: int = DEFAULT_REPEAT) \
+        -> Tuple[List[float], float]:
+    """
+    Returns median execution times of target for every input and the median time of reference workload.
+    Runs are interleaved (every round runs reference workload and target for every input once),
+    so changes of machine speed during measurement affect all sizes and reference alike.
+    """
+    rounds = [[run_time(reference_workload)] + [run_time(target, a, b) for a, b in inputs] for _ in range(repeat)]
+    medians = [statistics.median(values) for values in zip(*rounds)]
+    return medians[1:], medians[0]
+
+
+def measure_peak_memory(target: Target, a: List[str], b: List[str]) -> int:
+    """Returns peak memory (in bytes) allocated during target run."""
+    tracemalloc.start()
+    try:
+        target(a, b)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def scaling_exponent(sizes: Sequence[int], values: Sequence[float]) -> float:
+    """
+    Fits values ~ c * size^k with least squares method in log-log scale and returns k.
+
+    >>> round(scaling_exponent([1, 2, 4, 8], [3, 12, 48, 192]), 6)
+    2.0
+    """
+    xs = [math.log(i) for i in sizes]
+    ys = [math.log(max(i, 1e-9)) for i in values]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    denominator = sum((x - x_mean) ** 2 for x in xs)
+    if not denominator:
+        return 0.0
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / denominator
+
+
+def time_exponent(sizes: Sequence[int], seconds: Sequence[float]) -> Optional[float]:
+    """Returns scaling exponent of times not shorter than MIN_SECONDS (None if there are less than 2 of them)."""
+    points = [(size, value) for size, value in zip(sizes, seconds) if value >= MIN_SECONDS]
+    if len(points) < 2:
+        return None
+    return scaling_exponent(*zip(*points))
+
+
+def run_benchmark(corpus: str, target: str, sizes: Sequence[int], repeat: int = DEFAULT_REPEAT,
+                  seed: int = 0) -> dict:
+    inputs = [corpora[corpus](size, seed) for size in sizes]
+    seconds, reference = measure_times(targets[target], inputs, repeat)
+    peak_kib = [measure_peak_memory(targets[target], a, b) / 1024 for a, b in inputs]
+    return {
+        'sizes': list(sizes),
+        'seconds': seconds,
+        'reference_seconds': reference,
+        'relative_time': [i / reference for i in seconds],
+        'peak_kib': peak_kib,
+        'time_exponent': time_exponent(sizes, seconds),
+        'memory_exponent': scaling_exponent(sizes, peak_kib),
+    }
+
+
+def benchmark_sizes(corpus: str, target: str, sizes: Sequence[int]) -> Optional[List[int]]:
+    """Returns input sizes of benchmark, or None if target isn't run for corpus."""
+    if corpus in INLINE_CORPORA and target in LINE_TARGETS:
+        return None
+    divisor = SIZE_DIVISORS.get((corpus, target), 1)
+    return [max(size // divisor, 1) for size in sizes]
+
+
+def run_suite(corpus_names: Sequence[str], target_names: Sequence[str], sizes: Sequence[int],
+              repeat: int = DEFAULT_REPEAT, report: Callable[[str, dict], None] = None) -> Dict[str, dict]:
+    results = {}
+    for corpus in corpus_names:
+        for target in target_names:
+            target_sizes = benchmark_sizes(corpus, target, sizes)
+            if target_sizes is None:
+                continue
+            key = f'{corpus}/{target}'
+            results[key] = run_benchmark(corpus, target, target_sizes, repeat)
+            if report:
+                report(key, results[key])
+    return results
+
+
+def find_regressions(results: Dict[str, dict], baseline: Dict[str, dict], exponent_tolerance: float = 0.3,
+                     time_tolerance: Optional[float] = 3.0, memory_tolerance: Optional[float] = 1.5) -> List[str]:
+    """
+    Compares results with baseline and returns list of detected regressions descriptions.
+    Regression is detected when scaling exponent grows over exponent_tolerance, or when time relative to
+    the reference workload (memory) at the largest common input size grows more than time_tolerance
+    (memory_tolerance) times. None tolerance disables the check. Times shorter than MIN_SECONDS are not compared
+    (time exponent is fitted only to longer times), and results of UNGATED_TARGETS are not compared at all.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or key.split('/')[-1] in UNGATED_TARGETS:
+            continue
+        for metric in ('time_exponent', 'memory_exponent'):
+            if result.get(metric) is None or base.get(metric) is None:
+                continue
+            if result[metric] > base[metric] + exponent_tolerance:
+                regressions.append(f'{key}: {metric} {base[metric]:.2f} -> {result[metric]:.2f}')
+
+        common_sizes = set(result['sizes']) & set(base['sizes'])
+        if not common_sizes:
+            continue
+        size = max(common_sizes)
+        i = result['sizes'].index(size)
+        base_i = base['sizes'].index(size)
+        fast = result['seconds'][i] < MIN_SECONDS and base['seconds'][base_i] < MIN_SECONDS
+        for metric, tolerance in (('relative_time', time_tolerance), ('peak_kib', memory_tolerance)):
+            if tolerance is None or metric not in base or (metric == 'relative_time' and fast):
+                continue
+            value = result[metric][i]
+            base_value = base[metric][base_i]
+            if value > base_value * tolerance:
+                regressions.append(f'{key}: {metric} at n={size} {base_value:.4g} -> {value:.4g}')
+    return regressions
+
+
+def print_result(key: str, result: dict):
+    seconds = ' '.join(f'{i:9.4f}' for i in result['seconds'])
+    exponent = '   -' if result['time_exponent'] is None else f'{result["time_exponent"]:.2f}'
+    print(f'{key:50} t~n^{exponent}  mem~n^{result["memory_exponent"]:.2f}  [{seconds}] s', flush=True)
+
+
+def load_baseline(path: Path) -> Dict[str, dict]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, dict]):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv: Sequence[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='mdiff benchmark suite.')
+    parser.add_argument('--corpus', nargs='+', choices=sorted(corpora), default=sorted(corpora))
+    parser.add_argument('--target', nargs='+', choices=sorted(targets), default=sorted(targets))
+    parser.add_argument('--sizes', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Number of runs of every benchmark, median time is used.')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='Store results as a new baseline.')
+    parser.add_argument('--exponent-tolerance', type=float, default=0.3)
+    parser.add_argument('--time-tolerance', type=float, default=3.0,
+                        help='Allowed slowdown factor of time relative to reference workload at the largest size '
+                             '(0 disables the check).')
+    parser.add_argument('--memory-tolerance', type=float, default=1.5,
+                        help='Allowed peak memory growth factor at the largest size (0 disables the check).')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.corpus, args.target, args.sizes, args.repeat, report=print_result)
+
+    if args.update_baseline:
+        baseline = load_baseline(args.baseline) if args.baseline.exists() else {}
+        baseline.update(results)
+        save_baseline(args.baseline, baseline)
+        print(f'Baseline saved: {args.baseline}')
+        return 0
+
+    if not args.baseline.exists():
+        print(f'Baseline not found: {args.baseline}')
+        return 0
+
+    regressions = find_regressions(results, load_baseline(args.baseline), args.exponent_tolerance,
+                                   args.time_tolerance or None, args.memory_tolerance or None)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,15 @@
 from mdiff.seqmatch.heckel import HeckelSequenceMatcher, DisplacementSequenceMatcher
-from mdiff.text_diff import diff_lines_with_similarities
+from mdiff.seqmatch.myers import MyersSequenceMatcher
+from mdiff.seqmatch.patience import PatienceSequenceMatcher, HistogramSequenceMatcher
+from mdiff.seqmatch.auto import AutoSequenceMatcher
+from mdiff.seqmatch.merge_join import SortedSequenceMatcher
+from mdiff.seqmatch.multiset import MultisetSequenceMatcher, multiset_diff, multiset_diff_files
+from mdiff.text_diff import diff_lines_with_similarities, diff_files, DiffSession
+from mdiff.diffstat import diffstat, diffstat_files, DiffSummary
+from mdiff.tree_diff import diff_trees, TreeEntry
+from mdiff.cluster import find_similar, similarity_clusters, SimilarPair
+from mdiff.fleet import fleet_drift, fleet_drift_files, FleetDrift, HostGroup, HostVariant
+from mdiff.merge import merge3, MergeResult, MergeConflict
 from mdiff.utils import OpCode, CompositeOpCode
 
 
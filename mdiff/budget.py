@@ -0,0 +1,142 @@
+"""
+This module provides time and cost budgets of text diff. When diff goes over budget, it degrades in stages
+instead of running for unbounded time:
+    1. skip_similarities: similar lines search is skipped for replace blocks which would exceed the budget
+       (those blocks are presented as ordinary "replace" opcodes without in-line diff).
+    2. displacement_to_heckel: line level DisplacementSequenceMatcher is replaced with HeckelSequenceMatcher.
+    3. coarse_replace: line level diff is replaced with common prefix and suffix "equal" blocks
+       and a single "replace" block between them.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Sequence
+
+from mdiff.progress import DiffCancelledException, CancellationToken
+from mdiff.stats import current_stats
+from mdiff.utils import OpCode
+
+SKIP_SIMILARITIES = 'skip_similarities'
+DISPLACEMENT_TO_HECKEL = 'displacement_to_heckel'
+COARSE_REPLACE = 'coarse_replace'
+
+
+class BudgetExceededException(DiffCancelledException):
+    pass
+
+
+class DiffBudget:
+    """
+    Time and similarity ratio() calls budget of a diff. It's also a cancellation token (see mdiff.progress),
+    so algorithms checking cancellation at chunk boundaries stop when time budget is exceeded.
+
+    Parameters:
+        seconds: time budget (None for unlimited).
+        max_ratio_calls: maximal number of SequenceMatcher.ratio() calls in similar lines search (None for unlimited).
+        cancel: cancellation token checked along with the budget.
+
+    Attributes:
+        ratio_calls: number of ratio() calls charged so far.
+        degradations: names of degradation stages applied so far.
+    """
+
+    def __init__(self, seconds: float = None, max_ratio_calls: int = None, cancel: CancellationToken = None):
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.max_ratio_calls = max_ratio_calls
+        self.cancel = cancel
+        self.ratio_calls = 0
+        self.degradations: List[str] = []
+
+    def time_exceeded(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def ratio_calls_left(self) -> float:
+        if self.max_ratio_calls is None:
+            return float('inf')
+        return self.max_ratio_calls - self.ratio_calls
+
+    def raise_if_cancelled(self):
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+        if self.time_exceeded():
+            raise BudgetExceededException('Diff time budget exceeded.')
+        if self.ratio_calls_left() < 0:
+            raise BudgetExceededException('Diff ratio() calls budget exceeded.')
+
+    @contextmanager
+    def limited(self, fraction: float):
+        """Limits time budget to the fraction of remaining time within context."""
+        deadline = self.deadline
+        if deadline is not None:
+            now = time.monotonic()
+            self.deadline = now + max(deadline - now, 0.0) * fraction
+        try:
+            yield
+        finally:
+            self.deadline = deadline
+
+    def charge_ratio_calls(self, calls: int):
+        """Adds ratio() calls and raises BudgetExceededException if budget is exceeded."""
+        self.ratio_calls += calls
+        self.raise_if_cancelled()
+
+    def degrade(self, stage: str):
+        """Records applied degradation stage."""
+        if stage not in self.degradations:
+            self.degradations.append(stage)
+            stats = current_stats()
+            if stats is not None:
+                stats.degradations.append(stage)
+
+
+_active_budget: ContextVar[Optional[DiffBudget]] = ContextVar('mdiff_active_budget', default=None)
+
+
+def current_budget() -> Optional[DiffBudget]:
+    return _active_budget.get()
+
+
+@contextmanager
+def budgeted(budget: Optional[DiffBudget]):
+    """Makes budget active within context (does nothing if budget is None)."""
+    if budget is None:
+        yield
+        return
+    token = _active_budget.set(budget)
+    try:
+        yield
+    finally:
+        _active_budget.reset(token)
+
+
+def coarse_opcodes(a: Sequence, b: Sequence) -> List[OpCode]:
+    """
+    Generates the cheapest possible opcodes: common prefix and suffix as "equal" blocks and everything between them
+    as a single "replace" ("insert" or "delete") block.
+
+    >>> coarse_opcodes('abcxyz', 'abQz')
+    [OpCode('equal', 0, 2, 0, 2), OpCode('replace', 2, 5, 2, 3), OpCode('equal', 5, 6, 3, 4)]
+    """
+    prefix = 0
+    max_prefix = min(len(a), len(b))
+    while prefix < max_prefix and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    max_suffix = max_prefix - prefix
+    while suffix < max_suffix and a[len(a) - suffix - 1] == b[len(b) - suffix - 1]:
+        suffix += 1
+
+    i2 = len(a) - suffix
+    j2 = len(b) - suffix
+    opcodes = []
+    if prefix:
+        opcodes.append(OpCode('equal', 0, prefix, 0, prefix))
+    if prefix < i2 and prefix < j2:
+        opcodes.append(OpCode('replace', prefix, i2, prefix, j2))
+    elif prefix < i2:
+        opcodes.append(OpCode('delete', prefix, i2, prefix, prefix))
+    elif prefix < j2:
+        opcodes.append(OpCode('insert', prefix, prefix, prefix, j2))
+    if suffix:
+        opcodes.append(OpCode('equal', i2, len(a), j2, len(b)))
+    return opcodes
@@ -1,17 +1,33 @@
+import lzma
+import sys
+from contextlib import nullcontext
 from pathlib import Path
+from typing import List, Optional
 
 import typer
 
-from mdiff.differ import ConsoleTextDiffer, TkinterGuiDiffer
-from mdiff.utils import read_file, StringEnumChoice
+from mdiff.differ import ConsoleTextDiffer, TkinterGuiDiffer, SortedFilesConsoleDiffer, MultisetFilesConsoleDiffer, \
+    QuietFilesDiffer, SummaryFilesDiffer, TreeConsoleDiffer, FileDiffOptions, FleetConsoleDiffer
+from mdiff.cluster import find_similar, similarity_clusters, MIN_SIMILARITY
+from mdiff.profiling import profile_to, profile_from_env
+from mdiff.stats import collect_stats, phase, DiffStats
+from mdiff.tree_diff import list_files
+from mdiff.utils import read_file, read_file_bytes, read_files_lines, files_identical, decode_line, StringEnumChoice, \
+    SortMode, sort_lines, sort_text_lines
 
-sm_valid_names = ('standard', 'heckel', 'displacement')
+sm_valid_names = ('standard', 'heckel', 'displacement', 'myers', 'patience', 'histogram', 'auto', 'sorted', 'multiset')
 
 
 class SequenceMatcherName(StringEnumChoice):
     STANDARD = 'standard'
     HECKEL = 'heckel'
     DISPLACEMENT = 'displacement'
+    MYERS = 'myers'
+    PATIENCE = 'patience'
+    HISTOGRAM = 'histogram'
+    AUTO = 'auto'
+    SORTED = 'sorted'
+    MULTISET = 'multiset'
 
 
 class CharacterMode(StringEnumChoice):
@@ -27,7 +43,7 @@ class ColorMode(StringEnumChoice):
 def cli_diff(source_file: Path = typer.Argument(..., help="Source file path to compare."),
              target_file: Path = typer.Argument(..., help="Target file path to compare."),
              line_sm: SequenceMatcherName = typer.Option(
-                 SequenceMatcherName.HECKEL,
+                 SequenceMatcherName.AUTO,
                  help='Choose sequence matching method to detect differences between lines.'),
              inline_sm: SequenceMatcherName = typer.Option(
                  SequenceMatcherName.HECKEL,
@@ -44,10 +60,66 @@ def cli_diff(source_file: Path = typer.Argument(..., help="Source file path to c
              color_mode: ColorMode = typer.Option(
                  ColorMode.FORE,
                  help='Terminal color mode used when printing diff result.'
-             )):
+             ),
+             stats: bool = typer.Option(
+                 False, '--stats',
+                 help='Print diff phases timings and counters (symbol table size, LIS length, ratio() calls, etc.) '
+                      'to stderr.'),
+             profile: Optional[Path] = typer.Option(
+                 None, '--profile', dir_okay=False,
+                 help='Profile diff and write cProfile statistics to the given file and flamegraph-compatible '
+                      'collapsed stacks next to it (with ".collapsed" suffix). '
+                      'MDIFF_PROFILE environment variable is used if not specified.'),
+             progress: Optional[bool] = typer.Option(
+                 None, '--progress/--no-progress', show_default=False,
+                 help='Show diff progress bar on stderr. Enabled by default when stderr is a terminal.'),
+             budget_seconds: Optional[float] = typer.Option(
+                 None, min=0.0,
+                 help='Diff time budget. When exceeded, similar lines search is skipped, displacement line matcher '
+                      'is replaced with heckel and finally coarse replace blocks are printed.'),
+             max_ratio_calls: Optional[int] = typer.Option(
+                 None, min=0,
+                 help='Maximal number of line similarity ratio calculations. Similar lines search is skipped '
+                      'in replace blocks which would exceed it.'),
+             assume_sorted: bool = typer.Option(
+                 False, '--assume-sorted',
+                 help='Input files are sorted. They are compared with streaming merge-join while they are read '
+                      '(without in-line diff), so files bigger than memory can be compared. '
+                      'Files which are not sorted are compared with --line-sm matcher.'),
+             multiset: bool = typer.Option(
+                 False, '--multiset',
+                 help='Ignore order of lines and print only added and removed lines with number of occurrences. '
+                      'Files bigger than memory are hash-partitioned into temporary files.'),
+             sort: SortMode = typer.Option(
+                 SortMode.NO,
+                 help='Sort lines before diff: "yes" sorts both files, "by-source" aligns target lines with the order '
+                      'of the same source lines and "by-target" aligns source lines with the order of target lines.'),
+             bytes_mode: bool = typer.Option(
+                 False, '--bytes',
+                 help='Compare raw bytes lines without decoding files (i.e. files in unknown or mixed encodings). '
+                      'In-line diff is generated on byte level, printed lines are decoded as UTF-8 '
+                      'with undecodable bytes replaced.'),
+             quiet: bool = typer.Option(
+                 False, '--quiet', '--brief', '-q',
+                 help='Report only whether files differ, without generating diff. Exits with status 0 if files '
+                      'are identical, 1 if they differ and 2 in case of trouble (like "diff -q"). '
+                      'Comparison stops at the first difference.'),
+             stat: bool = typer.Option(
+                 False, '--stat',
+                 help='Print only diff summary: numbers of equal, inserted, deleted, moved, replaced and similar '
+                      'lines and numbers of diff blocks. Opcodes are counted without generating in-line diff, '
+                      'similar lines are searched only when cutoff is lower than 1.0.'),
+             jobs: Optional[int] = typer.Option(
+                 None, '--jobs', '-j', min=1,
+                 help='Number of processes generating diffs of files when directories are compared '
+                      '(number of CPUs by default).')):
     """
     Reads 2 files from provided paths, compares their content and prints diff.
     If compared lines in text files are similar enough (exceed cutoff) then extracts in-line diff.
+    Identical files are detected by size and content before diff is generated.
+
+    When directories are compared, files are paired by relative paths, renamed or moved files are detected
+    by identical or similar content, and diff of every changed file is printed in order of paths.
 
     There are few possible strategies to choose to use independently in line-level and in-line-level diff:
 
@@ -58,23 +130,217 @@ def cli_diff(source_file: Path = typer.Argument(..., help="Source file path to c
 
         displacement: detects all differences and movements, might not be very useful when both input files contains
         many common lines (for example many empty newlines).
+
+        myers: finds minimal diff with Myers' O(ND) algorithm, fast for large and nearly identical files.
+        Detects movement of deleted and inserted lines.
+
+        patience: anchors diff on lines unique in both files, readable diff of source code.
+        Detects movement of deleted and inserted lines.
+
+        histogram: extension of patience, anchors diff on the least frequent lines.
+        Detects movement of deleted and inserted lines.
+
+        auto: chooses myers, histogram or heckel based on input size, duplicated lines and unique lines density
+        (choice is reported with --stats).
+
+        sorted: merge-join of sorted files in linear time (i.e. sorted exports), falls back to heckel
+        when any of files is not sorted.
+
+        multiset: ignores order of lines (i.e. allow-lists, package lists), reports only added and removed lines
+        at their positions in linear time.
     """
-    source = read_file(source_file)
-    target = read_file(target_file)
-    if not gui:
-        differ = ConsoleTextDiffer(a=source, b=target, line_sm=line_sm, inline_sm=inline_sm, cutoff=cutoff,
-                                   color_mode=color_mode.value, character_mode=char_mode.value,
-                                   case_sensitive=case_sensitive)
-        differ.run()
+    exit_code = 0
+    with collect_stats() if stats else nullcontext() as diff_stats, \
+            profile_to(profile) if profile else profile_from_env():
+        streamed = False
+        if source_file.is_dir() or target_file.is_dir():
+            if source_file.is_dir() and target_file.is_dir():
+                options = FileDiffOptions(
+                    line_sm=line_sm.value, inline_sm=inline_sm.value, cutoff=cutoff, case_sensitive=case_sensitive,
+                    color_mode=color_mode.value, character_mode=char_mode.value, binary=bytes_mode,
+                    multiset=multiset, assume_sorted=assume_sorted, sort=sort, stat=stat,
+                    budget_seconds=budget_seconds, max_ratio_calls=max_ratio_calls)
+                differ = TreeConsoleDiffer(a=source_file, b=target_file, options=options, jobs=jobs, quiet=quiet)
+                different = differ.run()
+                exit_code = 2 if differ.errors else int(different) if quiet else 0
+            else:
+                typer.echo('mdiff: directory can be compared only with directory', err=True)
+                exit_code = 2
+            streamed = True
+        elif quiet:
+            differ = QuietFilesDiffer(a=source_file, b=target_file, case_sensitive=case_sensitive,
+                                      binary=bytes_mode, multiset=multiset, sort=sort)
+            try:
+                exit_code = int(differ.run())
+            except (OSError, EOFError, UnicodeDecodeError, lzma.LZMAError) as e:
+                typer.echo(f'mdiff: {e}', err=True)
+                exit_code = 2
+            if exit_code == 1:
+                typer.echo(f'Files {source_file} and {target_file} differ')
+            streamed = True
+        elif stat:
+            differ = SummaryFilesDiffer(a=source_file, b=target_file,
+                                        line_sm=SequenceMatcherName.MULTISET if multiset else line_sm,
+                                        cutoff=cutoff, case_sensitive=case_sensitive, binary=bytes_mode,
+                                        assume_sorted=assume_sorted, sort=sort)
+            differ.run()
+            streamed = True
+        elif not gui and _identical(source_file, target_file, diff_stats):
+            typer.echo(f'Files {source_file} and {target_file} are identical')
+            streamed = True
+        elif multiset and not gui:
+            differ = MultisetFilesConsoleDiffer(a=source_file, b=target_file, case_sensitive=case_sensitive,
+                                                color_mode=color_mode.value, character_mode=char_mode.value,
+                                                binary=bytes_mode)
+            differ.run()
+            streamed = True
+        elif assume_sorted and not gui and sort == SortMode.NO:
+            differ = SortedFilesConsoleDiffer(a=source_file, b=target_file, case_sensitive=case_sensitive,
+                                              color_mode=color_mode.value, character_mode=char_mode.value,
+                                              binary=bytes_mode)
+            streamed = differ.run()
+            if not streamed:
+                typer.echo('Input files are not sorted, comparing them with --line-sm matcher.', err=True)
+        elif multiset:
+            line_sm = SequenceMatcherName.MULTISET
+        elif assume_sorted:
+            line_sm = SequenceMatcherName.SORTED
+
+        if not streamed:
+            with phase(diff_stats, 'read'):
+                if not gui:
+                    # console printer needs only lines, so whole content of files is not kept
+                    source, target = read_files_lines(source_file, target_file, binary=bytes_mode)
+                elif bytes_mode:
+                    source = read_file_bytes(source_file)
+                    target = read_file_bytes(target_file)
+                else:
+                    source = read_file(source_file)
+                    target = read_file(target_file)
+            if sort != SortMode.NO:
+                with phase(diff_stats, 'sort'):
+                    if not gui:
+                        source, target = sort_lines(source, target, sort, case_sensitive)
+                    else:
+                        source, target = sort_text_lines(source, target, sort, case_sensitive)
+            if not gui:
+                differ = ConsoleTextDiffer(a=source, b=target, line_sm=line_sm, inline_sm=inline_sm, cutoff=cutoff,
+                                           color_mode=color_mode.value, character_mode=char_mode.value,
+                                           case_sensitive=case_sensitive,
+                                           progress=sys.stderr.isatty() if progress is None else progress,
+                                           budget_seconds=budget_seconds, max_ratio_calls=max_ratio_calls)
+                differ.run()
+            else:
+                # GUI text widgets present decoded text
+                differ = TkinterGuiDiffer(a=decode_line(source), b=decode_line(target), line_sm=line_sm,
+                                          inline_sm=inline_sm, cutoff=cutoff, case_sensitive=case_sensitive)
+                differ.run()
+    if diff_stats is not None:
+        typer.echo(diff_stats.format(), err=True)
+    if exit_code:
+        raise typer.Exit(exit_code)
+
+
+def _identical(source_file: Path, target_file: Path, diff_stats: Optional[DiffStats]) -> bool:
+    """Checks if files are identical (by size and content), so diff doesn't have to be generated."""
+    with phase(diff_stats, 'identical_check'):
+        return files_identical(source_file, target_file)
+
+
+def cli_cluster(paths: List[Path] = typer.Argument(
+                    ..., exists=True, help="Compared files paths (files of directories are compared recursively)."),
+                threshold: float = typer.Option(
+                    MIN_SIMILARITY, min=0.0, max=1.0,
+                    help='Minimal similarity ratio of lines of near-duplicate files.'),
+                line_sm: SequenceMatcherName = typer.Option(
+                    SequenceMatcherName.HECKEL,
+                    help='Choose sequence matching method comparing lines of candidate files.'),
+                graph: bool = typer.Option(
+                    False, '--graph',
+                    help='Print similarity graph edges (similarity and paths of files pair, separated with tabs) '
+                         'instead of clusters.'),
+                jobs: Optional[int] = typer.Option(
+                    None, '--jobs', '-j', min=1,
+                    help='Number of processes computing signatures and comparing files (number of CPUs by default).'),
+                stats: bool = typer.Option(
+                    False, '--stats',
+                    help='Print phases timings and counters to stderr.')):
+    """
+    Finds near-duplicate files and prints clusters of them (one path per line, clusters separated with empty lines).
+    Files are summarized with MinHash signatures of their lines, only candidate pairs sharing any band
+    of signatures are compared with line level diff, so files are not diffed pairwise.
+    """
+    files = _expand_paths(paths)
+    with collect_stats() if stats else nullcontext() as diff_stats:
+        pairs = find_similar(files, threshold=threshold, line_sm=line_sm.value, jobs=jobs)
+    if graph:
+        for pair in pairs:
+            typer.echo(f'{pair.similarity:.3f}\t{pair.a}\t{pair.b}')
     else:
-        differ = TkinterGuiDiffer(a=source, b=target, line_sm=line_sm, inline_sm=inline_sm, cutoff=cutoff,
-                                  case_sensitive=case_sensitive)
+        clusters = similarity_clusters(files, pairs)
+        if clusters:
+            typer.echo('\n\n'.join('\n'.join(map(str, cluster)) for cluster in clusters))
+    if diff_stats is not None:
+        typer.echo(diff_stats.format(), err=True)
+
+
+def cli_fleet(baseline: Path = typer.Argument(..., exists=True, dir_okay=False, help="Baseline file path."),
+              hosts: List[Path] = typer.Argument(
+                  ..., exists=True, help="Hosts files paths (files of directories are compared recursively)."),
+              line_sm: SequenceMatcherName = typer.Option(
+                  SequenceMatcherName.HECKEL,
+                  help='Choose sequence matching method generating diff of baseline and representative hosts.'),
+              case_sensitive: bool = typer.Option(True, help='Whether diff is going to be case sensitive.'),
+              char_mode: CharacterMode = typer.Option(
+                  CharacterMode.UTF8,
+                  help='Terminal character set used when printing diff result.'),
+              color_mode: ColorMode = typer.Option(
+                  ColorMode.FORE,
+                  help='Terminal color mode used when printing diff result.'),
+              bytes_mode: bool = typer.Option(
+                  False, '--bytes',
+                  help='Compare undecoded bytes lines, printed lines are decoded as UTF-8 with undecodable bytes '
+                       'replaced.'),
+              stats: bool = typer.Option(
+                  False, '--stats',
+                  help='Print phases timings and counters to stderr.')):
+    """
+    Compares baseline file with files of many hosts at once (N-way diff). Lines of all files are interned
+    into one symbol table and presence of every line on hosts is kept as a bitmap. Prints baseline lines
+    missing on any host with names of deviating hosts, then groups of hosts with identical deviations
+    (missing baseline lines and extra lines) and diff of baseline and the first host of every group only.
+    """
+    with collect_stats() if stats else nullcontext() as diff_stats:
+        differ = FleetConsoleDiffer(baseline=baseline, hosts=_expand_paths(hosts), line_sm=line_sm.value,
+                                    case_sensitive=case_sensitive, color_mode=color_mode.value,
+                                    character_mode=char_mode.value, binary=bytes_mode)
         differ.run()
+    if diff_stats is not None:
+        typer.echo(diff_stats.format(), err=True)
+
+
+def _expand_paths(paths: List[Path]) -> List[Path]:
+    """Returns paths of files, directories are replaced with paths of their files (recursively, sorted)."""
+    files = []
+    for p in paths:
+        if p.is_dir():
+            files.extend(p / i for i in sorted(list_files(p)))
+        else:
+            files.append(p)
+    return files
 
 
 def main():
     typer.run(cli_diff)
 
 
+def cluster_main():
+    typer.run(cli_cluster)
+
+
+def fleet_main():
+    typer.run(cli_fleet)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,230 @@
+"""
+This module finds near-duplicate files in a large set of files without comparing every pair of them.
+Every file is summarized with MinHash signature of its set of lines (one permutation hashing with densification,
+so every line is hashed once), candidate pairs are files sharing any band of their signatures
+(locality-sensitive hashing) and only candidates are compared with a line level diff (see DiffSummary.ratio).
+Signatures and diffs of candidates are computed by a pool of processes.
+
+Example:
+    >>> from pathlib import Path
+    >>> from tempfile import TemporaryDirectory
+    >>> with TemporaryDirectory() as tmp:
+    ...     files = [Path(tmp) / name for name in ('a.conf', 'b.conf', 'c.conf')]
+    ...     for p, text in zip(files, ('x=1\\ny=2\\nz=3', 'x=1\\ny=2\\nz=4', 'other')):
+    ...         _ = p.write_text(text)
+    ...     [(i.a.name, i.b.name, round(i.similarity, 2)) for i in find_similar(files, threshold=0.5, jobs=1)]
+    [('a.conf', 'b.conf', 0.67)]
+"""
+import hashlib
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from mdiff.diffstat import DiffSummary
+from mdiff.seqmatch.utils import SequenceMatcherName, seq_matcher_factory
+from mdiff.stats import current_stats, phase
+from mdiff.utils import iter_file_line_chunks, read_file_lines
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+# minimal similarity ratio of near-duplicate files
+MIN_SIMILARITY = 0.8
+# number of MinHash signature values
+NUM_PERMUTATIONS = 128
+# number of signature bands, files sharing all values of any band are candidates
+# (candidate probability of files with Jaccard similarity s is 1 - (1 - s ** rows) ** bands)
+NUM_BANDS = 32
+# offset added to values borrowed by empty signature bins from their neighbours (densification)
+_DENSIFY_OFFSET = 1 << 58
+
+
+@dataclass(frozen=True)
+class SimilarPair:
+    """
+    Pair of similar files.
+        a: path of file.
+        b: path of file following file "a" in input files.
+        similarity: similarity ratio of files lines (1.0 for identical content).
+    """
+    a: Path
+    b: Path
+    similarity: float
+
+
+def line_hash(line: bytes) -> int:
+    """Returns 64 bit hash of line, which is the same in every process (unlike builtin hash of bytes)."""
+    return int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(), 'little')
+
+
+def minhash_signature(hashes: Iterable[int], num_perm: int = NUM_PERMUTATIONS) -> Tuple[int, ...]:
+    """
+    Returns MinHash signature of set of hashes computed with one permutation hashing: hash space is divided
+    into num_perm bins and the smallest hash of every bin is kept. Empty bins borrow value of the nearest
+    non-empty bin to the right (rotation densification), so signatures of small sets can be compared too.
+    Probability of equal values of signatures is Jaccard similarity of sets.
+
+    >>> minhash_signature([5, 6, 9], num_perm=4) == minhash_signature([9, 5, 6, 6], num_perm=4)
+    True
+    """
+    empty = 1 << 64
+    bins = [empty] * num_perm
+    for h in hashes:
+        i = h % num_perm
+        value = h // num_perm
+        if value < bins[i]:
+            bins[i] = value
+    if all(value == empty for value in bins):
+        return tuple(bins)
+    for i in range(num_perm):
+        distance = 0
+        while bins[(i + distance) % num_perm] == empty:
+            distance += 1
+        if distance:
+            bins[i] = bins[(i + distance) % num_perm] + distance * _DENSIFY_OFFSET
+    return tuple(bins)
+
+
+def file_signature(p: Path, num_perm: int = NUM_PERMUTATIONS) -> Tuple[bytes, Tuple[int, ...]]:
+    """Returns digest of file lines and MinHash signature of set of file lines."""
+    digest = hashlib.blake2b(digest_size=16)
+    hashes: Set[int] = set()
+    for chunk_lines in iter_file_line_chunks(p, binary=True):
+        for line in chunk_lines:
+            digest.update(line)
+            digest.update(b'\n')
+        hashes.update(map(line_hash, chunk_lines))
+    return digest.digest(), minhash_signature(hashes, num_perm)
+
+
+def files_similarity(a: Path, b: Path, line_sm: SequenceMatcherName = SequenceMatcherName.HECKEL) -> float:
+    """Returns similarity ratio of files lines (see DiffSummary.ratio), compared with line_sm SequenceMatcher."""
+    return _similarities(line_sm, (a, [b]))[0]
+
+
+def _similarities(line_sm: SequenceMatcherName, task: Tuple[Path, List[Path]]) -> List[float]:
+    """Returns similarity ratios of file and every one of other files (file is read only once)."""
+    a, others = task
+    sm = seq_matcher_factory(SequenceMatcherName(line_sm))()
+    a_lines = read_file_lines(a, binary=True)
+    ratios = []
+    for b in others:
+        sm.set_seqs(a_lines, read_file_lines(b, binary=True))
+        ratios.append(DiffSummary().count(sm.get_opcodes()).ratio())
+    return ratios
+
+
+def _map(fn: Callable[[T], R], items: Sequence[T], jobs: int) -> List[R]:
+    """Maps fn over items by pool of jobs processes (or in current process for a single job)."""
+    if jobs == 1 or len(items) < 2:
+        return list(map(fn, items))
+    chunksize = max(1, min(64, len(items) // (jobs * 8)))
+    with ProcessPoolExecutor(jobs) as executor:
+        return list(executor.map(fn, items, chunksize=chunksize))
+
+
+def lsh_candidates(signatures: Sequence[Tuple[int, ...]], bands: int = NUM_BANDS) -> Set[Tuple[int, int]]:
+    """
+    Returns pairs (i, j), i < j, of indexes of signatures sharing all values of any of bands
+    (signature is split into bands of len(signature) // bands values).
+    """
+    candidates = set()
+    if not signatures:
+        return candidates
+    rows = len(signatures[0]) // bands
+    if rows < 1:
+        raise ValueError('Number of bands must not be greater than signature size')
+    for band in range(bands):
+        buckets: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+        for i, signature in enumerate(signatures):
+            buckets[signature[band * rows:(band + 1) * rows]].append(i)
+        for bucket in buckets.values():
+            for x in range(len(bucket)):
+                for y in range(x + 1, len(bucket)):
+                    candidates.add((bucket[x], bucket[y]))
+    return candidates
+
+
+def find_similar(files: Sequence[Path], threshold: float = MIN_SIMILARITY,
+                 line_sm: SequenceMatcherName = SequenceMatcherName.HECKEL,
+                 num_perm: int = NUM_PERMUTATIONS, bands: int = NUM_BANDS,
+                 jobs: Optional[int] = None) -> List[SimilarPair]:
+    """
+    Finds pairs of similar files, with similarity ratio of lines greater or equal to threshold,
+    ordered by descending similarity. Files with identical lines are paired only with the first of them
+    (which is the only one compared with other files), so they don't multiply number of compared pairs.
+    Candidate pairs are found with locality-sensitive hashing of MinHash signatures of sets of lines,
+    so pairs of similar files are missed with small probability, but full pairwise diff is never run.
+
+    :param files: paths of compared files.
+    :param threshold: minimal similarity ratio of files (see DiffSummary.ratio).
+    :param line_sm: name of SequenceMatcher comparing lines of candidate files.
+    :param num_perm: number of MinHash signature values.
+    :param bands: number of signature bands, more bands give more candidates of lower similarity.
+    :param jobs: number of processes computing signatures and comparing files (number of CPUs by default).
+    """
+    if not 0.0 <= threshold <= 1.0:
+        raise ValueError('Threshold must have value in range 0.0 <= threshold <= 1.0')
+    stats = current_stats()
+    files = [Path(p) for p in files]
+    jobs = jobs or os.cpu_count() or 1
+
+    with phase(stats, 'cluster_signatures'):
+        signatures = _map(partial(file_signature, num_perm=num_perm), files, jobs)
+
+    pairs = []
+    representatives: Dict[bytes, int] = {}
+    unique = []
+    for i, (digest, _) in enumerate(signatures):
+        first = representatives.setdefault(digest, i)
+        if first == i:
+            unique.append(i)
+        else:
+            pairs.append(SimilarPair(files[first], files[i], 1.0))
+
+    with phase(stats, 'cluster_candidates'):
+        candidates = sorted((unique[x], unique[y])
+                            for x, y in lsh_candidates([signatures[i][1] for i in unique], bands))
+
+    with phase(stats, 'cluster_verify'):
+        tasks: Dict[int, List[int]] = defaultdict(list)
+        for i, j in candidates:
+            tasks[i].append(j)
+        ratios = _map(partial(_similarities, line_sm),
+                      [(files[i], [files[j] for j in others]) for i, others in tasks.items()], jobs)
+        for (i, others), task_ratios in zip(tasks.items(), ratios):
+            pairs.extend(SimilarPair(files[i], files[j], ratio) for j, ratio in zip(others, task_ratios)
+                         if ratio >= threshold)
+
+    order = {p: i for i, p in enumerate(files)}
+    pairs.sort(key=lambda pair: (-pair.similarity, order[pair.a], order[pair.b]))
+    return pairs
+
+
+def similarity_clusters(files: Sequence[Path], pairs: Iterable[SimilarPair]) -> List[List[Path]]:
+    """
+    Returns clusters of similar files: connected components of similarity graph with at least 2 files.
+    Files of clusters and clusters are ordered by order of input files.
+    """
+    files = [Path(p) for p in files]
+    parent = {p: p for p in files}
+
+    def find(p: Path) -> Path:
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+
+    for pair in pairs:
+        x, y = find(pair.a), find(pair.b)
+        if x != y:
+            parent[y] = x
+    clusters: Dict[Path, List[Path]] = defaultdict(list)
+    for p in files:
+        clusters[find(p)].append(p)
+    # files of every cluster are appended in input order, so clusters are ordered by their first files
+    return [i for i in clusters.values() if len(i) > 1]
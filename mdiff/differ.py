@@ -1,15 +1,41 @@
+import io
+import lzma
+import os
+import sys
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from functools import partial
+from itertools import chain, starmap, zip_longest
+from operator import ne
+from pathlib import Path
+from typing import Tuple, List, Union, Optional, Iterable
 import tkinter as tk
 
-from mdiff import diff_lines_with_similarities
+from mdiff.diffstat import DiffSummary, diffstat_files, session_diffstat
+from mdiff.fleet import fleet_drift_files
+from mdiff.seqmatch.merge_join import merge_join, merge_join_opcodes, UnsortedSequenceError
+from mdiff.seqmatch.multiset import multiset_diff_files
+from mdiff.stats import current_stats, phase
+from mdiff.text_diff import DiffSession
+from mdiff.tree_diff import diff_trees, TreeEntry, UNCHANGED, MODIFIED, ADDED, REMOVED, RENAMED
 from mdiff.seqmatch.utils import SequenceMatcherName, seq_matcher_factory
+from mdiff.utils import iter_file_lines, Text, TextBuffer, files_identical, iter_file_line_chunks, read_files_lines, \
+    read_file_lines, SortMode, sort_lines, open_file, decode_line
 
 import mdiff.visualisation.terminal as cli_vis
 from mdiff.visualisation.gui_tkinter.diff_result import DiffResult, DiffResultWindowBuilder
 
 
 class TextDiffer(ABC):
-    def __init__(self, a: str, b: str, line_sm: SequenceMatcherName, inline_sm: SequenceMatcherName, cutoff: float,
+    """
+    Base class of differs generating diff of input texts. Texts can also be passed already split into lines
+    (i.e. read with read_files_lines), so whole content of files doesn't have to be held in memory.
+    """
+
+    def __init__(self, a: Union[TextBuffer, List[Text]], b: Union[TextBuffer, List[Text]],
+                 line_sm: SequenceMatcherName, inline_sm: SequenceMatcherName, cutoff: float,
                  case_sensitive: bool):
         self.a = a
         self.b = b
@@ -22,6 +48,7 @@ class TextDiffer(ABC):
 
         self.line_sm_instance = seq_matcher_factory(SequenceMatcherName(line_sm))()
         self.inline_sm_instance = seq_matcher_factory(SequenceMatcherName(inline_sm))()
+        self.session = DiffSession.from_lines(a, b) if isinstance(a, list) else DiffSession(a, b)
 
     @abstractmethod
     def run(self):
@@ -29,18 +56,31 @@ class TextDiffer(ABC):
 
 
 class ConsoleTextDiffer(TextDiffer):
-    def __init__(self, a: str, b: str, line_sm: SequenceMatcherName, inline_sm: SequenceMatcherName, cutoff: float,
-                 case_sensitive: bool, color_mode: str, character_mode: str):
+    def __init__(self, a: Union[TextBuffer, List[Text]], b: Union[TextBuffer, List[Text]],
+                 line_sm: SequenceMatcherName, inline_sm: SequenceMatcherName, cutoff: float,
+                 case_sensitive: bool, color_mode: str, character_mode: str, progress: bool = False,
+                 budget_seconds: float = None, max_ratio_calls: int = None):
         super().__init__(a, b, line_sm, inline_sm, cutoff, case_sensitive)
+        self.progress = progress
+        self.budget_seconds = budget_seconds
+        self.max_ratio_calls = max_ratio_calls
         self.color_mode = color_mode
         self.character_mode = character_mode
         self.console_characters = cli_vis.get_console_characters(character_mode)
         self.console_colors = cli_vis.get_console_colors(color_mode)
 
     def run(self):
-        a_lines, b_lines, opcodes = diff_lines_with_similarities(
-            a=self.a, b=self.b, cutoff=self.cutoff, line_sm=self.line_sm_instance, inline_sm=self.inline_sm_instance,
-            keepends=False, case_sensitive=self.case_sensitive)
+        progress_bar = cli_vis.ConsoleProgressBar() if self.progress else None
+        try:
+            a_lines, b_lines, opcodes = self.session.diff(
+                cutoff=self.cutoff, line_sm=self.line_sm_instance, inline_sm=self.inline_sm_instance,
+                keepends=False, case_sensitive=self.case_sensitive, progress=progress_bar,
+                budget_seconds=self.budget_seconds, max_ratio_calls=self.max_ratio_calls)
+        finally:
+            if progress_bar is not None:
+                progress_bar.close()
+        if opcodes.degradations:
+            print(f'Diff exceeded budget, applied degradations: {", ".join(opcodes.degradations)}', file=sys.stderr)
 
         printer = cli_vis.LineDiffConsolePrinter(a=a_lines, b=b_lines, seq=opcodes,
                                                  characters=self.console_characters,
@@ -48,6 +88,350 @@ class ConsoleTextDiffer(TextDiffer):
         printer.print()
 
 
+def _scan_lines(p: Path, case_sensitive: bool, binary: bool) -> Tuple[int, int, bool]:
+    """Returns number of lines, length of the longest line and sortedness of file."""
+    count = longest = 0
+    ordered = True
+    prev = None
+    for line in iter_file_lines(p, binary):
+        key = line if case_sensitive else line.lower()
+        if count and key < prev:
+            ordered = False
+        prev = key
+        count += 1
+        longest = max(longest, len(line))
+    return count, longest, ordered
+
+
+class SortedFilesConsoleDiffer:
+    """
+    Compares sorted files with streaming merge-join (see mdiff.seqmatch.merge_join), so files bigger than memory
+    can be compared. Files are read twice: the first pass counts lines, measures the longest line and checks
+    sortedness, the second one merge-joins and prints lines. In-line differences are not generated.
+    In binary mode lines are compared without decoding.
+    """
+
+    def __init__(self, a: Path, b: Path, case_sensitive: bool, color_mode: str, character_mode: str,
+                 binary=False):
+        self.a = a
+        self.b = b
+        self.case_sensitive = case_sensitive
+        self.binary = binary
+        self.console_characters = cli_vis.get_console_characters(character_mode)
+        self.console_colors = cli_vis.get_console_colors(color_mode)
+
+    def run(self) -> bool:
+        """Prints diff and returns True, or returns False without printing anything if any file is not sorted."""
+        with phase(current_stats(), 'read'):
+            a_lines, a_longest, a_sorted = _scan_lines(self.a, self.case_sensitive, self.binary)
+            b_lines, b_longest, b_sorted = _scan_lines(self.b, self.case_sensitive, self.binary)
+        if not (a_sorted and b_sorted):
+            return False
+
+        lower = bytes.lower if self.binary else str.lower
+        rows = merge_join(iter_file_lines(self.a, self.binary), iter_file_lines(self.b, self.binary),
+                          key=None if self.case_sensitive else lower)
+        printer = cli_vis.MergeJoinConsolePrinter(rows=rows, a_lines=a_lines, b_lines=b_lines,
+                                                  a_longest=a_longest, b_longest=b_longest,
+                                                  characters=self.console_characters, colors=self.console_colors,
+                                                  line_margin=3)
+        printer.print()
+        return True
+
+
+class MultisetFilesConsoleDiffer:
+    """
+    Compares lines of files ignoring their order (see mdiff.seqmatch.multiset.multiset_diff_files) and prints
+    added and removed lines with number of occurrences. Files bigger than memory are hash-partitioned
+    into temporary files. In binary mode lines are compared without decoding.
+    """
+
+    def __init__(self, a: Path, b: Path, case_sensitive: bool, color_mode: str, character_mode: str,
+                 binary=False):
+        self.a = a
+        self.b = b
+        self.case_sensitive = case_sensitive
+        self.binary = binary
+        self.console_characters = cli_vis.get_console_characters(character_mode)
+        self.console_colors = cli_vis.get_console_colors(color_mode)
+
+    def run(self):
+        diff = multiset_diff_files(self.a, self.b, lowercase=not self.case_sensitive, binary=self.binary)
+        printer = cli_vis.MultisetConsolePrinter(diff=diff, characters=self.console_characters,
+                                                 colors=self.console_colors)
+        printer.print()
+
+
+class QuietFilesDiffer:
+    """
+    Checks only whether files differ, without generating opcodes (like "diff -q" or "cmp").
+    Identical files are detected by size and content comparison of raw files. Otherwise decompressed lines
+    are compared while files are read, and reading stops at the first differing chunk of lines.
+    Files are compared as multisets of lines, or sorted before comparison, the same way as they are for diff.
+    """
+
+    def __init__(self, a: Path, b: Path, case_sensitive: bool, binary=False, multiset=False,
+                 sort: SortMode = SortMode.NO):
+        self.a = a
+        self.b = b
+        self.case_sensitive = case_sensitive
+        self.binary = binary
+        self.multiset = multiset
+        self.sort = SortMode(sort)
+
+    def run(self) -> bool:
+        """Returns True if files differ."""
+        stats = current_stats()
+        with phase(stats, 'identical_check'):
+            if files_identical(self.a, self.b):
+                return False
+        with phase(stats, 'compare'):
+            if self.multiset:
+                return bool(multiset_diff_files(self.a, self.b, lowercase=not self.case_sensitive,
+                                                binary=self.binary))
+            if self.sort != SortMode.NO:
+                a_lines, b_lines = read_files_lines(self.a, self.b, binary=self.binary)
+                a_lines, b_lines = sort_lines(a_lines, b_lines, self.sort, self.case_sensitive)
+            else:
+                a_lines = chain.from_iterable(iter_file_line_chunks(self.a, binary=self.binary))
+                b_lines = chain.from_iterable(iter_file_line_chunks(self.b, binary=self.binary))
+            if not self.case_sensitive:
+                lower = bytes.lower if self.binary else str.lower
+                a_lines, b_lines = map(lower, a_lines), map(lower, b_lines)
+            return any(starmap(ne, zip_longest(a_lines, b_lines, fillvalue=None)))
+
+
+class SummaryFilesDiffer:
+    """
+    Prints summary of diff of files (see mdiff.diffstat) instead of diff. Sorted files (assume_sorted)
+    are summarized with streaming merge-join while they are read, other files are compared with line_sm matcher.
+    In-line diff is never generated, similar lines are searched only when cutoff is lower than 1.0.
+    """
+
+    def __init__(self, a: Path, b: Path, line_sm: SequenceMatcherName, cutoff: float, case_sensitive: bool,
+                 binary=False, assume_sorted=False, sort: SortMode = SortMode.NO):
+        self.a = a
+        self.b = b
+        self.line_sm = line_sm
+        self.cutoff = cutoff
+        self.case_sensitive = case_sensitive
+        self.binary = binary
+        self.assume_sorted = assume_sorted
+        self.sort = SortMode(sort)
+
+    def run(self) -> DiffSummary:
+        summary = self.summarize()
+        print(summary.format())
+        return summary
+
+    def summarize(self) -> DiffSummary:
+        stats = current_stats()
+        if self.assume_sorted and self.sort == SortMode.NO:
+            lower = bytes.lower if self.binary else str.lower
+            opcodes = merge_join_opcodes(iter_file_lines(self.a, self.binary), iter_file_lines(self.b, self.binary),
+                                         key=None if self.case_sensitive else lower)
+            try:
+                with phase(stats, 'merge_join'):
+                    return DiffSummary().count(opcodes)
+            except UnsortedSequenceError:
+                print('Input files are not sorted, comparing them with --line-sm matcher.', file=sys.stderr)
+
+        line_sm = seq_matcher_factory(SequenceMatcherName(self.line_sm))()
+        if self.sort == SortMode.NO:
+            return diffstat_files(self.a, self.b, cutoff=self.cutoff, line_sm=line_sm,
+                                  case_sensitive=self.case_sensitive, binary=self.binary)
+        with phase(stats, 'read'):
+            a_lines, b_lines = read_files_lines(self.a, self.b, binary=self.binary)
+        with phase(stats, 'sort'):
+            a_lines, b_lines = sort_lines(a_lines, b_lines, self.sort, self.case_sensitive)
+        return session_diffstat(DiffSession.from_lines(a_lines, b_lines), cutoff=self.cutoff, line_sm=line_sm,
+                                case_sensitive=self.case_sensitive)
+
+
+@dataclass(frozen=True)
+class FileDiffOptions:
+    """Options of files diff printed by print_files_diff (see CLI options of the same names)."""
+    line_sm: str = SequenceMatcherName.AUTO.value
+    inline_sm: str = SequenceMatcherName.HECKEL.value
+    cutoff: float = 1.0
+    case_sensitive: bool = True
+    color_mode: str = 'fore'
+    character_mode: str = 'utf8'
+    binary: bool = False
+    multiset: bool = False
+    assume_sorted: bool = False
+    sort: SortMode = SortMode.NO
+    stat: bool = False
+    budget_seconds: Optional[float] = None
+    max_ratio_calls: Optional[int] = None
+
+
+def is_binary_file(p: Path) -> bool:
+    """Checks if file is binary (has NUL byte at the beginning of its decompressed content), like "diff" does."""
+    with open_file(p, binary=True) as file:
+        return b'\0' in file.read(8192)
+
+
+def print_files_diff(a: Path, b: Path, options: FileDiffOptions):
+    """Prints diff (or summary) of files the same way as CLI does, diff of binary files is not printed."""
+    if is_binary_file(a) or is_binary_file(b):
+        print('Binary files differ')
+        return
+    if options.stat:
+        line_sm = SequenceMatcherName.MULTISET if options.multiset else options.line_sm
+        SummaryFilesDiffer(a, b, line_sm=line_sm, cutoff=options.cutoff, case_sensitive=options.case_sensitive,
+                           binary=options.binary, assume_sorted=options.assume_sorted, sort=options.sort).run()
+        return
+    if options.multiset:
+        MultisetFilesConsoleDiffer(a, b, case_sensitive=options.case_sensitive, color_mode=options.color_mode,
+                                   character_mode=options.character_mode, binary=options.binary).run()
+        return
+    if options.assume_sorted and options.sort == SortMode.NO:
+        differ = SortedFilesConsoleDiffer(a, b, case_sensitive=options.case_sensitive, color_mode=options.color_mode,
+                                          character_mode=options.character_mode, binary=options.binary)
+        if differ.run():
+            return
+    a_lines, b_lines = read_files_lines(a, b, binary=options.binary)
+    if options.sort != SortMode.NO:
+        a_lines, b_lines = sort_lines(a_lines, b_lines, options.sort, options.case_sensitive)
+    ConsoleTextDiffer(a_lines, b_lines, line_sm=options.line_sm, inline_sm=options.inline_sm, cutoff=options.cutoff,
+                      case_sensitive=options.case_sensitive, color_mode=options.color_mode,
+                      character_mode=options.character_mode, budget_seconds=options.budget_seconds,
+                      max_ratio_calls=options.max_ratio_calls).run()
+
+
+FILE_ERRORS = (OSError, EOFError, UnicodeDecodeError, lzma.LZMAError)
+
+
+def _unreadable_file(paths: Tuple[Path, Path], options: FileDiffOptions) -> Path:
+    """Returns the first of files which can't be read (the last one when reading error isn't reproduced)."""
+    for p in paths:
+        try:
+            read_file_lines(p, binary=options.binary)
+        except FILE_ERRORS:
+            return p
+    return paths[-1]
+
+
+def _render_files_diff(options: FileDiffOptions, paths: Tuple[Path, Path]) -> Tuple[str, Optional[str]]:
+    """
+    Returns output of print_files_diff and error message when any of files can't be read
+    (called by worker processes of TreeConsoleDiffer).
+    """
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            print_files_diff(*paths, options)
+    except FILE_ERRORS as e:
+        path = e.filename if isinstance(e, OSError) and e.filename else _unreadable_file(paths, options)
+        return '', f'mdiff: {path}: {e}'
+    return output.getvalue(), None
+
+
+def format_tree_entry(entry: TreeEntry) -> str:
+    """Returns header line of changed file of compared directory trees."""
+    if entry.status == ADDED:
+        return f'Added: {entry.b}'
+    elif entry.status == REMOVED:
+        return f'Removed: {entry.a}'
+    elif entry.status == RENAMED:
+        similarity = f' (similarity {entry.similarity:.0%})' if entry.similarity < 1.0 else ''
+        return f'Renamed: {entry.a} -> {entry.b}{similarity}'
+    return f'{entry.status.capitalize()}: {entry.a}'
+
+
+class TreeConsoleDiffer:
+    """
+    Compares directory trees (see mdiff.tree_diff.diff_trees) and prints header of every changed file,
+    followed by diff of modified and renamed files with changed content (see print_files_diff).
+    Diffs are generated by a pool of jobs processes and printed as soon as they are ready,
+    in deterministic order of file paths. In quiet mode only headers are printed.
+    Files which can't be read are reported to stderr (and collected in errors) without stopping the comparison.
+    """
+
+    def __init__(self, a: Path, b: Path, options: FileDiffOptions, jobs: Optional[int] = None, quiet=False):
+        self.a = a
+        self.b = b
+        self.options = options
+        self.jobs = jobs or os.cpu_count() or 1
+        self.quiet = quiet
+        self.errors: List[str] = []
+
+    def run(self) -> bool:
+        """Prints diff of trees and returns True if trees differ."""
+        entries = [i for i in diff_trees(self.a, self.b) if i.status != UNCHANGED]
+        diffed = [i for i in entries if self._has_diff(i)]
+        pairs = [(Path(self.a) / i.a, Path(self.b) / i.b) for i in diffed]
+        render = partial(_render_files_diff, self.options)
+        if self.jobs == 1 or len(pairs) < 2:
+            self._print(entries, map(render, pairs))
+        else:
+            chunksize = max(1, min(64, len(pairs) // (self.jobs * 8)))
+            with ProcessPoolExecutor(self.jobs) as executor:
+                self._print(entries, executor.map(render, pairs, chunksize=chunksize))
+        return bool(entries)
+
+    def _has_diff(self, entry: TreeEntry) -> bool:
+        if self.quiet:
+            return False
+        return entry.status == MODIFIED or (entry.status == RENAMED and entry.similarity < 1.0)
+
+    def _print(self, entries: List[TreeEntry], diffs: Iterable[Tuple[str, Optional[str]]]):
+        diffs = iter(diffs)
+        for entry in entries:
+            print(format_tree_entry(entry))
+            if self._has_diff(entry):
+                output, error = next(diffs)
+                print(output, end='', flush=True)
+                if error:
+                    self.errors.append(error)
+                    print(error, file=sys.stderr, flush=True)
+
+
+class FleetConsoleDiffer:
+    """
+    Compares baseline file with files of many hosts at once (see mdiff.fleet.fleet_drift_files) and prints
+    every baseline line missing on any host with names of deviating hosts, followed by groups of hosts with
+    identical deviations and diff of baseline and the first host of every variant of group (hosts with identical
+    lines).
+    """
+
+    def __init__(self, baseline: Path, hosts: List[Path], line_sm: SequenceMatcherName, case_sensitive: bool,
+                 color_mode: str, character_mode: str, binary=False):
+        self.baseline = baseline
+        self.hosts = hosts
+        self.line_sm = line_sm
+        self.case_sensitive = case_sensitive
+        self.binary = binary
+        self.console_characters = cli_vis.get_console_characters(character_mode)
+        self.console_colors = cli_vis.get_console_colors(color_mode)
+
+    def run(self) -> bool:
+        """Prints fleet drift report and returns True if any host differs from baseline."""
+        drift = fleet_drift_files(self.baseline, self.hosts, line_sm=seq_matcher_factory(self.line_sm)(),
+                                  case_sensitive=self.case_sensitive, binary=self.binary)
+        baseline_lines = drift.baseline_lines()
+        for i, hosts in drift.line_deviations():
+            print(f'Line {i + 1} is missing on {len(hosts)} of {len(drift.hosts)} hosts: {", ".join(hosts)}')
+            print(f'  {decode_line(baseline_lines[i])}')
+
+        different = False
+        for number, group in enumerate(drift.groups, start=1):
+            print(f'Group {number}: {len(group.hosts)} hosts: {", ".join(group.hosts)}')
+            for variant_number, variant in enumerate(group.variants, start=1):
+                if len(group.variants) > 1:
+                    print(f'Variant {number}.{variant_number}: {len(variant.hosts)} hosts: {", ".join(variant.hosts)}')
+                if all(opcode[0] == 'equal' for opcode in variant.opcodes):
+                    print('No differences')
+                    continue
+                different = True
+                printer = cli_vis.LineDiffConsolePrinter(a=baseline_lines, b=drift.host_lines(variant.representative),
+                                                         seq=variant.opcodes, characters=self.console_characters,
+                                                         colors=self.console_colors, line_margin=3, equal_context=3)
+                printer.print()
+        return different
+
+
 class TkinterGuiDiffer(TextDiffer):
 
     def run(self):
@@ -57,6 +441,6 @@ class TkinterGuiDiffer(TextDiffer):
         diff_result = DiffResult(root)
         window = DiffResultWindowBuilder(root, diff_result)
         diff_result.set_diff_params(a=self.a, b=self.b, line_sm_name=self.line_sm, inline_sm_name=self.inline_sm,
-                                    cutoff=self.cutoff, case_sensitive=self.case_sensitive)
+                                    cutoff=self.cutoff, case_sensitive=self.case_sensitive, session=self.session)
         diff_result.generate_diff()
         root.mainloop()
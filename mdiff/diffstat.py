@@ -0,0 +1,176 @@
+"""
+This module provides diff summary (diffstat): numbers of equal, inserted, deleted, moved, replaced and similar lines
+and numbers of diff blocks (opcodes) of every tag. Line opcodes are generated by line SequenceMatcher (and memoized
+by DiffSession) as they are for diff, but in-line opcodes of similar lines and presentation of diff are never
+generated, and similar lines are searched only when requested.
+
+Example:
+    >>> diffstat('aa1\\nbb2\\ncc3\\ndd4', 'aa1\\ncc2\\ndd4\\nee5')
+    DiffSummary(equal=2, inserted=1, deleted=0, moved=0, replaced_source=2, replaced_target=1, similar=0, \
+blocks=Counter({'equal': 2, 'replace': 1, 'insert': 1}))
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from mdiff.progress import ProgressCallback, CancellationToken, monitored
+from mdiff.stats import current_stats, phase
+from mdiff.text_diff import DiffSession, extract_similarities
+from mdiff.utils import CompositeOpCode, LazyCompositeOpCode, OpCodeType, SequenceMatcherBase, TextBuffer, \
+    files_identical, iter_file_line_chunks, read_files_lines
+
+
+@dataclass
+class DiffSummary:
+    """
+    Summary of diff.
+        equal: number of equal lines.
+        inserted: number of inserted lines.
+        deleted: number of deleted lines.
+        moved: number of moved lines.
+        replaced_source: number of source lines replaced with target lines.
+        replaced_target: number of target lines replacing source lines.
+        similar: number of similar lines pairs (always 0 when similar lines are not searched).
+        blocks: number of opcodes of every tag.
+    """
+    equal: int = 0
+    inserted: int = 0
+    deleted: int = 0
+    moved: int = 0
+    replaced_source: int = 0
+    replaced_target: int = 0
+    similar: int = 0
+    blocks: Counter = field(default_factory=Counter)
+
+    def __bool__(self):
+        """Returns True if summarized diff has any differences."""
+        return any(tag != 'equal' for tag in self.blocks)
+
+    def ratio(self) -> float:
+        """
+        Returns similarity ratio of summarized texts in range [0.0, 1.0]: 2.0 * M / T, where M is number
+        of equal and moved lines, and T is total number of lines of both texts (like difflib.SequenceMatcher.ratio(),
+        but moved lines are matched). Pairs of similar lines are counted as not matched lines.
+
+        >>> DiffSummary(equal=3, moved=1, inserted=2, replaced_source=1, replaced_target=1).ratio()
+        0.6666666666666666
+        """
+        matched = self.equal + self.moved
+        total = 2 * (matched + self.similar) + self.inserted + self.deleted + self.replaced_source + \
+            self.replaced_target
+        return 2.0 * matched / total if total else 1.0
+
+    def count(self, opcodes: Iterable[OpCodeType]) -> 'DiffSummary':
+        """
+        Adds opcodes to the summary while they are iterated, so opcodes generator is never turned into list.
+        Replace opcodes of CompositeOpCode type with in-line opcodes (lazy ones in particular) are counted
+        as similar lines, without generating their in-line opcodes.
+        """
+        blocks = self.blocks
+        for opcode in opcodes:
+            tag, i1, i2, j1, j2 = opcode
+            blocks[tag] += 1
+            if tag == 'equal':
+                self.equal += i2 - i1
+            elif tag == 'insert':
+                self.inserted += j2 - j1
+            elif tag == 'delete':
+                self.deleted += i2 - i1
+            elif tag == 'move':
+                self.moved += i2 - i1
+            elif tag == 'replace':
+                if _is_similar(opcode):
+                    self.similar += 1
+                else:
+                    self.replaced_source += i2 - i1
+                    self.replaced_target += j2 - j1
+        return self
+
+    def format(self) -> str:
+        """Returns human-readable summary report."""
+        blocks = ', '.join(f'{tag} {number}' for tag, number in self.blocks.items())
+        return '\n'.join([
+            f'Equal lines: {self.equal}',
+            f'Inserted lines: {self.inserted}',
+            f'Deleted lines: {self.deleted}',
+            f'Moved lines: {self.moved}',
+            f'Replaced lines: {self.replaced_source} -> {self.replaced_target}',
+            f'Similar lines: {self.similar}',
+            f'Blocks: {blocks or "none"}',
+        ])
+
+
+def _is_similar(opcode: OpCodeType) -> bool:
+    # lazy composite opcodes are generated only for similar lines, so their in-line opcodes don't have to be generated
+    if isinstance(opcode, LazyCompositeOpCode):
+        return True
+    return isinstance(opcode, CompositeOpCode) and bool(opcode.children_opcodes)
+
+
+def diffstat(a: TextBuffer, b: TextBuffer, cutoff=1.0,
+             line_sm: SequenceMatcherBase = None,
+             case_sensitive=True,
+             progress: ProgressCallback = None,
+             cancel: CancellationToken = None) -> DiffSummary:
+    """
+    Returns summary of diff of input texts, generated the same way as diff_lines_with_similarities does.
+    Line level opcodes of the whole diff are generated, but similar lines are searched only when cutoff
+    is lower than 1.0 (which is the default, as it's the most expensive part of diff), and their in-line opcodes
+    are never generated.
+
+    :param a: source input text (str, or bytes-like buffer compared without decoding).
+    :param b: target input text (str, or bytes-like buffer compared without decoding).
+    :param cutoff: Line similarity cutoff, lines pairs with greater similarity ratio are counted as similar lines.
+    Similar lines are not searched if cutoff is 1.0.
+    :param line_sm: SequenceMatcher object used to generate diff tags between input texts lines.
+    :param case_sensitive: Whether to perform string case sensitive comparison.
+    :param progress: Callback called with (phase, done, total) arguments while diff is generated.
+    :param cancel: Cancellation token. DiffCancelledException is raised when cancellation is requested.
+    """
+    return session_diffstat(DiffSession(a, b), cutoff, line_sm, case_sensitive, progress, cancel)
+
+
+def diffstat_files(a: Path, b: Path, cutoff=1.0,
+                   line_sm: SequenceMatcherBase = None,
+                   case_sensitive=True,
+                   progress: ProgressCallback = None,
+                   cancel: CancellationToken = None,
+                   binary=False) -> DiffSummary:
+    """
+    Returns summary of diff of files (see diffstat), which are read the same way as they are by diff_files.
+    Identical files (see files_identical) are summarized by counting their lines, without diff generation.
+
+    :param binary: Whether to compare undecoded bytes lines (bytes mode).
+    """
+    stats = current_stats()
+    with phase(stats, 'identical_check'):
+        identical = files_identical(a, b)
+    if identical:
+        with phase(stats, 'read'):
+            lines = sum(len(chunk_lines) for chunk_lines in iter_file_line_chunks(a, binary=binary))
+        summary = DiffSummary(equal=lines)
+        if lines:
+            summary.blocks['equal'] = 1
+        return summary
+
+    with phase(stats, 'read'):
+        a_lines, b_lines = read_files_lines(a, b, binary=binary)
+    return session_diffstat(DiffSession.from_lines(a_lines, b_lines), cutoff, line_sm, case_sensitive,
+                            progress, cancel)
+
+
+def session_diffstat(session: DiffSession, cutoff=1.0, line_sm: SequenceMatcherBase = None, case_sensitive=True,
+                     progress: ProgressCallback = None, cancel: CancellationToken = None) -> DiffSummary:
+    """Returns summary of diff of session texts (see diffstat). Line opcodes are memoized by session."""
+    if not 0.0 <= cutoff <= 1.0:
+        raise ValueError('Cutoff must have value in range 0.0 <= cutoff <= 1.0')
+
+    with monitored(progress, cancel):
+        line_opcodes = session.line_opcodes(line_sm, case_sensitive=case_sensitive)
+        with phase(current_stats(), 'diffstat'):
+            if cutoff == 1.0:
+                return DiffSummary().count(line_opcodes)
+            a_lines, b_lines = session.normalized_lines(case_sensitive=case_sensitive)
+            return DiffSummary().count(extract_similarities(line_opcodes, a_lines, b_lines, cutoff,
+                                                            lazy_inline=True))
@@ -0,0 +1,244 @@
+"""
+This module compares a baseline text with many host texts at once (N-way fleet drift). Lines of all inputs are
+interned into one symbol table, so every distinct line is hashed and stored once, and presence of every symbol
+on hosts is kept as a bitmap (int with bit k set if host k has the line). Hosts missing baseline lines are read
+from bitmaps for every baseline line, and hosts with identical deviation signatures (sets of missing baseline lines
+and extra lines) are grouped. Hosts of group with identical lines form variants of group, so line level diff
+is generated only for a representative host of every variant.
+
+Example:
+    >>> drift = fleet_drift(['a', 'b', 'c'], {'h1': ['a', 'b', 'c'], 'h2': ['a', 'c'], 'h3': ['c', 'a', 'x']})
+    >>> drift.deviating_hosts(1)
+    ['h2', 'h3']
+    >>> [(group.hosts, group.missing, group.extra) for group in drift.groups]
+    [(['h1'], [], []), (['h2'], [1], []), (['h3'], [1], ['x'])]
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from mdiff.seqmatch.heckel import HeckelSequenceMatcher
+from mdiff.stats import current_stats, phase
+from mdiff.utils import OpCode, OpCodeType, SequenceMatcherBase, Text, read_file_lines
+
+
+class SymbolTable:
+    """
+    Interns lines into integer symbols. Symbols are shared by all inputs, lines are normalized
+    (lowercased when comparison isn't case sensitive) before they are interned.
+    """
+
+    def __init__(self, case_sensitive=True):
+        self.case_sensitive = case_sensitive
+        self.symbols: Dict[Text, int] = {}
+        # the first interned line of every symbol
+        self.lines: List[Text] = []
+
+    def __len__(self):
+        return len(self.lines)
+
+    def intern(self, lines: Iterable[Text]) -> List[int]:
+        """Returns symbols of lines, new symbols are assigned to lines which weren't interned yet."""
+        symbols = self.symbols
+        ids = []
+        for line in lines:
+            key = line if self.case_sensitive else line.lower()
+            symbol = symbols.get(key)
+            if symbol is None:
+                symbol = symbols[key] = len(self.lines)
+                self.lines.append(line)
+            ids.append(symbol)
+        return ids
+
+
+@dataclass
+class HostVariant:
+    """
+    Hosts with identical lines (including order and repetitions of lines).
+        hosts: names of hosts, the first one is representative of variant.
+        opcodes: line level opcodes of baseline and representative host lines.
+    """
+    hosts: List[str]
+    opcodes: List[OpCodeType] = field(default_factory=list, repr=False)
+
+    @property
+    def representative(self) -> str:
+        return self.hosts[0]
+
+
+@dataclass
+class HostGroup:
+    """
+    Hosts with identical deviation signature.
+        hosts: names of hosts.
+        missing: indexes of baseline lines missing on hosts (the first occurrence of every missing line).
+        extra: lines of hosts missing in baseline.
+        variants: hosts of group with identical lines, ordered by their first hosts (hosts with different order
+        or repetitions of lines have different diffs).
+    """
+    hosts: List[str]
+    missing: List[int]
+    extra: List[Text]
+    variants: List[HostVariant] = field(default_factory=list, repr=False)
+
+
+class FleetDrift:
+    """
+    Result of N-way comparison of baseline and hosts (see fleet_drift).
+        table: symbol table shared by all inputs.
+        baseline: symbols of baseline lines.
+        hosts: names of hosts.
+        presence: bitmap of hosts having every symbol (bit k is set if hosts[k] has line of the symbol).
+        groups: hosts grouped by deviation signatures, ordered by their first hosts.
+    Symbols of hosts lines are kept only for representatives of groups variants (see host_lines).
+    """
+
+    def __init__(self, table: SymbolTable, baseline: List[int], hosts: List[str], presence: List[int],
+                 groups: List[HostGroup], representatives: Dict[str, Sequence[int]]):
+        self.table = table
+        self.baseline = baseline
+        self.hosts = hosts
+        self.presence = presence
+        self.groups = groups
+        self._representatives = representatives
+
+    def baseline_lines(self) -> List[Text]:
+        return [self.table.lines[s] for s in self.baseline]
+
+    def host_lines(self, host: str) -> List[Text]:
+        """Returns lines of representative host (as they were interned)."""
+        return [self.table.lines[s] for s in self._representatives[host]]
+
+    def deviation_bitmap(self, i: int) -> int:
+        """Returns bitmap of hosts missing i-th baseline line."""
+        return ~self.presence[self.baseline[i]] & ((1 << len(self.hosts)) - 1)
+
+    def deviating_hosts(self, i: int) -> List[str]:
+        """Returns names of hosts missing i-th baseline line."""
+        return [self.hosts[k] for k in _bits(self.deviation_bitmap(i))]
+
+    def line_deviations(self) -> List[Tuple[int, List[str]]]:
+        """Returns (index, deviating hosts) of every baseline line missing on any host."""
+        return [(i, self.deviating_hosts(i)) for i in range(len(self.baseline)) if self.deviation_bitmap(i)]
+
+
+def _bits(bitmap: int) -> Iterable[int]:
+    """Yields indexes of set bits of bitmap in ascending order."""
+    while bitmap:
+        low = bitmap & -bitmap
+        yield low.bit_length() - 1
+        bitmap ^= low
+
+
+def fleet_drift(baseline: Sequence[Text], hosts: Mapping[str, Iterable[Text]],
+                line_sm: SequenceMatcherBase = None, case_sensitive=True) -> FleetDrift:
+    """
+    Compares baseline lines with lines of every host (N-way diff). Baseline is interned once and every host
+    only adds its new lines to the shared symbol table. Host deviation signature is a pair of sets:
+    baseline lines missing on host and host lines missing in baseline (order and repetitions of lines are not
+    a part of signature). Hosts of group with identical lines form its variants, and diff of baseline and host
+    lines is generated only for the first host of every variant.
+
+    :param baseline: baseline lines.
+    :param hosts: lines of hosts by host names. Hosts lines are interned one at a time (i.e. they can be read
+    by lazy mapping), and only their symbols are kept until groups are known (shared by identical hosts).
+    :param line_sm: SequenceMatcher object used to generate diff of baseline and representative hosts symbols.
+    :param case_sensitive: Whether to perform string case sensitive comparison.
+    """
+    if line_sm is None:
+        line_sm = HeckelSequenceMatcher()
+    stats = current_stats()
+    table = SymbolTable(case_sensitive)
+    with phase(stats, 'fleet_intern'):
+        baseline_ids = table.intern(baseline)
+        baseline_symbols = len(table)
+        presence = [0] * baseline_symbols
+        names = []
+        extras = []
+        # hosts with identical lines share their symbols tuple
+        hosts_ids: List[Tuple[int, ...]] = []
+        unique_ids: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+        for k, (name, lines) in enumerate(hosts.items()):
+            ids = tuple(table.intern(lines))
+            ids = unique_ids.setdefault(ids, ids)
+            presence.extend([0] * (len(table) - len(presence)))
+            bit = 1 << k
+            host_symbols = set(ids)
+            for s in host_symbols:
+                presence[s] |= bit
+            names.append(name)
+            extras.append(tuple(sorted(s for s in host_symbols if s >= baseline_symbols)))
+            hosts_ids.append(ids)
+        unique_ids.clear()
+
+    with phase(stats, 'fleet_deviations'):
+        missing: List[List[int]] = [[] for _ in names]
+        first_index: Dict[int, int] = {}
+        all_hosts = (1 << len(names)) - 1
+        for i, s in enumerate(baseline_ids):
+            if s in first_index:
+                continue
+            first_index[s] = i
+            for k in _bits(~presence[s] & all_hosts):
+                missing[k].append(s)
+
+        groups: Dict[Tuple[Tuple[int, ...], Tuple[int, ...]], HostGroup] = {}
+        # symbols determine signature, so variants of all groups are kept by shared symbols tuples of identical hosts
+        variants: Dict[Tuple[int, ...], HostVariant] = {}
+        representatives: Dict[str, Tuple[int, ...]] = {}
+        for k, name in enumerate(names):
+            key = tuple(missing[k]), extras[k]
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = HostGroup(hosts=[], missing=[first_index[s] for s in missing[k]],
+                                                extra=[table.lines[s] for s in extras[k]])
+            group.hosts.append(name)
+            ids = hosts_ids[k]
+            variant = variants.get(ids)
+            if variant is None:
+                variant = variants[ids] = HostVariant(hosts=[])
+                group.variants.append(variant)
+                representatives[name] = ids
+            variant.hosts.append(name)
+        hosts_ids.clear()
+
+    with phase(stats, 'fleet_diffs'):
+        for variant in variants.values():
+            host_ids = list(representatives[variant.representative])
+            if host_ids == baseline_ids:
+                variant.opcodes = [OpCode('equal', 0, len(host_ids), 0, len(host_ids))] if host_ids else []
+            else:
+                line_sm.set_seqs(baseline_ids, host_ids)
+                variant.opcodes = line_sm.get_opcodes()
+    return FleetDrift(table, baseline_ids, names, presence, list(groups.values()), representatives)
+
+
+def fleet_drift_files(baseline: Path, hosts: Sequence[Path], line_sm: SequenceMatcherBase = None,
+                      case_sensitive=True, binary=False) -> FleetDrift:
+    """
+    Compares baseline file with files of hosts (see fleet_drift), host names are paths of files.
+    Files are read the same way as they are by diff_files, one at a time.
+
+    :param binary: Whether to compare undecoded bytes lines (bytes mode).
+    """
+    with phase(current_stats(), 'read'):
+        baseline_lines = read_file_lines(baseline, binary=binary)
+    host_lines = _LazyHostLines(hosts, binary)
+    return fleet_drift(baseline_lines, host_lines, line_sm=line_sm, case_sensitive=case_sensitive)
+
+
+class _LazyHostLines(Mapping):
+    """Mapping of host names to their files lines, files are read while items are iterated."""
+
+    def __init__(self, hosts: Sequence[Path], binary: bool):
+        self.hosts = {str(p): Path(p) for p in hosts}
+        self.binary = binary
+
+    def __getitem__(self, name: str) -> List[Text]:
+        return read_file_lines(self.hosts[name], binary=self.binary)
+
+    def __iter__(self):
+        return iter(self.hosts)
+
+    def __len__(self):
+        return len(self.hosts)
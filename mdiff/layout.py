@@ -0,0 +1,194 @@
+"""
+This module provides DiffLayout class - side by side rows model of opcodes shared by diff presentation layers.
+"""
+from array import array
+from bisect import bisect_right, bisect_left
+from itertools import repeat
+from typing import Sequence, List, Optional, Tuple, Generator
+
+from mdiff.utils import OpCodeType
+
+LAYOUT_TAGS = ('equal', 'insert', 'delete', 'replace', 'move', 'moved')
+LAYOUT_TAG_CODES = {tag: code for code, tag in enumerate(LAYOUT_TAGS)}
+NO_LINE = -1
+
+LayoutRow = Tuple[Optional[int], Optional[int], str]
+
+
+class DiffLayout:
+    """
+    Aligned side by side layout of opcodes. Every opcode is expanded into max(i2 - i1, j2 - j1) rows,
+    where every row presents a line from sequence "a", a line from sequence "b" or both of them.
+
+    Layout is built once and stores compact arrays, so lookups (which opcode covers given line, which row
+    presents given line, where is the next change) are logarithmic instead of linear scans over opcodes.
+
+    Parameters:
+        opcodes: sequence of opcodes (i.e. generated by SequenceMatcher.get_opcodes()).
+
+    Attributes:
+        a_idx: "a" line index presented in a row (NO_LINE for a filler).
+        b_idx: "b" line index presented in a row (NO_LINE for a filler).
+        tags: tag code (index in LAYOUT_TAGS) of a row.
+        change_rows: sorted first rows of change blocks (consecutive non "equal" opcodes).
+        change_ends: rows where change blocks end (exclusive).
+    """
+
+    def __init__(self, opcodes: Sequence[OpCodeType]):
+        self.opcodes = list(opcodes)
+        self.a_idx = array('q')
+        self.b_idx = array('q')
+        self.tags = array('b')
+        # first rows of non-empty opcodes and their indexes in opcodes list
+        self.opcode_rows = array('q')
+        self.row_opcodes = array('q')
+        self.change_rows = array('q')
+        self.change_ends = array('q')
+        # interval indexes of opcodes covering lines of "a" and "b"
+        a_intervals = []
+        b_intervals = []
+
+        row = 0
+        in_change = False
+        for n, (tag, i1, i2, j1, j2) in enumerate(self.opcodes):
+            left_len = i2 - i1
+            right_len = j2 - j1
+            height = max(left_len, right_len)
+            if not height:
+                continue
+            self.opcode_rows.append(row)
+            self.row_opcodes.append(n)
+            self.a_idx.extend(range(i1, i2))
+            self.a_idx.extend(repeat(NO_LINE, height - left_len))
+            self.b_idx.extend(range(j1, j2))
+            self.b_idx.extend(repeat(NO_LINE, height - right_len))
+            self.tags.extend(repeat(LAYOUT_TAG_CODES[tag], height))
+            if left_len:
+                a_intervals.append((i1, n))
+            if right_len:
+                b_intervals.append((j1, n))
+
+            if tag == 'equal':
+                if in_change:
+                    self.change_ends.append(row)
+                in_change = False
+            elif not in_change:
+                self.change_rows.append(row)
+                in_change = True
+            row += height
+        if in_change:
+            self.change_ends.append(row)
+
+        a_intervals.sort()
+        b_intervals.sort()
+        self._a_starts = array('q', (i for i, _ in a_intervals))
+        self._a_opcodes = array('q', (n for _, n in a_intervals))
+        self._b_starts = array('q', (j for j, _ in b_intervals))
+        self._b_opcodes = array('q', (n for _, n in b_intervals))
+
+    def __len__(self):
+        return len(self.tags)
+
+    def row(self, row: int) -> LayoutRow:
+        """Returns (a_idx, b_idx, tag) of a row, where a_idx or b_idx is None for a filler."""
+        a_idx = self.a_idx[row]
+        b_idx = self.b_idx[row]
+        return (None if a_idx == NO_LINE else a_idx,
+                None if b_idx == NO_LINE else b_idx,
+                LAYOUT_TAGS[self.tags[row]])
+
+    def opcode_index_at_row(self, row: int) -> int:
+        """Returns index of opcode presented in a row."""
+        if not 0 <= row < len(self):
+            raise IndexError('row index out of range')
+        return self.row_opcodes[bisect_right(self.opcode_rows, row) - 1]
+
+    def opcode_at_row(self, row: int) -> OpCodeType:
+        return self.opcodes[self.opcode_index_at_row(row)]
+
+    def opcode_start_row(self, opcode_index: int) -> int:
+        """Returns first row of opcode (opcode must not be empty)."""
+        k = bisect_left(self.row_opcodes, opcode_index)
+        if k == len(self.row_opcodes) or self.row_opcodes[k] != opcode_index:
+            raise ValueError('opcode is not present in layout')
+        return self.opcode_rows[k]
+
+    @staticmethod
+    def _find_interval(starts: array, opcodes: array, idx: int) -> int:
+        k = bisect_right(starts, idx) - 1
+        return opcodes[k] if k >= 0 else -1
+
+    def opcode_index_at_a(self, i: int) -> Optional[int]:
+        """Returns index of opcode covering line a[i] or None if none of opcodes covers it."""
+        n = self._find_interval(self._a_starts, self._a_opcodes, i)
+        if n < 0:
+            return None
+        _, i1, i2, _, _ = self.opcodes[n]
+        return n if i1 <= i < i2 else None
+
+    def opcode_index_at_b(self, j: int) -> Optional[int]:
+        """Returns index of opcode covering line b[j] or None if none of opcodes covers it."""
+        n = self._find_interval(self._b_starts, self._b_opcodes, j)
+        if n < 0:
+            return None
+        _, _, _, j1, j2 = self.opcodes[n]
+        return n if j1 <= j < j2 else None
+
+    def row_of_a(self, i: int) -> Optional[int]:
+        """Returns row presenting line a[i]."""
+        n = self.opcode_index_at_a(i)
+        if n is None:
+            return None
+        return self.opcode_start_row(n) + i - self.opcodes[n][1]
+
+    def row_of_b(self, j: int) -> Optional[int]:
+        """Returns row presenting line b[j]."""
+        n = self.opcode_index_at_b(j)
+        if n is None:
+            return None
+        return self.opcode_start_row(n) + j - self.opcodes[n][3]
+
+    def next_change(self, row: int) -> Optional[int]:
+        """Returns first row of the nearest change block starting after row."""
+        k = bisect_right(self.change_rows, row)
+        return self.change_rows[k] if k < len(self.change_rows) else None
+
+    def prev_change(self, row: int) -> Optional[int]:
+        """Returns first row of the nearest change block starting before row."""
+        k = bisect_left(self.change_rows, row) - 1
+        return self.change_rows[k] if k >= 0 else None
+
+    def context_ranges(self, context: int) -> List[Tuple[int, int]]:
+        """
+        Returns sorted and merged row ranges (start, stop) containing change blocks with "context" rows
+        around them. Rows out of those ranges can be folded.
+        """
+        ranges = []
+        for start, stop in zip(self.change_rows, self.change_ends):
+            start = max(start - context, 0)
+            stop = min(stop + context, len(self))
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1] = (ranges[-1][0], stop)
+            else:
+                ranges.append((start, stop))
+        return ranges
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) \
+            -> Generator[Tuple[int, OpCodeType, int], None, None]:
+        """
+        Iterates over rows in range [start, stop). Yields tuples (row, opcode, offset) where offset is position
+        of a row within opcode rows.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        k = bisect_right(self.opcode_rows, start) - 1
+        row = start
+        while row < stop:
+            opcode = self.opcodes[self.row_opcodes[k]]
+            opcode_start = self.opcode_rows[k]
+            opcode_stop = self.opcode_rows[k + 1] if k + 1 < len(self.opcode_rows) else len(self)
+            for r in range(row, min(opcode_stop, stop)):
+                yield r, opcode, r - opcode_start
+            row = opcode_stop
+            k += 1
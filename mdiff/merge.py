@@ -0,0 +1,468 @@
+"""
+This module provides move-aware three-way merge of lines. Base, ours and theirs lines are interned into one symbol
+table, and occurrences of base symbols are indexed once for diffs of both sides (see DisplacementAlgorithm.match).
+Changes of both sides are merged in base coordinates (like diff3 does): changes of different base lines
+are applied, overlapping or adjacent different changes are conflicts. Moves are merged separately: every base line
+is placed after its predecessor in the side which moved it, so edits of one side travel with lines moved by the other
+side. Lines moved by both sides to different positions are move conflicts.
+
+Example:
+    >>> base = ['[a]', 'x = 1', '[b]', 'y = 2']
+    >>> ours = ['[b]', 'y = 2', '[a]', 'x = 1']
+    >>> theirs = ['[a]', 'x = 10', '[b]', 'y = 2']
+    >>> merge3(base, ours, theirs).lines()
+    ['[b]', 'y = 2', '[a]', 'x = 10']
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from mdiff.fleet import SymbolTable
+from mdiff.seqmatch.heckel import DisplacementAlgorithm, HeckelOpCodeExtractor, _occurrences
+from mdiff.stats import current_stats, phase
+from mdiff.utils import OpCode, OpCodeType, SequenceMatcherBase, Text, TextBuffer, split_lines
+
+EDIT_CONFLICT = 'edit'
+MOVE_CONFLICT = 'move'
+
+
+@dataclass
+class MergeConflict:
+    """
+    Conflicting changes of merged texts.
+        base: base lines of conflict region.
+        ours: our lines of conflict region.
+        theirs: their lines of conflict region.
+        kind: "edit" for different changes of the same (or adjacent) base lines, "move" for lines moved by both sides
+        to different positions (ours lines are placed at our position, theirs lines at their position).
+    """
+    base: List[Text] = field(default_factory=list)
+    ours: List[Text] = field(default_factory=list)
+    theirs: List[Text] = field(default_factory=list)
+    kind: str = EDIT_CONFLICT
+
+
+MergeChunk = Union[Text, MergeConflict]
+
+
+@dataclass
+class MergeResult:
+    """
+    Result of three-way merge.
+        chunks: merged lines and conflicts at their positions.
+    """
+    chunks: List[MergeChunk]
+
+    @property
+    def conflicts(self) -> List[MergeConflict]:
+        return [chunk for chunk in self.chunks if isinstance(chunk, MergeConflict)]
+
+    def lines(self, ours_name='ours', base_name='base', theirs_name='theirs') -> List[Text]:
+        """
+        Returns merged lines, conflicts are presented with diff3 style markers (of the same type as lines).
+        """
+        result = []
+        for chunk in self.chunks:
+            if not isinstance(chunk, MergeConflict):
+                result.append(chunk)
+                continue
+            lines = chunk.base + chunk.ours + chunk.theirs
+            like = lines[0] if lines else ''
+            markers = [f'<<<<<<< {ours_name}', f'||||||| {base_name}', '=======', f'>>>>>>> {theirs_name}']
+            if isinstance(like, bytes):
+                markers = [marker.encode() for marker in markers]
+            result.append(markers[0])
+            result.extend(chunk.ours)
+            result.append(markers[1])
+            result.extend(chunk.base)
+            result.append(markers[2])
+            result.extend(chunk.theirs)
+            result.append(markers[3])
+        return result
+
+
+class BaseIndex:
+    """Symbols of base lines and their occurrences (CSR offsets and positions), built once for many diffs."""
+
+    def __init__(self, ids: List[int], symbols: int):
+        self.ids = ids
+        self.symbols = symbols
+        self.occurrences = _occurrences(ids, symbols)
+
+
+class IndexedDisplacementAlgorithm(DisplacementAlgorithm):
+    """
+    DisplacementAlgorithm comparing interned base with sequence of symbols of the same symbol table.
+    Occurrences of base symbols are taken from the index, so only the other sequence is indexed.
+    """
+
+    def __init__(self, index: BaseIndex, b_ids: List[int]):
+        super().__init__(index.ids, b_ids)
+        self.index = index
+
+    def run(self):
+        self.setup()
+        self.a_ids = self.a
+        self.b_ids = self.b
+        with phase(current_stats(), 'symbol_table'):
+            b_occurrences = _occurrences(self.b_ids, self.index.symbols)
+        self.match(self.index.symbols, self.index.occurrences, b_occurrences)
+
+
+class _Side:
+    """
+    Changes of side relative to base, in base coordinates.
+        pos: side position of every base line (-1 if base line isn't matched).
+        moved: whether side relocates every base line (unmatched lines follow their base predecessor).
+        parent: base line after which every relocated base line is placed by side (-1 for the beginning).
+        changes: (i1, i2, side positions) replacements of base lines [i1:i2) (insertions if i1 == i2).
+    """
+
+    def __init__(self, base_len: int, side_len: int, opcodes: Sequence[OpCodeType]):
+        pos = [-1] * base_len
+        moved = [False] * base_len
+        base_of = [-1] * side_len
+        moves: Dict[int, int] = {}
+        targets: Dict[int, int] = {}
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                pos[i1:i2] = range(j1, j2)
+                base_of[j1:j2] = range(i1, i2)
+            elif tag == 'move':
+                moves[i1] = i2
+            elif tag == 'moved':
+                targets[i1] = j1
+        for i1, i2 in moves.items():
+            j1 = targets[i1]
+            pos[i1:i2] = range(j1, j1 + i2 - i1)
+            base_of[j1:j1 + i2 - i1] = range(i1, i2)
+            moved[i1:i2] = [True] * (i2 - i1)
+
+        # predecessor of every matched base line in side, and side lines inserted after matched base lines
+        side_pred = [-1] * base_len
+        inserted: Dict[int, List[int]] = {}
+        last = -1
+        for j, i in enumerate(base_of):
+            if i >= 0:
+                side_pred[i] = last
+                last = i
+            else:
+                inserted.setdefault(last, []).append(j)
+
+        self.pos = pos
+        self.moved = moved
+        self.parent = [-1] * base_len
+        prev_matched = -1
+        for i in range(base_len):
+            if pos[i] < 0:
+                # unmatched line follows its base predecessor
+                self.moved[i] = i > 0 and self.moved[i - 1]
+                self.parent[i] = i - 1
+                continue
+            if moved[i]:
+                p = side_pred[i]
+                if p < i and prev_matched == p:
+                    # lines between predecessor and line which aren't matched follow predecessor as well
+                    self.parent[i] = i - 1
+                elif p + 1 < base_len and pos[p + 1] < 0 and p in inserted:
+                    # lines inserted after predecessor replace the next base line, so line follows them
+                    self.parent[i] = p + 1
+                else:
+                    self.parent[i] = p
+            prev_matched = i
+
+        self.changes: List[Tuple[int, int, List[int]]] = []
+        i = 0
+        while i <= base_len:
+            i2 = i
+            while i2 < base_len and pos[i2] < 0:
+                i2 += 1
+            content = inserted.get(i - 1, [])
+            if content or i2 > i:
+                self.changes.append((i, i2, content))
+            i = i2 + 1 if i2 > i else i + 1
+
+
+def _collapse_unchanged(base_ids: List[int], side_ids: List[int], opcodes: Sequence[OpCodeType]) -> List[OpCodeType]:
+    """
+    Returns opcodes of line matcher with lines which don't change base turned into equal blocks: lines at
+    the beginning and the end of replaced blocks identical to replaced base lines (i.e. Heckel replaces blocks
+    of duplicated lines by identical lines). Moves are kept, as they are detected relative to equal blocks.
+    """
+    collapsed: List[OpCodeType] = []
+    for opcode in opcodes:
+        tag, i1, i2, j1, j2 = opcode
+        if tag != 'replace':
+            collapsed.append(opcode)
+            continue
+        while i1 < i2 and j1 < j2 and base_ids[i1] == side_ids[j1]:
+            i1, j1 = i1 + 1, j1 + 1
+        while i1 < i2 and j1 < j2 and base_ids[i2 - 1] == side_ids[j2 - 1]:
+            i2, j2 = i2 - 1, j2 - 1
+        if i1 > opcode[1]:
+            collapsed.append(OpCode('equal', opcode[1], i1, opcode[3], j1))
+        if i1 < i2 or j1 < j2:
+            tag = 'replace' if i1 < i2 and j1 < j2 else 'delete' if i1 < i2 else 'insert'
+            collapsed.append(OpCode(tag, i1, i2, j1, j2))
+        if i2 < opcode[2]:
+            collapsed.append(OpCode('equal', i2, opcode[2], j2, opcode[4]))
+    return collapsed
+
+
+def _as_lines(text: Union[TextBuffer, Sequence[Text]]) -> List[Text]:
+    return split_lines(text) if isinstance(text, (str, bytes, bytearray, memoryview)) else list(text)
+
+
+def merge3(base: Union[TextBuffer, Sequence[Text]], ours: Union[TextBuffer, Sequence[Text]],
+           theirs: Union[TextBuffer, Sequence[Text]], line_sm: SequenceMatcherBase = None) -> MergeResult:
+    """
+    Merges changes of ours and theirs texts made to base text, detecting moved lines.
+
+    Changes (inserted, deleted and replaced lines) are merged in base coordinates: changes of one side,
+    or identical changes of both sides are applied, different changes of the same or adjacent base lines
+    are edit conflicts. Then lines are ordered by moves of both sides: base line moved by one side is placed after
+    its predecessor in that side, together with changes of the other side made to it (i.e. block moved by one side
+    and edited by the other one is moved and edited). Lines moved by both sides to different positions are
+    move conflicts.
+
+    Lines are interned once, base is indexed once for diffs of both sides with DisplacementSequenceMatcher algorithm
+    by default, and merge runs in time linear in size of inputs (besides diffs).
+
+    :param base: common ancestor text (str or bytes-like buffer split into lines, or sequence of lines).
+    :param ours: our text.
+    :param theirs: their text.
+    :param line_sm: SequenceMatcher object used to generate diffs of symbols of base and sides lines instead
+    of the default one (e.g. HeckelSequenceMatcher). Moves are detected only by matchers generating "move" opcodes.
+    """
+    stats = current_stats()
+    base, ours, theirs = _as_lines(base), _as_lines(ours), _as_lines(theirs)
+    with phase(stats, 'merge_intern'):
+        table = SymbolTable()
+        base_ids = table.intern(base)
+        ours_ids = table.intern(ours)
+        theirs_ids = table.intern(theirs)
+        index = BaseIndex(base_ids, len(table)) if line_sm is None else None
+
+    sides = []
+    for side_ids in (ours_ids, theirs_ids):
+        with phase(stats, 'merge_diff'):
+            if line_sm is None:
+                alg = IndexedDisplacementAlgorithm(index, side_ids)
+                alg.run()
+                opcodes = HeckelOpCodeExtractor(alg).get_opcodes()
+            elif side_ids == base_ids:
+                opcodes = [OpCode('equal', 0, len(base_ids), 0, len(base_ids))] if base_ids else []
+            else:
+                line_sm.set_seqs(base_ids, side_ids)
+                opcodes = _collapse_unchanged(base_ids, side_ids, line_sm.get_opcodes())
+        sides.append(_Side(len(base_ids), len(side_ids), opcodes))
+
+    with phase(stats, 'merge'):
+        return _Merger(base, ours, theirs, *sides).merge()
+
+
+class _Merger:
+    """Merges changes of sides in base coordinates and orders lines by moves of both sides."""
+
+    def __init__(self, base: List[Text], ours: List[Text], theirs: List[Text], ours_side: _Side, theirs_side: _Side):
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+        self.ours_side = ours_side
+        self.theirs_side = theirs_side
+        n = len(base)
+        # merged content replacing base line (None for unchanged line) and content inserted after base line
+        # (gap -1 is the beginning of text, so it's stored at index n)
+        self.line_content: List[Optional[List[MergeChunk]]] = [None] * n
+        self.gap_content: List[List[MergeChunk]] = [[] for _ in range(n + 1)]
+
+    def merge(self) -> MergeResult:
+        self._merge_changes()
+        return MergeResult(_coalesce(self._order_lines()))
+
+    def _merge_changes(self):
+        """Groups overlapping and adjacent changes of both sides, and applies them or marks them as conflicts."""
+        changes = sorted([(i1, i2, 0, content) for i1, i2, content in self.ours_side.changes] +
+                         [(i1, i2, 1, content) for i1, i2, content in self.theirs_side.changes])
+        groups = []
+        for change in changes:
+            if groups and change[0] <= groups[-1][1]:
+                group = groups[-1]
+                group[1] = max(group[1], change[1])
+                group[2].append(change)
+            else:
+                groups.append([change[0], change[1], [change]])
+
+        for g1, g2, members in groups:
+            ours_changes = [i for i in members if i[2] == 0]
+            theirs_changes = [i for i in members if i[2] == 1]
+            if not theirs_changes:
+                self._apply(ours_changes, self.ours)
+            elif not ours_changes:
+                self._apply(theirs_changes, self.theirs)
+            else:
+                ours_lines = self._side_lines(g1, g2, ours_changes, self.ours)
+                theirs_lines = self._side_lines(g1, g2, theirs_changes, self.theirs)
+                if ours_lines == theirs_lines:
+                    self._apply(ours_changes, self.ours)
+                else:
+                    conflict = MergeConflict(self.base[g1:g2], ours_lines, theirs_lines)
+                    self._place(g1, g2, [conflict])
+
+    def _side_lines(self, g1: int, g2: int, changes: list, side: List[Text]) -> List[Text]:
+        """Returns lines of side replacing base lines [g1:g2)."""
+        lines = []
+        i = g1
+        for i1, i2, _, content in changes:
+            lines.extend(self.base[i:i1])
+            lines.extend(side[j] for j in content)
+            i = i2
+        lines.extend(self.base[i:g2])
+        return lines
+
+    def _apply(self, changes: list, side: List[Text]):
+        for i1, i2, _, content in changes:
+            self._place(i1, i2, [side[j] for j in content])
+
+    def _place(self, i1: int, i2: int, chunks: List[MergeChunk]):
+        """Places chunks replacing base lines [i1:i2), or inserted before base line i1 if i1 == i2."""
+        if i1 == i2:
+            self.gap_content[i1 - 1].extend(chunks)
+            return
+        self.line_content[i1] = chunks
+        for i in range(i1 + 1, i2):
+            self.line_content[i] = []
+
+    def _order_lines(self) -> List[MergeChunk]:
+        """Orders merged content of base lines by moves of both sides."""
+        n = len(self.base)
+        ours, theirs = self.ours_side, self.theirs_side
+        moved = [o or t for o, t in zip(ours.moved, theirs.moved)]
+        parent = [ours.parent[i] if ours.moved[i] else theirs.parent[i] for i in range(n)]
+
+        # lines moved by both sides to different positions and lines following them in both sides are conflicts
+        conflicted = [False] * n
+        followers: Dict[int, List[int]] = {}
+        stack = []
+        for i in range(n):
+            if ours.moved[i] and theirs.moved[i]:
+                if ours.parent[i] != theirs.parent[i]:
+                    conflicted[i] = True
+                    stack.append(i)
+                else:
+                    followers.setdefault(ours.parent[i], []).append(i)
+        while stack:
+            for i in followers.pop(stack.pop(), ()):
+                if not conflicted[i]:
+                    conflicted[i] = True
+                    stack.append(i)
+
+        chunks, visited = self._traverse(moved, parent, conflicted)
+        if not all(visited):
+            # moves of both sides make cycles, lines of cycles stay at their base positions
+            for i in self._cycles(parent, visited):
+                moved[i] = False
+                conflicted[i] = False
+                self._mark_cycle(i)
+            chunks, _ = self._traverse(moved, parent, conflicted)
+        return chunks
+
+    @staticmethod
+    def _cycles(parent: List[int], visited: List[bool]) -> List[int]:
+        """Returns lines of cycles of parents of lines which weren't visited."""
+        state = [2 if v else 0 for v in visited]
+        cycles = []
+        for i in range(len(parent)):
+            path = []
+            while i >= 0 and state[i] == 0:
+                state[i] = 1
+                path.append(i)
+                i = parent[i]
+            if i >= 0 and state[i] == 1:
+                cycles.extend(path[path.index(i):])
+            for j in path:
+                state[j] = 2
+        return cycles
+
+    def _mark_cycle(self, i: int):
+        lines = _flatten(self._own_content(i))
+        self.line_content[i] = [MergeConflict(list(lines), list(lines), list(lines), MOVE_CONFLICT)] if lines else []
+        self.gap_content[i] = []
+
+    def _traverse(self, moved: List[bool], parent: List[int], conflicted: List[bool]) \
+            -> Tuple[List[MergeChunk], List[bool]]:
+        """
+        Emits content of base lines in pre-order of tree, where every line is a child of line it's placed after.
+        Children of line are: the next base line following it, other lines moved after it, their lines of move
+        conflicts moved after it, and the next line which isn't moved. Node n is the beginning of text,
+        node n + 1 + i is their position of conflicted line i.
+        """
+        n = len(self.base)
+        root = n
+        children: List[List[int]] = [[] for _ in range(2 * n + 1)]
+        for i in range(n):
+            if moved[i] and parent[i] == i - 1:
+                children[i - 1 if i else root].append(i)
+        for i in range(n):
+            if moved[i] and parent[i] != i - 1:
+                children[parent[i] if parent[i] >= 0 else root].append(i)
+        for i in range(n):
+            if conflicted[i]:
+                p = self.theirs_side.parent[i]
+                children[root if p < 0 else n + 1 + p if conflicted[p] else p].append(n + 1 + i)
+        last = root
+        for i in range(n):
+            if not moved[i]:
+                children[last].append(i)
+                last = i
+
+        chunks: List[MergeChunk] = []
+        visited = [False] * n
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            stack.extend(reversed(children[node]))
+            if node == root:
+                chunks.extend(self.gap_content[-1])
+            elif node > n:
+                chunks.append(MergeConflict(theirs=_flatten(self._own_content(node - n - 1)), kind=MOVE_CONFLICT))
+            else:
+                visited[node] = True
+                content = self._own_content(node)
+                if conflicted[node]:
+                    content = [MergeConflict(ours=_flatten(content), kind=MOVE_CONFLICT)]
+                chunks.extend(content)
+        return chunks, visited
+
+    def _own_content(self, i: int) -> List[MergeChunk]:
+        """Returns merged content of base line and content inserted after it."""
+        content = self.line_content[i]
+        if content is None:
+            content = [self.base[i]]
+        return content + self.gap_content[i]
+
+
+def _flatten(chunks: List[MergeChunk]) -> List[Text]:
+    """Returns lines of chunks, our lines of conflicts are used."""
+    lines = []
+    for chunk in chunks:
+        if isinstance(chunk, MergeConflict):
+            lines.extend(chunk.ours)
+        else:
+            lines.append(chunk)
+    return lines
+
+
+def _coalesce(chunks: List[MergeChunk]) -> List[MergeChunk]:
+    """Joins consecutive conflicts of the same kind and drops empty move conflicts."""
+    result = []
+    for chunk in chunks:
+        if isinstance(chunk, MergeConflict):
+            if chunk.kind == MOVE_CONFLICT and not (chunk.base or chunk.ours or chunk.theirs):
+                continue
+            previous = result[-1] if result else None
+            if isinstance(previous, MergeConflict) and previous.kind == chunk.kind:
+                result[-1] = MergeConflict(previous.base + chunk.base, previous.ours + chunk.ours,
+                                           previous.theirs + chunk.theirs, chunk.kind)
+                continue
+        result.append(chunk)
+    return result
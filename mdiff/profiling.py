@@ -0,0 +1,124 @@
+"""
+This module provides profiling hook for diff and render pipeline. Profiler runs cProfile and a lightweight sampling
+thread at the same time, and writes two files:
+    <path>: cProfile statistics readable with pstats module (or tools like snakeviz).
+    <path without suffix>.collapsed: flamegraph-compatible collapsed stacks where the root frames of every stack
+        are names of mdiff phases (see mdiff.stats) active when the sample was taken, i.e. "[similarities];[inline]".
+
+Profiling is enabled with "mdiff --profile out.prof" option or by setting MDIFF_PROFILE environment variable
+to the output path, which profiles every DiffSession.diff() call and diff printing in library use.
+Profiles of consecutive calls with the same output path are accumulated.
+"""
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Optional, List, ContextManager, Union
+
+from mdiff.stats import DiffStats, current_stats, collect_stats
+
+PROFILE_ENV_VARIABLE = 'MDIFF_PROFILE'
+NO_PHASE = '[mdiff]'
+
+_profilers: Dict[Path, 'DiffProfiler'] = {}
+_profilers_lock = threading.Lock()
+# only one profiler can be enabled at once, nested (and concurrent) profiling requests are ignored
+_active_profiler: Optional['DiffProfiler'] = None
+_active_profiler_lock = threading.Lock()
+
+
+def _frame_name(frame) -> str:
+    return f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_name}'
+
+
+class DiffProfiler:
+    """
+    Accumulates cProfile statistics and sampled stacks of profiled code blocks and writes them into files.
+
+    Parameters:
+        path: pstats output file path. Collapsed stacks are written next to it with ".collapsed" suffix.
+        interval: sampling interval in seconds.
+    """
+
+    def __init__(self, path: Union[str, Path], interval: float = 0.001):
+        self.path = Path(path)
+        self.collapsed_path = self.path.with_suffix('.collapsed')
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.samples: Counter = Counter()
+
+    def _sample(self, thread_id: int, stats: DiffStats, stop: threading.Event):
+        while not stop.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            phase = stats.current_phase
+            stack.extend(reversed([f'[{i}]' for i in phase.split('/')]) if phase else [NO_PHASE])
+            self.samples[';'.join(reversed(stack))] += 1
+
+    @contextmanager
+    def profiling(self):
+        """Profiles code block and writes accumulated profile files at exit."""
+        global _active_profiler
+        with _active_profiler_lock:
+            active = _active_profiler is not None
+            if not active:
+                _active_profiler = self
+        if active:
+            yield self
+            return
+
+        stats = current_stats()
+        with nullcontext(stats) if stats is not None else collect_stats() as stats:
+            stop = threading.Event()
+            sampler = threading.Thread(target=self._sample, args=(threading.get_ident(), stats, stop),
+                                       name='mdiff-profile-sampler', daemon=True)
+            sampler.start()
+            self.profile.enable()
+            try:
+                yield self
+            finally:
+                self.profile.disable()
+                stop.set()
+                sampler.join()
+                with _active_profiler_lock:
+                    _active_profiler = None
+                self.dump()
+
+    def collapsed_stacks(self) -> List[str]:
+        """Returns sampled stacks in collapsed format: "[phase];module:function;module:function count"."""
+        return [f'{stack} {count}' for stack, count in sorted(self.samples.items())]
+
+    def dump(self):
+        self.profile.dump_stats(str(self.path))
+        with open(self.collapsed_path, 'w') as f:
+            for line in self.collapsed_stacks():
+                f.write(line + '\n')
+
+
+def get_profiler(path: Union[str, Path]) -> DiffProfiler:
+    """Returns profiler accumulating profiles for given output path."""
+    path = Path(path)
+    with _profilers_lock:
+        if path not in _profilers:
+            _profilers[path] = DiffProfiler(path)
+        return _profilers[path]
+
+
+def profile_to(path: Optional[Union[str, Path]]) -> ContextManager:
+    """Returns context manager profiling code block into path, or no-op context manager if path is empty."""
+    if not path:
+        return nullcontext()
+    return get_profiler(path).profiling()
+
+
+def profile_from_env() -> ContextManager:
+    """Returns context manager profiling code block if MDIFF_PROFILE environment variable is set."""
+    return profile_to(os.environ.get(PROFILE_ENV_VARIABLE))
@@ -0,0 +1,132 @@
+"""
+This module provides progress reporting and cooperative cancellation of long running diffs.
+
+Progress callback and cancellation token are passed to diff functions (i.e. HeckelSequenceMatcher.get_opcodes or
+diff_lines_with_similarities), which make them active for nested diff steps with monitored() context manager.
+Hot loops look up active DiffMonitor once and report progress (or raise DiffCancelledException when cancellation
+was requested) every CHUNK_SIZE elements. Loops run unchunked when no monitor is active.
+
+Example:
+    >>> from mdiff import HeckelSequenceMatcher
+    >>> progress = []
+    >>> _ = HeckelSequenceMatcher('abc', 'acb').get_opcodes(progress=lambda *args: progress.append(args))
+    >>> progress[:2]
+    [('symbol_table', 0, 6), ('symbol_table', 3, 6)]
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Optional, Generator, Tuple
+
+CHUNK_SIZE = 4096
+
+ProgressCallback = Callable[[str, int, int], None]
+
+
+class DiffCancelledException(Exception):
+    pass
+
+
+class CancellationToken:
+    """
+    Thread-safe cancellation flag. Call cancel() (i.e. from another thread) to stop diff using the token
+    at the nearest chunk boundary with DiffCancelledException.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise DiffCancelledException('Diff has been cancelled.')
+
+
+@dataclass
+class DiffMonitor:
+    """
+    Progress callback and cancellation token of currently running diff.
+        progress: function called with (phase, done, total) arguments.
+        token: cancellation token checked at chunk boundaries.
+    """
+    progress: Optional[ProgressCallback] = None
+    token: Optional[CancellationToken] = None
+
+    def raise_if_cancelled(self):
+        if self.token is not None:
+            self.token.raise_if_cancelled()
+
+    def checkpoint(self, phase: str, done: int, total: int):
+        """Raises DiffCancelledException if cancellation was requested, reports progress otherwise."""
+        self.raise_if_cancelled()
+        if self.progress is not None:
+            self.progress(phase, done, total)
+
+
+_active_monitor: ContextVar[Optional[DiffMonitor]] = ContextVar('mdiff_active_monitor', default=None)
+
+
+def current_monitor() -> Optional[DiffMonitor]:
+    """Returns active DiffMonitor or None if neither progress callback nor cancellation token is used."""
+    return _active_monitor.get()
+
+
+@contextmanager
+def monitored(progress: ProgressCallback = None, cancel: CancellationToken = None):
+    """
+    Makes progress callback and cancellation token active within context. If none of them is passed, then
+    currently active monitor (i.e. set by caller function) remains active.
+    """
+    if progress is None and cancel is None:
+        yield current_monitor()
+        return
+    monitor = DiffMonitor(progress, cancel)
+    token = _active_monitor.set(monitor)
+    try:
+        yield monitor
+    finally:
+        _active_monitor.reset(token)
+
+
+@contextmanager
+def progress_suspended():
+    """Disables progress reporting within context (i.e. for nested diffs of similar lines), keeps cancellation."""
+    monitor = current_monitor()
+    if monitor is None or monitor.progress is None:
+        yield
+        return
+    token = _active_monitor.set(DiffMonitor(token=monitor.token) if monitor.token is not None else None)
+    try:
+        yield
+    finally:
+        _active_monitor.reset(token)
+
+
+def chunks(monitor: Optional[DiffMonitor], phase: str, start: int, stop: int, done: int = 0, total: int = None) \
+        -> Generator[Tuple[int, int], None, None]:
+    """
+    Splits range [start, stop) into (chunk_start, chunk_stop) ranges of CHUNK_SIZE length, passing checkpoint
+    before every chunk and after the last one. Yields the whole range at once if monitor is None.
+    Progress of the phase is reported as done + number of processed elements out of total.
+
+    >>> list(chunks(None, 'phase', 0, 10000))
+    [(0, 10000)]
+    >>> list(chunks(DiffMonitor(), 'phase', 0, 10000))
+    [(0, 4096), (4096, 8192), (8192, 10000)]
+    """
+    if monitor is None:
+        yield start, stop
+        return
+    if total is None:
+        total = stop - start
+    for chunk_start in range(start, stop, CHUNK_SIZE):
+        monitor.checkpoint(phase, done + chunk_start - start, total)
+        yield chunk_start, min(chunk_start + CHUNK_SIZE, stop)
+    monitor.checkpoint(phase, done + stop - start, total)
@@ -0,0 +1,189 @@
+"""
+This module provides AutoSequenceMatcher, which chooses sequence matching algorithm for every pair of sequences
+based on cheap sequences statistics.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+from mdiff.progress import ProgressCallback, CancellationToken
+from mdiff.seqmatch.heckel import HeckelSequenceMatcher
+from mdiff.seqmatch.myers import MyersSequenceMatcher
+from mdiff.seqmatch.patience import HistogramSequenceMatcher
+from mdiff.stats import current_stats, phase
+from mdiff.utils import OpCode
+
+HECKEL = 'heckel'
+MYERS = 'myers'
+HISTOGRAM = 'histogram'
+
+# number of elements sampled to estimate anchor density
+SAMPLE_SIZE = 1024
+# Myers' algorithm is used when squared estimated edit distance doesn't exceed that value
+MYERS_MAX_COST = 4_000_000
+# histogram diff is used when at least that fraction of sampled elements are unique anchors
+MIN_ANCHOR_DENSITY = 0.3
+# histogram diff is used for duplicate-heavy sequences only when anchors are dense enough
+MAX_DUPLICATE_RATIO = 0.5
+# histogram diff is used only when estimated edit distance doesn't exceed that fraction of sequences length
+# (it splits regions slowly when many elements are displaced)
+MAX_HISTOGRAM_EDIT_RATIO = 0.25
+
+
+@dataclass
+class SequencesProfile:
+    """
+    Cheap statistics of compared sequences.
+        a_len: length of sequence "a".
+        b_len: length of sequence "b".
+        prefix: length of common prefix.
+        suffix: length of common suffix (not overlapping with prefix).
+        duplicate_ratio: fraction of elements between common prefix and suffix which are repeated occurrences.
+        anchor_density: fraction of sampled "a" elements (between common prefix and suffix) occurring exactly once
+            in both sequences.
+        estimated_edit_distance: estimated number of inserted and deleted elements: elements which can't be matched
+            (difference of elements multisets) plus elements displaced between sampled anchors appearing
+            in different order in both sequences.
+    """
+    a_len: int
+    b_len: int
+    prefix: int
+    suffix: int
+    duplicate_ratio: float
+    anchor_density: float
+    estimated_edit_distance: int
+
+
+def profile_sequences(a: Sequence[Any], b: Sequence[Any], sample_size: int = SAMPLE_SIZE) -> SequencesProfile:
+    """
+    Calculates SequencesProfile of sequences.
+
+    Example:
+        >>> profile_sequences('abcxyz', 'abQz')
+        SequencesProfile(a_len=6, b_len=4, prefix=2, suffix=1, duplicate_ratio=0.0, anchor_density=0.0, \
+estimated_edit_distance=4)
+    """
+    a_len = len(a)
+    b_len = len(b)
+    prefix = 0
+    max_prefix = min(a_len, b_len)
+    while prefix < max_prefix and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    max_suffix = max_prefix - prefix
+    while suffix < max_suffix and a[a_len - suffix - 1] == b[b_len - suffix - 1]:
+        suffix += 1
+
+    a_mid = a[prefix:a_len - suffix]
+    b_mid = b[prefix:b_len - suffix]
+    if not a_mid or not b_mid:
+        return SequencesProfile(a_len, b_len, prefix, suffix, 0.0, 0.0, len(a_mid) + len(b_mid))
+
+    a_counts = Counter(a_mid)
+    b_counts = Counter(b_mid)
+    duplicate_ratio = 1 - (len(a_counts) + len(b_counts)) / (len(a_mid) + len(b_mid))
+    unmatched = sum((a_counts - b_counts).values()) + sum((b_counts - a_counts).values())
+
+    step = max(len(a_mid) // sample_size, 1)
+    sample = a_mid[::step]
+    anchors = [i for i in sample if a_counts[i] == 1 and b_counts[i] == 1]
+    wanted = set(anchors)
+    b_positions = {v: j for j, v in enumerate(b_mid) if v in wanted}
+    order = [b_positions[i] for i in anchors]
+    displaced = sum(1 for j1, j2 in zip(order, order[1:]) if j1 > j2) * step * 2
+
+    return SequencesProfile(a_len, b_len, prefix, suffix, duplicate_ratio, len(anchors) / len(sample),
+                            min(unmatched + displaced, len(a_mid) + len(b_mid)))
+
+
+def choose_matcher(profile: SequencesProfile) -> str:
+    """
+    Chooses the fastest algorithm giving readable result for sequences profile:
+        myers: when estimated edit distance is small enough to find minimal diff cheaply.
+        histogram: when unique anchors are dense and mostly in the same order, so regions are split
+            in nearly linear time, or when sequences have no common elements apart from prefix and suffix.
+        heckel: otherwise (large, duplicate-heavy or completely different sequences), because it runs
+            in linear time regardless of input.
+    DisplacementSequenceMatcher and difflib.SequenceMatcher are never chosen, since they are slow
+    on duplicate-heavy sequences and large changes respectively.
+
+    Example:
+        >>> choose_matcher(profile_sequences('abcxyz', 'abQz'))
+        'myers'
+    """
+    if profile.estimated_edit_distance ** 2 <= MYERS_MAX_COST:
+        return MYERS
+    size = profile.a_len + profile.b_len - 2 * (profile.prefix + profile.suffix)
+    if profile.anchor_density == 0 and profile.estimated_edit_distance == size:
+        # no common elements between common prefix and suffix, histogram diff finds it in a single pass
+        return HISTOGRAM
+    if profile.anchor_density >= MIN_ANCHOR_DENSITY \
+            and profile.estimated_edit_distance <= MAX_HISTOGRAM_EDIT_RATIO * size \
+            and (profile.duplicate_ratio <= MAX_DUPLICATE_RATIO or profile.anchor_density >= 2 * MIN_ANCHOR_DENSITY):
+        return HISTOGRAM
+    return HECKEL
+
+
+class AutoSequenceMatcher:
+    """
+    AutoSequenceMatcher chooses sequence matching algorithm for every compared pair of sequences
+    (see choose_matcher) and delegates diff to it. All of chosen algorithms detect elements movement.
+    The name of chosen algorithm is stored in chosen attribute and in DiffStats.auto_matcher when statistics
+    are collected.
+
+    Parameters:
+        a:
+            source(old) sequence.
+        b:
+            target(new) sequence.
+        replace_mode:
+            if True: it merges consecutive pairs of "insert" and "delete" blocks into "replace" operation.
+            Remains "insert" and "delete" blocks otherwise.
+    """
+
+    def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = '', replace_mode=True):
+        self.a = a
+        self.b = b
+        self.replace_mode = replace_mode
+        self.chosen = None
+        self.matchers: Dict[str, Any] = {
+            HECKEL: HeckelSequenceMatcher(replace_mode=replace_mode),
+            MYERS: MyersSequenceMatcher(replace_mode=replace_mode),
+            HISTOGRAM: HistogramSequenceMatcher(replace_mode=replace_mode),
+        }
+
+    def set_seq1(self, a):
+        self.a = a
+
+    def set_seq2(self, b):
+        self.b = b
+
+    def set_seqs(self, a, b):
+        self.set_seq1(a)
+        self.set_seq2(b)
+
+    def choose(self, a: Sequence[Any], b: Sequence[Any]) -> str:
+        """Returns name of algorithm chosen for sequences."""
+        return choose_matcher(profile_sequences(a, b))
+
+    def get_opcodes(self, progress: ProgressCallback = None, cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b"
+        (see HeckelSequenceMatcher.get_opcodes()).
+        """
+        return self.compute(self.a, self.b, progress, cancel)
+
+    def compute(self, a: Sequence[Any], b: Sequence[Any], progress: ProgressCallback = None,
+                cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b" (see get_opcodes()).
+        Chosen algorithms are reentrant, so single matcher instance can be safely used by many threads
+        (chosen attribute holds the last choice then).
+        """
+        stats = current_stats()
+        with phase(stats, 'auto'):
+            chosen = self.choose(a, b)
+        self.chosen = chosen
+        if stats is not None:
+            stats.auto_matcher = chosen
+        return self.matchers[chosen].compute(a, b, progress, cancel)
@@ -1,10 +1,13 @@
 from collections import deque
-from dataclasses import dataclass, field
-from typing import Any, List, Union, Dict, Sequence, NamedTuple, Optional
+from dataclasses import dataclass
+from typing import Any, List, Union, Dict, Sequence, NamedTuple, Optional, Tuple
 
 from mdiff.block_extractor import OpCodeDeleteThenInsertBlockExtractor, ConsecutiveVectorBlockExtractor, \
     NonIntegersBlockExtractor
-from mdiff.utils import OpCode, longest_increasing_subsequence, get_idx_or_default, OpCodeExtractable
+from mdiff.progress import current_monitor, chunks, monitored, ProgressCallback, CancellationToken, DiffMonitor, \
+    CHUNK_SIZE
+from mdiff.stats import current_stats, phase
+from mdiff.utils import OpCode, longest_increasing_subsequence, get_idx_or_default, OpCodeExtractable, ObjectPool
 
 
 @dataclass
@@ -70,60 +73,88 @@ class HeckelAlgorithm:
         self.na: List[HeckelSymbolTableEntryType] = []
         self.oa: List[HeckelSymbolTableEntryType] = []
 
+    def reset(self):
+        """Releases input sequences and clears algorithm tables, so instance can be reused for another run."""
+        self.a = ''
+        self.b = ''
+        self.st.clear()
+        self.na.clear()
+        self.oa.clear()
+
     def run(self):
         """
         Implementation of Paul Heckel's algorithm described in "A Technique for Isolating Differences Between Files".
         """
-        # symbol table, NA array, OA array
-        st: Dict[Any, HeckelSymbolTableEntryType] = dict()
-        na: List[HeckelSymbolTableEntryType] = list()
-        oa: List[HeckelSymbolTableEntryType] = list()
-
-        # pass 1
-        for idx, i in enumerate(self.a):
-            ste = st.setdefault(i, HeckelSymbolTableEntry(i))
-            ste.nc += 1
-            na.append(ste)
-
-        # pass 2
-        for idx, i in enumerate(self.b):
-            ste = st.setdefault(i, HeckelSymbolTableEntry(i))
-            ste.oc += 1
-            oa.append(ste)
-            ste.olno = idx
-
-        # pass3
-        for i in range(len(na)):
-            if na[i].nc == na[i].oc == 1:
-                olno = na[i].olno
-                na[i] = olno
-                oa[olno] = i
-
-        # pass4
-        for i in range(len(na)):
-            try:
-                if isinstance(na[i], int):
-                    j = na[i]
-                    if isinstance(na[i + 1], HeckelSymbolTableEntry) and na[i + 1] == oa[j + 1]:
-                        oa[j + 1] = i + 1
-                        na[i + 1] = j + 1
-            except IndexError:
-                pass
-
-        # pass5
-        for i in reversed(range(1, len(na))):
-            try:
-                if isinstance(na[i], int):
-                    j = na[i]
-                    if isinstance(na[i - 1], HeckelSymbolTableEntry) and na[i - 1] == oa[j - 1] and i >= 1 and j >= 1:
-                        oa[j - 1] = i - 1
-                        na[i - 1] = j - 1
-            except IndexError:
-                pass
-
-        self.st = st
-        self.na = na
-        self.oa = oa
+        stats = current_stats()
+        monitor = current_monitor()
+        # symbol table, NA array, OA array (containers are reused between runs)
+        st = self.st
+        na = self.na
+        oa = self.oa
+        st.clear()
+        na.clear()
+        oa.clear()
+        a = self.a
+        b = self.b
+        a_len = len(a)
+        b_len = len(b)
+        anchors_total = 2 * a_len + max(a_len - 1, 0)
+
+        with phase(stats, 'symbol_table'):
+            # pass 1
+            for start, stop in chunks(monitor, 'symbol_table', 0, a_len, 0, a_len + b_len):
+                for idx in range(start, stop):
+                    i = a[idx]
+                    ste = st.setdefault(i, HeckelSymbolTableEntry(i))
+                    ste.nc += 1
+                    na.append(ste)
+
+            # pass 2
+            for start, stop in chunks(monitor, 'symbol_table', 0, b_len, a_len, a_len + b_len):
+                for idx in range(start, stop):
+                    i = b[idx]
+                    ste = st.setdefault(i, HeckelSymbolTableEntry(i))
+                    ste.oc += 1
+                    oa.append(ste)
+                    ste.olno = idx
+
+        with phase(stats, 'anchors'):
+            # pass3
+            for start, stop in chunks(monitor, 'anchors', 0, a_len, 0, anchors_total):
+                for i in range(start, stop):
+                    if na[i].nc == na[i].oc == 1:
+                        olno = na[i].olno
+                        na[i] = olno
+                        oa[olno] = i
+
+            if stats is not None:
+                stats.symbol_table_size = len(st)
+                stats.unique_anchors = sum(1 for i in na if isinstance(i, int))
+
+            # pass4
+            for start, stop in chunks(monitor, 'anchors', 0, a_len, a_len, anchors_total):
+                for i in range(start, stop):
+                    try:
+                        if isinstance(na[i], int):
+                            j = na[i]
+                            if isinstance(na[i + 1], HeckelSymbolTableEntry) and na[i + 1] == oa[j + 1]:
+                                oa[j + 1] = i + 1
+                                na[i + 1] = j + 1
+                    except IndexError:
+                        pass
+
+            # pass5 (iterates from the end of NA table)
+            for start, stop in chunks(monitor, 'anchors', 0, max(a_len - 1, 0), 2 * a_len, anchors_total):
+                for i in range(a_len - 1 - start, a_len - 1 - stop, -1):
+                    try:
+                        if isinstance(na[i], int):
+                            j = na[i]
+                            if isinstance(na[i - 1], HeckelSymbolTableEntry) and na[i - 1] == oa[j - 1] \
+                                    and i >= 1 and j >= 1:
+                                oa[j - 1] = i - 1
+                                na[i - 1] = j - 1
+                    except IndexError:
+                        pass
 
 
 class HeckelOpCodeExtractor(OpCodeExtractable):
@@ -152,6 +183,9 @@ class HeckelOpCodeExtractor(OpCodeExtractable):
         # Indexed NA in form of tuples are used in order to use index to build proper MoveBlocks later.
         lis = longest_increasing_subsequence(na_indexed_moves, key=lambda x: x[1])
         lis_idx, lis_v = zip(*lis) if lis else ([], [])
+        stats = current_stats()
+        if stats is not None:
+            stats.lis_length = len(lis)
 
         # Finding consecutive vector blocks and mapping them to NA indexes and starting values.
         cons_all_blocks = list(ConsecutiveVectorBlockExtractor(na_indexed_moves).extract_blocks())
@@ -191,19 +225,37 @@ class HeckelOpCodeExtractor(OpCodeExtractable):
             yield OpCode('delete', b.i, b.i + b.w, b.n.olno, b.n.olno)
 
     def get_opcodes(self) -> List[OpCode]:
-        # Prepare opcodes
+        stats = current_stats()
+        monitor = current_monitor()
+        if monitor is not None:
+            monitor.checkpoint('lis', 0, 1)
+        with phase(stats, 'lis'):
+            move_opcodes = []
+            moved_opcodes = []
+            equal_opcodes = []
+            map_dict = {
+                'move': move_opcodes,
+                'moved': moved_opcodes,
+                'equal': equal_opcodes
+            }
+            for opcode in self._generate_move_and_equal_opcodes():
+                map_dict[opcode.tag].append(opcode)
+
+        if monitor is not None:
+            monitor.checkpoint('lis', 1, 1)
+        with phase(stats, 'opcodes'):
+            result = self._assemble_opcodes(move_opcodes, moved_opcodes, equal_opcodes, monitor)
+        if stats is not None:
+            stats.update_peak_opcodes(len(result))
+        return result
+
+    def _assemble_opcodes(self, move_opcodes: List[OpCode], moved_opcodes: List[OpCode],
+                          equal_opcodes: List[OpCode], monitor: Optional[DiffMonitor] = None) -> List[OpCode]:
+        """Merges "equal", "move" and "moved" opcodes with insert and delete opcodes in correct order."""
         insert_opcodes = list(self._generate_insert_opcodes())
         delete_opcodes = list(self._generate_delete_opcodes())
-        move_opcodes = []
-        moved_opcodes = []
-        equal_opcodes = []
-        map_dict = {
-            'move': move_opcodes,
-            'moved': moved_opcodes,
-            'equal': equal_opcodes
-        }
-        for opcode in self._generate_move_and_equal_opcodes():
-            map_dict[opcode.tag].append(opcode)
+        total = sum(map(len, (insert_opcodes, delete_opcodes, move_opcodes, moved_opcodes, equal_opcodes)))
+        next_checkpoint = 0
 
         # sort opcodes (insert, delete and equal opcodes are already sorted)
         moved_opcodes.sort(key=lambda x: x.j1)
@@ -214,6 +266,10 @@ class HeckelOpCodeExtractor(OpCodeExtractable):
         ipos = 0
         jpos = 0
         while any([insert_opcodes, delete_opcodes, move_opcodes, moved_opcodes, equal_opcodes]):
+            if monitor is not None and len(result) >= next_checkpoint:
+                monitor.checkpoint('opcodes', len(result), total)
+                next_checkpoint += CHUNK_SIZE
+
             if len(delete_opcodes) > 0 and delete_opcodes[0].i1 == ipos:
                 opcode = delete_opcodes.pop(0)
                 # j1 and j2 attributes are meaningless for delete operation. However replacing them with jpos
@@ -251,6 +307,9 @@ class HeckelOpCodeExtractor(OpCodeExtractable):
 
             raise HeckelSequenceMatcherException('Invalid indexes in generated OpCodes. Something went wrong.')
 
+        if monitor is not None:
+            monitor.checkpoint('opcodes', len(result), total)
+
         if self.replace_mode:
             result = _map_replace_opcodes(result)
 
@@ -375,13 +434,17 @@ class HeckelSequenceMatcher:
     http://documents.scribd.com/docs/10ro9oowpo1h81pgh1as.pdf
     """
 
+    algorithm_class = HeckelAlgorithm
+
     def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = '', replace_mode=True):
         self.a = a
         self.b = b
         self.replace_mode = replace_mode
-        self.alg: HeckelAlgorithm = HeckelAlgorithm(self.a, self.b)
+        self.alg: HeckelAlgorithm = self.algorithm_class(self.a, self.b)
         # no DI for opcode extractor object, because it's the only implementation right now.
         self.opcode_extractor = HeckelOpCodeExtractor(self.alg, self.replace_mode)
+        # scratch algorithm instances used by compute()
+        self._scratch_pool = ObjectPool(self.algorithm_class)
 
     def set_seq1(self, a):
         self.a = a
@@ -395,7 +458,7 @@ class HeckelSequenceMatcher:
         self.set_seq1(a)
         self.set_seq2(b)
 
-    def get_opcodes(self) -> List[OpCode]:
+    def get_opcodes(self, progress: ProgressCallback = None, cancel: CancellationToken = None) -> List[OpCode]:
         """
         Returns list of OpCode objects describing how to turn sequence "a" into "b".
         OpCode consists of attributes: tag, i1, i2, j1, j2. OpCode can be unpacked as tuple
@@ -413,80 +476,161 @@ class HeckelSequenceMatcher:
                         It indicates that b[j1:j2] is moved from i1 position
                         (or b[j1:j2] should be moved back to a[i1:i2]). Note that i1==j2 in this case.
                         It can be used for sequence elements movement visualisation.
+
+        Optional progress callback is called with (phase, done, total) arguments during computation.
+        When cancellation is requested with cancel token, DiffCancelledException is raised.
+        Both are checked every CHUNK_SIZE elements (see mdiff.progress).
         """
-        self.alg.run()
-        opcodes = self.opcode_extractor.get_opcodes()
+        with monitored(progress, cancel):
+            self.alg.run()
+            opcodes = self.opcode_extractor.get_opcodes()
         return opcodes
 
+    def compute(self, a: Sequence[Any], b: Sequence[Any], progress: ProgressCallback = None,
+                cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b" (see get_opcodes()).
+        Unlike set_seqs() and get_opcodes(), this method doesn't modify matcher state. Every call runs the algorithm
+        on its own scratch tables taken from the pool, so single matcher instance can be safely
+        used by many threads at once.
+        """
+        with self._scratch_pool.borrow() as alg, monitored(progress, cancel):
+            alg.a = a
+            alg.b = b
+            try:
+                alg.run()
+                return HeckelOpCodeExtractor(alg, self.replace_mode).get_opcodes()
+            finally:
+                alg.reset()
+
 
 # ------------------------------------------------------------------------------------
 # ----------------------- DisplacementSequenceMatcher --------------------------------
 # ------------------------------------------------------------------------------------
-@dataclass
-class DisplacementMatcherEntry:
+# Shared NA/OA entry of elements without a counterpart in the other sequence. Opcode extractor treats every
+# non-integer entry as unmatched, so a single sentinel replaces per-element symbol table entries.
+UNMATCHED = HeckelSymbolTableEntry(None)
+
+
+def _occurrences(ids: List[int], symbols: int) -> Tuple[List[int], List[int]]:
     """
-    DisplacementSequenceMatcher's algorithm symbol table entry.
-        key_val: sequence element value
-        a_indexes: key_val appearance indexes in sequence "a".
-        b_indexes: key_val appearance indexes in sequence "b".
-        a_curr_idx: current a_indexes position.
-        b_curr_idx: current b_indexes position.
+    Builds CSR-style occurrence arrays of interned sequence: indexes of symbol s in the sequence are
+    positions[offsets[s]:offsets[s + 1]] (in ascending order).
+
+    Returns:
+        (offsets, positions)
+
+    Example:
+        >>> _occurrences([1, 0, 1, 1], 3)
+        ([0, 1, 4, 4], [1, 0, 2, 3])
     """
-    key_val: Any
-    a_indexes: List[int] = field(default_factory=lambda: [])
-    b_indexes: List[int] = field(default_factory=lambda: [])
-    a_curr_idx: int = 0
-    b_curr_idx: int = 0
+    offsets = [0] * (symbols + 1)
+    for s in ids:
+        offsets[s + 1] += 1
+    for s in range(symbols):
+        offsets[s + 1] += offsets[s]
+    positions = [0] * len(ids)
+    cursors = offsets[:-1]
+    for idx, s in enumerate(ids):
+        positions[cursors[s]] = idx
+        cursors[s] += 1
+    return offsets, positions
 
 
 class DisplacementAlgorithm(HeckelAlgorithm):
+    """
+    Matches k-th occurrence of every element in sequence "a" with k-th occurrence of the same element
+    in sequence "b". Elements are interned into integer symbols, occurrences of symbols are stored
+    in CSR-style offset arrays and consumed with integer cursors.
+    """
+
     def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = ''):
         super().__init__(a, b)
-        self.st: Dict[Any, DisplacementMatcherEntry] = {}
-        self.na = []
-        self.oa = []
+        # element -> symbol
+        self.st: Dict[Any, int] = {}
+        self.a_ids: List[int] = []
+        self.b_ids: List[int] = []
 
     def setup(self):
-        self.st = {}
-        self.na = []
-        self.oa = []
-
-    def add_entries(self):
+        self.st.clear()
+        self.na.clear()
+        self.oa.clear()
+        self.a_ids = []
+        self.b_ids = []
+
+    def reset(self):
+        super().reset()
+        self.a_ids = []
+        self.b_ids = []
+
+    def add_entries(self, monitor: Optional[DiffMonitor] = None):
         """
-        Fills algorithm's symbol table.
+        Fills algorithm's symbol table and interns both sequences.
         """
-        for idx, i in enumerate(self.a):
-            e = self.st.setdefault(i, DisplacementMatcherEntry(key_val=i))
-            e.a_indexes.append(idx)
-
-        for idx, i in enumerate(self.b):
-            e = self.st.setdefault(i, DisplacementMatcherEntry(key_val=i))
-            e.b_indexes.append(idx)
+        st = self.st
+        a = self.a
+        b = self.b
+        total = len(a) + len(b)
+        for start, stop in chunks(monitor, 'symbol_table', 0, len(a), 0, total):
+            self.a_ids.extend([st.setdefault(a[idx], len(st)) for idx in range(start, stop)])
+
+        for start, stop in chunks(monitor, 'symbol_table', 0, len(b), len(a), total):
+            self.b_ids.extend([st.setdefault(b[idx], len(st)) for idx in range(start, stop)])
+
+    @staticmethod
+    def _match(ids: List[int], offsets: List[int], positions: List[int], out: list, start: int, stop: int,
+               cursors: List[int]):
+        """Appends positions of the next unused occurrences of ids[start:stop] symbols (or UNMATCHED) to out."""
+        for idx in range(start, stop):
+            s = ids[idx]
+            c = cursors[s]
+            if c < offsets[s + 1]:
+                out.append(positions[c])
+                cursors[s] = c + 1
+            else:
+                out.append(UNMATCHED)
 
     def run(self):
         """
         Overridden algorithm.
         """
+        stats = current_stats()
+        monitor = current_monitor()
         self.setup()
-        self.add_entries()
-
-        for idx, i in enumerate(self.a):
-            try:
-                e = self.st[i].b_indexes[self.st[i].b_curr_idx]
-                self.st[i].b_curr_idx += 1
-            except IndexError:
-                # table entry values don't have much meanings
-                e = HeckelSymbolTableEntry(i, 0, 0, idx)
-            self.na.append(e)
-
-        for idx, i in enumerate(self.b):
-            try:
-                e = self.st[i].a_indexes[self.st[i].a_curr_idx]
-                self.st[i].a_curr_idx += 1
-            except IndexError:
-                # table entry values don't have much meanings
-                e = HeckelSymbolTableEntry(i, 0, 0, idx)
-            self.oa.append(e)
+        with phase(stats, 'symbol_table'):
+            self.add_entries(monitor)
+            symbols = len(self.st)
+            a_occurrences = _occurrences(self.a_ids, symbols)
+            b_occurrences = _occurrences(self.b_ids, symbols)
+        self.match(symbols, a_occurrences, b_occurrences)
+
+    def match(self, symbols: int, a_occurrences: Tuple[List[int], List[int]],
+              b_occurrences: Tuple[List[int], List[int]]):
+        """
+        Fills NA and OA tables matching occurrences of symbols of interned sequences (a_ids and b_ids).
+        Occurrences are (offsets, positions) arrays built by _occurrences, so occurrences of a sequence
+        compared with many other sequences can be built once.
+        """
+        stats = current_stats()
+        monitor = current_monitor()
+        a_offsets, a_positions = a_occurrences
+        b_offsets, b_positions = b_occurrences
+        if stats is not None:
+            stats.symbol_table_size = symbols
+            stats.unique_anchors = sum(1 for s in range(symbols)
+                                       if a_offsets[s + 1] - a_offsets[s] == b_offsets[s + 1] - b_offsets[s] == 1)
+
+        a_len = len(self.a_ids)
+        b_len = len(self.b_ids)
+        total = a_len + b_len
+        with phase(stats, 'anchors'):
+            cursors = b_offsets[:-1]
+            for start, stop in chunks(monitor, 'anchors', 0, a_len, 0, total):
+                self._match(self.a_ids, b_offsets, b_positions, self.na, start, stop, cursors)
+
+            cursors = a_offsets[:-1]
+            for start, stop in chunks(monitor, 'anchors', 0, b_len, a_len, total):
+                self._match(self.b_ids, a_offsets, a_positions, self.oa, start, stop, cursors)
 
 
 class DisplacementSequenceMatcher(HeckelSequenceMatcher):
@@ -507,10 +651,4 @@ class DisplacementSequenceMatcher(HeckelSequenceMatcher):
             Remains "insert" and "delete" blocks otherwise.
     """
 
-    def __init__(self, a='', b='', replace_mode=True):
-        """
-        Overridden init from HeckelSequenceMatcher class.
-        """
-        super().__init__(a, b, replace_mode)
-        self.alg = DisplacementAlgorithm(a, b)
-        self.opcode_extractor = HeckelOpCodeExtractor(self.alg, self.replace_mode)
+    algorithm_class = DisplacementAlgorithm
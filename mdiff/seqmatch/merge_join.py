@@ -0,0 +1,189 @@
+"""
+This module provides SortedSequenceMatcher, which compares sorted sequences with a single merge-join pass
+in O(n + m) time, without symbol table, LIS or move detection. Merge-join works on any iterables, so sorted
+files can be compared while they are read (see SortedFilesConsoleDiffer).
+"""
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Sized, Tuple
+
+from mdiff.progress import current_monitor, monitored, ProgressCallback, CancellationToken, CHUNK_SIZE
+from mdiff.seqmatch.heckel import HeckelSequenceMatcher
+from mdiff.stats import current_stats, phase
+from mdiff.utils import OpCode
+
+# (tag, i, j, a_item, b_item) row of merge-join, where tag is "equal", "delete" or "insert".
+# i and j are indexes of a_item and b_item, or insertion points if row has no element on that side (item is None).
+MergeJoinRow = Tuple[str, int, int, Any, Any]
+
+
+class UnsortedSequenceError(ValueError):
+    pass
+
+
+def is_sorted(seq: Iterable[Any], key: Optional[Callable[[Any], Any]] = None) -> bool:
+    """
+    Checks if sequence is sorted in non-decreasing order (of key values if key is passed).
+
+    Example:
+        >>> is_sorted('abbc'), is_sorted('acb'), is_sorted(['a', 'B'], key=str.lower)
+        (True, False, True)
+    """
+    it = iter(seq) if key is None else map(key, seq)
+    prev = next(it, None)
+    for item in it:
+        if item < prev:
+            return False
+        prev = item
+    return True
+
+
+def merge_join(a: Iterable[Any], b: Iterable[Any], key: Optional[Callable[[Any], Any]] = None) \
+        -> Iterator[MergeJoinRow]:
+    """
+    Merge-joins sorted iterables, yielding one MergeJoinRow per element. Equal elements are paired in order,
+    so repeated elements are matched as multisets. Only current element of each iterable is held in memory.
+
+    Raises:
+        UnsortedSequenceError: when element smaller than the previous one is read (rows yielded so far are valid).
+
+    Example:
+        >>> list(merge_join('abd', 'bcd'))
+        [('delete', 0, 0, 'a', None), ('equal', 1, 0, 'b', 'b'), ('insert', 2, 1, None, 'c'), \
+('equal', 2, 2, 'd', 'd')]
+    """
+    monitor = current_monitor()
+    total = len(a) + len(b) if isinstance(a, Sized) and isinstance(b, Sized) else None
+    a_it = iter(a)
+    b_it = iter(b)
+    missing = object()
+    x = next(a_it, missing)
+    y = next(b_it, missing)
+    kx = key(x) if key is not None and x is not missing else x
+    ky = key(y) if key is not None and y is not missing else y
+    i = j = rows = 0
+    while x is not missing or y is not missing:
+        rows += 1
+        if monitor is not None and not rows % CHUNK_SIZE:
+            if total is None:
+                monitor.raise_if_cancelled()
+            else:
+                monitor.checkpoint('merge_join', i + j, total)
+        if y is missing or (x is not missing and kx < ky):
+            yield 'delete', i, j, x, None
+            step_a, step_b = True, False
+        elif x is missing or ky < kx:
+            yield 'insert', i, j, None, y
+            step_a, step_b = False, True
+        else:
+            yield 'equal', i, j, x, y
+            step_a = step_b = True
+        if step_a:
+            i += 1
+            x = next(a_it, missing)
+            if x is not missing:
+                prev, kx = kx, key(x) if key is not None else x
+                if kx < prev:
+                    raise UnsortedSequenceError(f'Sequence "a" is not sorted at index {i}.')
+        if step_b:
+            j += 1
+            y = next(b_it, missing)
+            if y is not missing:
+                prev, ky = ky, key(y) if key is not None else y
+                if ky < prev:
+                    raise UnsortedSequenceError(f'Sequence "b" is not sorted at index {j}.')
+    if monitor is not None and total is not None:
+        monitor.checkpoint('merge_join', total, total)
+
+
+def merge_join_opcodes(a: Iterable[Any], b: Iterable[Any], replace_mode=True,
+                       key: Optional[Callable[[Any], Any]] = None) -> Iterator[OpCode]:
+    """
+    Groups merge_join rows into OpCode objects (equal blocks and changes between them). Opcodes are yielded
+    while iterables are read, only current block boundaries are held in memory.
+
+    Example:
+        >>> list(merge_join_opcodes('abd', 'bcd'))
+        [OpCode('delete', 0, 1, 0, 0), OpCode('equal', 1, 2, 0, 1), OpCode('insert', 2, 2, 1, 2), \
+OpCode('equal', 2, 3, 2, 3)]
+    """
+    i0 = j0 = i = j = 0
+    in_equal = True
+    for tag, ri, rj, _, _ in merge_join(a, b, key):
+        if (tag == 'equal') != in_equal:
+            yield from _block_opcodes(in_equal, i0, ri, j0, rj, replace_mode)
+            in_equal = not in_equal
+            i0, j0 = ri, rj
+        i = ri + (tag != 'insert')
+        j = rj + (tag != 'delete')
+    yield from _block_opcodes(in_equal, i0, i, j0, j, replace_mode)
+
+
+def _block_opcodes(equal: bool, i1: int, i2: int, j1: int, j2: int, replace_mode: bool) -> Iterator[OpCode]:
+    if equal:
+        if i1 < i2:
+            yield OpCode('equal', i1, i2, j1, j2)
+    elif i1 < i2 and j1 < j2 and replace_mode:
+        yield OpCode('replace', i1, i2, j1, j2)
+    else:
+        if i1 < i2:
+            yield OpCode('delete', i1, i2, j1, j1)
+        if j1 < j2:
+            yield OpCode('insert', i2, i2, j1, j2)
+
+
+class SortedSequenceMatcher:
+    """
+    SortedSequenceMatcher compares sorted sequences (i.e. sorted exports or content sorted in GUI) with
+    a merge-join in O(n + m) time and constant extra memory. Sortedness of both sequences is checked
+    in a single pass first. If any of them is not sorted, then HeckelSequenceMatcher is used instead.
+    Elements movement is not detected (elements can't move in sorted sequences).
+
+    Parameters:
+        a:
+            source(old) sequence.
+        b:
+            target(new) sequence.
+        replace_mode:
+            if True: it merges consecutive "insert" and "delete" elements into "replace" operation.
+            Remains "insert" and "delete" blocks otherwise.
+    """
+
+    def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = '', replace_mode=True):
+        self.a = a
+        self.b = b
+        self.replace_mode = replace_mode
+        self.fallback = HeckelSequenceMatcher(replace_mode=replace_mode)
+
+    def set_seq1(self, a):
+        self.a = a
+
+    def set_seq2(self, b):
+        self.b = b
+
+    def set_seqs(self, a, b):
+        self.set_seq1(a)
+        self.set_seq2(b)
+
+    def get_opcodes(self, progress: ProgressCallback = None, cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b"
+        (see HeckelSequenceMatcher.get_opcodes()).
+        """
+        return self.compute(self.a, self.b, progress, cancel)
+
+    def compute(self, a: Sequence[Any], b: Sequence[Any], progress: ProgressCallback = None,
+                cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b" (see get_opcodes()).
+        This method doesn't modify matcher state, so single matcher instance can be safely used by many threads.
+        """
+        stats = current_stats()
+        with phase(stats, 'sorted_check'):
+            sorted_input = is_sorted(a) and is_sorted(b)
+        if not sorted_input:
+            return self.fallback.compute(a, b, progress, cancel)
+
+        with monitored(progress, cancel), phase(stats, 'merge_join'):
+            opcodes = list(merge_join_opcodes(a, b, self.replace_mode))
+        if stats is not None:
+            stats.update_peak_opcodes(len(opcodes))
+        return opcodes
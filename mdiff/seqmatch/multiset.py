@@ -0,0 +1,234 @@
+"""
+This module provides order-insensitive (multiset) diff for sequences in which order of elements doesn't matter
+(i.e. allow-lists, package lists or group memberships). Only added and removed elements with their multiplicities
+are reported, without LIS or move detection, in O(n + m) time. Files bigger than memory are hash-partitioned
+into temporary files, and each pair of partitions is compared in memory.
+"""
+import math
+import os
+import tempfile
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+from mdiff.progress import ProgressCallback, CancellationToken, monitored, current_monitor
+from mdiff.stats import current_stats, phase
+from mdiff.utils import OpCode, Text, iter_file_lines
+
+# files are partitioned, so every partition of both files has about that size
+PARTITION_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class MultisetDiff:
+    """
+    Result of multiset diff.
+        removed: elements of "a" missing in "b", with number of missing occurrences.
+        added: elements of "b" missing in "a", with number of missing occurrences.
+    """
+    removed: Counter = field(default_factory=Counter)
+    added: Counter = field(default_factory=Counter)
+
+    def __bool__(self):
+        return bool(self.removed or self.added)
+
+    def update(self, other: 'MultisetDiff'):
+        """Adds other result (i.e. of another partition)."""
+        self.removed.update(other.removed)
+        self.added.update(other.added)
+
+
+def multiset_diff(a: Iterable[Any], b: Iterable[Any]) -> MultisetDiff:
+    """
+    Compares sequences as multisets with a single counting hash map.
+
+    Example:
+        >>> multiset_diff('abca', 'cbd')
+        MultisetDiff(removed=Counter({'a': 2}), added=Counter({'d': 1}))
+    """
+    counts = Counter(a)
+    counts.subtract(b)
+    result = MultisetDiff()
+    for element, count in counts.items():
+        if count > 0:
+            result.removed[element] = count
+        elif count < 0:
+            result.added[element] = -count
+    return result
+
+
+def multiset_positions(a: Sequence[Any], b: Sequence[Any]) -> Tuple[List[int], List[int]]:
+    """
+    Maps multiset diff back to positions: returns indexes of removed elements of "a" and added elements of "b".
+    The first occurrences of element are retained, surplus occurrences are reported.
+
+    Example:
+        >>> multiset_positions('abca', 'cbd')
+        ([0, 3], [2])
+    """
+    return _surplus_positions(a, Counter(b)), _surplus_positions(b, Counter(a))
+
+
+def _surplus_positions(seq: Sequence[Any], quota: Counter) -> List[int]:
+    positions = []
+    for i, element in enumerate(seq):
+        if quota[element] > 0:
+            quota[element] -= 1
+        else:
+            positions.append(i)
+    return positions
+
+
+def multiset_opcodes(a: Sequence[Any], b: Sequence[Any], replace_mode=True) -> List[OpCode]:
+    """
+    Returns opcodes of multiset diff, which can be rendered like any other diff (i.e. by LineDiffConsolePrinter).
+    Removed and added elements are reported at their positions as "delete" and "insert" ("replace") blocks.
+    Retained elements of both sequences are paired in order of appearance as "equal" blocks, so paired elements
+    may differ when retained elements are reordered (element order doesn't matter in multiset diff).
+
+    Example:
+        >>> multiset_opcodes('abca', 'cbd')
+        [OpCode('delete', 0, 1, 0, 0), OpCode('equal', 1, 3, 0, 2), OpCode('replace', 3, 4, 2, 3)]
+    """
+    removed, added = multiset_positions(a, b)
+    removed.append(len(a))
+    added.append(len(b))
+    opcodes = []
+    i = j = 0
+    ri = rj = 0
+    while i < len(a) or j < len(b):
+        # changed elements
+        i1, j1 = i, j
+        while i < len(a) and i == removed[ri]:
+            i += 1
+            ri += 1
+        while j < len(b) and j == added[rj]:
+            j += 1
+            rj += 1
+        if i1 < i and j1 < j and replace_mode:
+            opcodes.append(OpCode('replace', i1, i, j1, j))
+        else:
+            if i1 < i:
+                opcodes.append(OpCode('delete', i1, i, j1, j1))
+            if j1 < j:
+                opcodes.append(OpCode('insert', i, i, j1, j))
+        # retained elements (the same number of them in both sequences)
+        length = min(removed[ri] - i, added[rj] - j)
+        if length:
+            opcodes.append(OpCode('equal', i, i + length, j, j + length))
+            i += length
+            j += length
+    return opcodes
+
+
+def multiset_diff_files(a: Path, b: Path, partitions: Optional[int] = None, lowercase=False,
+                        tmp_dir: Optional[Path] = None, binary=False) -> MultisetDiff:
+    """
+    Compares lines of files as multisets. When files are bigger than PARTITION_BYTES, lines are hash-partitioned
+    into temporary files first (equal lines always land in the same partition), then every pair of partitions
+    is compared in memory, so memory usage is bounded by partition size and result size.
+
+    Parameters:
+        a: source file path.
+        b: target file path.
+        partitions: number of partitions (by default calculated from files size).
+        lowercase: compare (and report) lowercase lines.
+        tmp_dir: directory of temporary partition files (system default if None).
+        binary: compare (and report) bytes lines without decoding.
+    """
+    if partitions is None:
+        partitions = math.ceil((os.path.getsize(a) + os.path.getsize(b)) / PARTITION_BYTES)
+    stats = current_stats()
+    if partitions <= 1:
+        with phase(stats, 'count'):
+            return multiset_diff(_read_lines(a, lowercase, binary), _read_lines(b, lowercase, binary))
+
+    result = MultisetDiff()
+    monitor = current_monitor()
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        with phase(stats, 'partition'):
+            a_parts = _partition_lines(_read_lines(a, lowercase, binary), Path(tmp), 'a', partitions, binary)
+            b_parts = _partition_lines(_read_lines(b, lowercase, binary), Path(tmp), 'b', partitions, binary)
+        with phase(stats, 'count'):
+            for part, (a_part, b_part) in enumerate(zip(a_parts, b_parts)):
+                if monitor is not None:
+                    monitor.checkpoint('count', part, partitions)
+                result.update(multiset_diff(iter_file_lines(a_part, binary), iter_file_lines(b_part, binary)))
+            if monitor is not None:
+                monitor.checkpoint('count', partitions, partitions)
+    return result
+
+
+def _read_lines(p: Path, lowercase: bool, binary: bool) -> Iterable[Text]:
+    lines = iter_file_lines(p, binary)
+    if lowercase:
+        return map(bytes.lower if binary else str.lower, lines)
+    return lines
+
+
+def _partition_lines(lines: Iterable[Text], tmp: Path, prefix: str, partitions: int, binary: bool) -> List[Path]:
+    paths = [tmp / f'{prefix}{part}.txt' for part in range(partitions)]
+    files = [open(p, 'wb' if binary else 'w') for p in paths]
+    newline = b'\n' if binary else '\n'
+    try:
+        for line in lines:
+            files[hash(line) % partitions].write(line + newline)
+    finally:
+        for file in files:
+            file.close()
+    return paths
+
+
+class MultisetSequenceMatcher:
+    """
+    MultisetSequenceMatcher compares sequences ignoring order of elements (see multiset_opcodes).
+    Only added and removed elements are reported (as "delete", "insert" and "replace" blocks at their positions),
+    so reordered elements don't produce "move" and "moved" opcodes. It runs in O(n + m) time.
+
+    Parameters:
+        a:
+            source(old) sequence.
+        b:
+            target(new) sequence.
+        replace_mode:
+            if True: it merges consecutive pairs of "insert" and "delete" blocks into "replace" operation.
+            Remains "insert" and "delete" blocks otherwise.
+    """
+
+    def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = '', replace_mode=True):
+        self.a = a
+        self.b = b
+        self.replace_mode = replace_mode
+
+    def set_seq1(self, a):
+        self.a = a
+
+    def set_seq2(self, b):
+        self.b = b
+
+    def set_seqs(self, a, b):
+        self.set_seq1(a)
+        self.set_seq2(b)
+
+    def get_opcodes(self, progress: ProgressCallback = None, cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b"
+        (see HeckelSequenceMatcher.get_opcodes()).
+        """
+        return self.compute(self.a, self.b, progress, cancel)
+
+    def compute(self, a: Sequence[Any], b: Sequence[Any], progress: ProgressCallback = None,
+                cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b" (see get_opcodes()).
+        This method doesn't modify matcher state, so single matcher instance can be safely used by many threads.
+        """
+        stats = current_stats()
+        with monitored(progress, cancel) as monitor, phase(stats, 'multiset'):
+            if monitor is not None:
+                monitor.raise_if_cancelled()
+            opcodes = multiset_opcodes(a, b, self.replace_mode)
+        if stats is not None:
+            stats.update_peak_opcodes(len(opcodes))
+        return opcodes
@@ -0,0 +1,364 @@
+from typing import Any, List, Sequence, Tuple, Optional, Callable
+
+from mdiff.progress import current_monitor, monitored, progress_suspended, ProgressCallback, CancellationToken, \
+    DiffMonitor, CHUNK_SIZE
+from mdiff.seqmatch.heckel import HeckelAlgorithm, HeckelOpCodeExtractor
+from mdiff.stats import current_stats, phase, suspended_stats
+from mdiff.utils import OpCode, intern_sequences
+
+# (i, j, length): a[i:i + length] == b[j:j + length]
+MatchingRun = Tuple[int, int, int]
+
+
+def _middle_snake(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int,
+                  monitor: Optional[DiffMonitor]) -> Tuple[int, int, int, int]:
+    """
+    Finds the middle snake of the shortest edit script between a[alo:ahi] and b[blo:bhi] running Myers' greedy
+    algorithm forward and backward at once. Both sequences must be non-empty.
+
+    Returns:
+        (x1, y1, x2, y2) where a[alo + x1:alo + x2] == b[blo + y1:blo + y2] is the middle snake
+        (possibly empty) splitting the edit script into two halves.
+    """
+    n = ahi - alo
+    m = bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    # furthest reaching x on diagonal k (k = x - y) of forward and backward (reversed sequences) paths
+    vf = [0] * (2 * max_d + 3)
+    vb = [0] * (2 * max_d + 3)
+    for d in range(max_d + 1):
+        if monitor is not None:
+            monitor.raise_if_cancelled()
+
+        for k in range(-d, d + 1, 2):
+            ko = k + offset
+            if k == -d or (k != d and vf[ko - 1] < vf[ko + 1]):
+                x = vf[ko + 1]
+            else:
+                x = vf[ko - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[ko] = x
+            if odd and delta - d < k < delta + d and x + vb[delta - k + offset] >= n:
+                return x0, y0, x, y
+
+        for k in range(-d, d + 1, 2):
+            ko = k + offset
+            if k == -d or (k != d and vb[ko - 1] < vb[ko + 1]):
+                x = vb[ko + 1]
+            else:
+                x = vb[ko - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[ko] = x
+            if not odd and -d <= delta - k <= d and x + vf[delta - k + offset] >= n:
+                return n - x, m - y, n - x0, m - y0
+
+    raise AssertionError('Middle snake not found.')
+
+
+# finds increasing matching runs splitting non-empty region a[alo:ahi], b[blo:bhi] into gaps diffed recursively,
+# returns None when region can't be split and empty list when region has no common elements
+# (runs of zero length are allowed, they only split the region)
+MatchFinder = Callable[[Sequence[int], int, int, Sequence[int], int, int], Optional[List[MatchingRun]]]
+
+
+def middle_snake_matches(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int) \
+        -> List[MatchingRun]:
+    """MatchFinder of Myers' algorithm: the middle snake of the shortest edit script."""
+    x1, y1, x2, y2 = _middle_snake(a, alo, ahi, b, blo, bhi, current_monitor())
+    return [(alo + x1, blo + y1, x2 - x1)]
+
+
+def recursive_matching_runs(a: Sequence[int], b: Sequence[int], find_matches: MatchFinder) -> List[MatchingRun]:
+    """
+    Divide and conquer matching of sequences. Common prefix and suffix of every region are matched first,
+    then find_matches splits the rest of region into gaps, which are processed the same way. Regions which
+    find_matches can't split are matched with Myers' algorithm (middle_snake_matches), regions without
+    common elements are left unmatched.
+
+    Returns:
+        Sorted list of maximal (i, j, length) runs, where a[i:i + length] == b[j:j + length].
+    """
+    monitor = current_monitor()
+    total = len(a) + len(b)
+    done = 0
+    next_checkpoint = 0
+    runs = []
+    stack = [(0, len(a), 0, len(b), find_matches)]
+    while stack:
+        if monitor is not None and done >= next_checkpoint:
+            monitor.checkpoint('lcs', done, total)
+            next_checkpoint = done + CHUNK_SIZE
+
+        alo, ahi, blo, bhi, finder = stack.pop()
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            runs.append((start, blo - alo + start, alo - start))
+        end = ahi
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if ahi < end:
+            runs.append((ahi, bhi, end - ahi))
+        done += 2 * (alo - start + end - ahi)
+
+        if alo == ahi or blo == bhi:
+            done += ahi - alo + bhi - blo
+            continue
+
+        matches = finder(a, alo, ahi, b, blo, bhi)
+        if matches is None:
+            stack.append((alo, ahi, blo, bhi, middle_snake_matches))
+            continue
+        if not matches:
+            done += ahi - alo + bhi - blo
+            continue
+
+        gaps = []
+        i, j = alo, blo
+        for mi, mj, length in matches:
+            gaps.append((i, mi, j, mj, finder))
+            if length:
+                runs.append((mi, mj, length))
+                done += 2 * length
+            i, j = mi + length, mj + length
+        gaps.append((i, ahi, j, bhi, finder))
+        stack.extend(reversed(gaps))
+
+    if monitor is not None:
+        monitor.checkpoint('lcs', total, total)
+
+    runs.sort()
+    merged = []
+    for i, j, length in runs:
+        if merged and merged[-1][0] + merged[-1][2] == i and merged[-1][1] + merged[-1][2] == j:
+            merged[-1] = merged[-1][0], merged[-1][1], merged[-1][2] + length
+        else:
+            merged.append((i, j, length))
+    return merged
+
+
+def myers_matching_runs(a: Sequence[int], b: Sequence[int]) -> List[MatchingRun]:
+    """
+    Finds the longest common subsequence of sequences with Myers' O(ND) algorithm in linear space
+    (divide and conquer on middle snakes, as described in "An O(ND) Difference Algorithm and Its Variations").
+    Common prefix and suffix of every subproblem are matched before the middle snake search,
+    so near-identical sequences are compared in nearly linear time.
+
+    Returns:
+        Sorted list of maximal (i, j, length) runs, where a[i:i + length] == b[j:j + length].
+
+    Example:
+        >>> myers_matching_runs('abcabba', 'cbabac')
+        [(1, 1, 1), (3, 2, 2), (6, 4, 1)]
+    """
+    return recursive_matching_runs(a, b, middle_snake_matches)
+
+
+def matching_runs_to_opcodes(runs: Sequence[MatchingRun], a_len: int, b_len: int, replace_mode=True) -> List[OpCode]:
+    """
+    Converts sorted matching runs into OpCodes of "equal", "insert", "delete" (and "replace" in replace mode) tags.
+
+    Example:
+        >>> matching_runs_to_opcodes([(0, 0, 2)], 3, 4)
+        [OpCode('equal', 0, 2, 0, 2), OpCode('replace', 2, 3, 2, 4)]
+    """
+    opcodes = []
+    i = j = 0
+    for ri, rj, length in list(runs) + [(a_len, b_len, 0)]:
+        if i < ri and j < rj and replace_mode:
+            opcodes.append(OpCode('replace', i, ri, j, rj))
+        else:
+            if i < ri:
+                opcodes.append(OpCode('delete', i, ri, j, j))
+            if j < rj:
+                opcodes.append(OpCode('insert', ri, ri, j, rj))
+        if length:
+            opcodes.append(OpCode('equal', ri, ri + length, rj, rj + length))
+        i = ri + length
+        j = rj + length
+    return opcodes
+
+
+class MyersAlgorithm:
+    """
+    Myers' diff algorithm run on integer-interned sequences. After run, runs attribute contains matching runs
+    of the longest common subsequence. Subclasses change the matching strategy by overriding find_matches
+    (see recursive_matching_runs).
+
+    With move detection enabled, elements deleted from "a" are additionally matched with elements inserted into "b"
+    by Heckel's algorithm. Matched (i, j) pairs are stored in moves attribute, remaining unmatched elements indexes
+    are stored in deleted and inserted attributes.
+    """
+
+    find_matches: MatchFinder = staticmethod(middle_snake_matches)
+
+    def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = ''):
+        self.a = a
+        self.b = b
+        self.a_ids: List[int] = []
+        self.b_ids: List[int] = []
+        self.runs: List[MatchingRun] = []
+        self.moves: List[Tuple[int, int]] = []
+        self.deleted: List[int] = []
+        self.inserted: List[int] = []
+
+    def run(self, detect_moves=False):
+        stats = current_stats()
+        with phase(stats, 'symbol_table'):
+            self.a_ids, self.b_ids, symbols = intern_sequences(self.a, self.b)
+        if stats is not None:
+            stats.symbol_table_size = symbols
+
+        with phase(stats, 'lcs'):
+            self.runs = recursive_matching_runs(self.a_ids, self.b_ids, self.find_matches)
+        if stats is not None:
+            stats.lis_length = sum(length for _, _, length in self.runs)
+
+        if detect_moves:
+            with phase(stats, 'moves'):
+                self._detect_moves()
+
+    def _detect_moves(self):
+        deleted = []
+        inserted = []
+        i = j = 0
+        for ri, rj, length in self.runs + [(len(self.a_ids), len(self.b_ids), 0)]:
+            deleted.extend(range(i, ri))
+            inserted.extend(range(j, rj))
+            i = ri + length
+            j = rj + length
+
+        alg = HeckelAlgorithm([self.a_ids[i] for i in deleted], [self.b_ids[j] for j in inserted])
+        # nested run reports neither statistics nor progress of its own
+        with suspended_stats(), progress_suspended():
+            alg.run()
+        self.moves = [(deleted[k], inserted[v]) for k, v in enumerate(alg.na) if isinstance(v, int)]
+        moved_i = {i for i, _ in self.moves}
+        moved_j = {j for _, j in self.moves}
+        self.deleted = [i for i in deleted if i not in moved_i]
+        self.inserted = [j for j in inserted if j not in moved_j]
+
+
+def _consecutive_blocks(indexes: Sequence[int]) -> List[Tuple[int, int]]:
+    """Groups sorted indexes into (start, length) blocks of consecutive values."""
+    blocks = []
+    for i in indexes:
+        if blocks and sum(blocks[-1]) == i:
+            blocks[-1] = blocks[-1][0], blocks[-1][1] + 1
+        else:
+            blocks.append((i, 1))
+    return blocks
+
+
+class MyersOpCodeExtractor(HeckelOpCodeExtractor):
+    """
+    This class extracts OpCodes with "move" and "moved" tags from MyersAlgorithm data. Unlike HeckelOpCodeExtractor,
+    it doesn't search for the longest increasing subsequence, because matching runs are already increasing
+    (common subsequence), so the work is proportional to the number of changed elements.
+    """
+
+    alg: MyersAlgorithm
+
+    def _generate_move_and_equal_opcodes(self) -> Sequence[OpCode]:
+        for i, j, length in self.alg.runs:
+            yield OpCode('equal', i, i + length, j, j + length)
+
+        blocks = []
+        for i, j in self.alg.moves:
+            if blocks and blocks[-1][0] + blocks[-1][2] == i and blocks[-1][1] + blocks[-1][2] == j:
+                blocks[-1] = blocks[-1][0], blocks[-1][1], blocks[-1][2] + 1
+            else:
+                blocks.append((i, j, 1))
+        for i, j, w in blocks:
+            yield OpCode('move', i, i + w, j, j)
+            yield OpCode('moved', i, i, j, j + w)
+
+    def _generate_insert_opcodes(self):
+        # i-indexes are set when opcodes are assembled
+        for j, w in _consecutive_blocks(self.alg.inserted):
+            yield OpCode('insert', 0, 0, j, j + w)
+
+    def _generate_delete_opcodes(self):
+        # j-indexes are set when opcodes are assembled
+        for i, w in _consecutive_blocks(self.alg.deleted):
+            yield OpCode('delete', i, i + w, 0, 0)
+
+
+class MyersSequenceMatcher:
+    """
+    MyersSequenceMatcher compares pairs of sequences of hashable elements with Eugene W. Myers' O(ND) difference
+    algorithm ("An O(ND) Difference Algorithm and Its Variations") in linear space. It finds minimal diff
+    (the longest common subsequence), so it's more precise than HeckelSequenceMatcher and much faster than
+    difflib.SequenceMatcher for large, nearly identical sequences. Sequence elements are interned
+    into integers before comparison.
+
+    Parameters:
+        a:
+            source(old) sequence.
+        b:
+            target(new) sequence.
+        replace_mode:
+            if True: it merges consecutive pairs of "insert" and "delete" blocks into "replace" operation.
+            Remains "insert" and "delete" blocks otherwise.
+        detect_moves:
+            if True: elements of "delete" and "insert" blocks are matched with Heckel's algorithm,
+            and matched ones are marked with "move" and "moved" tags.
+    """
+
+    algorithm_class = MyersAlgorithm
+
+    def __init__(self, a: Sequence[Any] = '', b: Sequence[Any] = '', replace_mode=True, detect_moves=True):
+        self.a = a
+        self.b = b
+        self.replace_mode = replace_mode
+        self.detect_moves = detect_moves
+
+    def set_seq1(self, a):
+        self.a = a
+
+    def set_seq2(self, b):
+        self.b = b
+
+    def set_seqs(self, a, b):
+        self.set_seq1(a)
+        self.set_seq2(b)
+
+    def get_opcodes(self, progress: ProgressCallback = None, cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b"
+        (see HeckelSequenceMatcher.get_opcodes()).
+        """
+        return self.compute(self.a, self.b, progress, cancel)
+
+    def compute(self, a: Sequence[Any], b: Sequence[Any], progress: ProgressCallback = None,
+                cancel: CancellationToken = None) -> List[OpCode]:
+        """
+        Returns list of OpCode objects describing how to turn sequence "a" into "b" (see get_opcodes()).
+        This method doesn't modify matcher state, so single matcher instance can be safely used by many threads.
+        """
+        with monitored(progress, cancel):
+            alg = self.algorithm_class(a, b)
+            alg.run(self.detect_moves)
+            if self.detect_moves:
+                return MyersOpCodeExtractor(alg, self.replace_mode).get_opcodes()
+
+            stats = current_stats()
+            with phase(stats, 'opcodes'):
+                opcodes = matching_runs_to_opcodes(alg.runs, len(a), len(b), self.replace_mode)
+            if stats is not None:
+                stats.update_peak_opcodes(len(opcodes))
+            return opcodes
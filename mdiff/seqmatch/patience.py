@@ -0,0 +1,149 @@
+from typing import List, Optional, Sequence, Tuple
+
+from mdiff.seqmatch.myers import MyersAlgorithm, MyersSequenceMatcher, MatchingRun
+from mdiff.utils import longest_increasing_subsequence
+
+# histogram diff doesn't anchor regions on elements occurring more often than that (as in git)
+MAX_CHAIN_LENGTH = 64
+
+
+def unique_anchors(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int) \
+        -> List[Tuple[int, int]]:
+    """
+    Finds elements occurring exactly once in both a[alo:ahi] and b[blo:bhi] - the same anchors that pass 3 of
+    Heckel's algorithm detects (symbol table entries with nc == oc == 1), but limited to sequences region.
+
+    Returns:
+        List of (i, j) pairs sorted by i, where a[i] == b[j].
+
+    Example:
+        >>> unique_anchors('abcab', 0, 5, 'cbxa', 0, 4)
+        [(2, 0)]
+    """
+    a_index = {}
+    for i in range(alo, ahi):
+        v = a[i]
+        a_index[v] = -1 if v in a_index else i
+    b_index = {}
+    for j in range(blo, bhi):
+        v = b[j]
+        if a_index.get(v, -1) >= 0:
+            b_index[v] = -1 if v in b_index else j
+    return sorted((a_index[v], j) for v, j in b_index.items() if j >= 0)
+
+
+def patience_matches(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int) \
+        -> Optional[List[MatchingRun]]:
+    """
+    MatchFinder of patience diff: the longest increasing subsequence of unique anchors.
+    Returns None if region has no unique anchors (and empty list if it has no common elements at all).
+    """
+    anchors = unique_anchors(a, alo, ahi, b, blo, bhi)
+    if not anchors:
+        return None if not set(a[alo:ahi]).isdisjoint(b[blo:bhi]) else []
+    lis = longest_increasing_subsequence(anchors, key=lambda x: x[1])
+    return [(i, j, 1) for _, (i, j) in lis]
+
+
+def histogram_matches(a: Sequence[int], alo: int, ahi: int, b: Sequence[int], blo: int, bhi: int) \
+        -> Optional[List[MatchingRun]]:
+    """
+    MatchFinder of histogram diff: the longest common run containing the least frequent elements of "a" region.
+    Unique anchors are preferred like in patience diff, but regions without them are still split on rare
+    elements. Returns None if all common elements occur more than MAX_CHAIN_LENGTH times
+    (and empty list if region has no common elements).
+    """
+    occurrences = {}
+    for i in range(alo, ahi):
+        occurrences.setdefault(a[i], []).append(i)
+
+    best = None
+    best_count = MAX_CHAIN_LENGTH + 1
+    common = False
+    j = blo
+    while j < bhi:
+        positions = occurrences.get(b[j])
+        if positions is None:
+            j += 1
+            continue
+        common = True
+        if len(positions) > MAX_CHAIN_LENGTH or len(positions) > best_count:
+            j += 1
+            continue
+        next_j = j + 1
+        for i in positions:
+            count = len(positions)
+            si, sj = i, j
+            while si > alo and sj > blo and a[si - 1] == b[sj - 1]:
+                si -= 1
+                sj -= 1
+                count = min(count, len(occurrences[a[si]]))
+            ei, ej = i + 1, j + 1
+            while ei < ahi and ej < bhi and a[ei] == b[ej]:
+                count = min(count, len(occurrences[a[ei]]))
+                ei += 1
+                ej += 1
+            if count < best_count or (count == best_count and ei - si > best[2]):
+                best = si, sj, ei - si
+                best_count = count
+            next_j = max(next_j, ej)
+        j = next_j
+    if best is None:
+        return None if common else []
+    return [best]
+
+
+class PatienceAlgorithm(MyersAlgorithm):
+    find_matches = staticmethod(patience_matches)
+
+
+class HistogramAlgorithm(MyersAlgorithm):
+    find_matches = staticmethod(histogram_matches)
+
+
+class PatienceSequenceMatcher(MyersSequenceMatcher):
+    """
+    PatienceSequenceMatcher implements patience diff (as in git diff --patience). Elements occurring exactly once
+    in both sequences are used as anchors, the longest increasing subsequence of anchors is matched and
+    the algorithm recurses into gaps between them. Regions without unique elements are compared with Myers'
+    algorithm. It gives human-readable diffs of source code, where unique lines (i.e. function definitions)
+    are kept in place instead of matching common lines like blank lines or braces.
+
+    Parameters:
+        a:
+            source(old) sequence.
+        b:
+            target(new) sequence.
+        replace_mode:
+            if True: it merges consecutive pairs of "insert" and "delete" blocks into "replace" operation.
+            Remains "insert" and "delete" blocks otherwise.
+        detect_moves:
+            if True: elements of "delete" and "insert" blocks are matched with Heckel's algorithm,
+            and matched ones are marked with "move" and "moved" tags.
+    """
+
+    algorithm_class = PatienceAlgorithm
+
+
+class HistogramSequenceMatcher(MyersSequenceMatcher):
+    """
+    HistogramSequenceMatcher implements histogram diff (as in git diff --histogram), an extension of patience diff.
+    In every region the longest common run containing the least frequent elements is matched, and the algorithm
+    recurses into regions before and after it. Unlike patience diff, it also splits regions that don't contain
+    unique elements. Regions with elements occurring more than MAX_CHAIN_LENGTH times are compared with
+    Myers' algorithm.
+
+    Parameters:
+        a:
+            source(old) sequence.
+        b:
+            target(new) sequence.
+        replace_mode:
+            if True: it merges consecutive pairs of "insert" and "delete" blocks into "replace" operation.
+            Remains "insert" and "delete" blocks otherwise.
+        detect_moves:
+            if True: elements of "delete" and "insert" blocks are matched with Heckel's algorithm,
+            and matched ones are marked with "move" and "moved" tags.
+    """
+
+    algorithm_class = HistogramAlgorithm
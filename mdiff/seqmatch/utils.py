@@ -2,7 +2,12 @@ from difflib import SequenceMatcher
 from enum import Enum
 from typing import Type
 
+from mdiff.seqmatch.auto import AutoSequenceMatcher
+from mdiff.seqmatch.merge_join import SortedSequenceMatcher
+from mdiff.seqmatch.multiset import MultisetSequenceMatcher
 from mdiff.seqmatch.heckel import HeckelSequenceMatcher, DisplacementSequenceMatcher
+from mdiff.seqmatch.myers import MyersSequenceMatcher
+from mdiff.seqmatch.patience import PatienceSequenceMatcher, HistogramSequenceMatcher
 from mdiff.utils import SequenceMatcherBase
 
 
@@ -10,12 +15,24 @@ class SequenceMatcherName(str, Enum):
     STANDARD = 'standard'
     HECKEL = 'heckel'
     DISPLACEMENT = 'displacement'
+    MYERS = 'myers'
+    PATIENCE = 'patience'
+    HISTOGRAM = 'histogram'
+    AUTO = 'auto'
+    SORTED = 'sorted'
+    MULTISET = 'multiset'
 
 
 seq_matchers = {
     SequenceMatcherName.STANDARD: SequenceMatcher,
     SequenceMatcherName.HECKEL: HeckelSequenceMatcher,
     SequenceMatcherName.DISPLACEMENT: DisplacementSequenceMatcher,
+    SequenceMatcherName.MYERS: MyersSequenceMatcher,
+    SequenceMatcherName.PATIENCE: PatienceSequenceMatcher,
+    SequenceMatcherName.HISTOGRAM: HistogramSequenceMatcher,
+    SequenceMatcherName.AUTO: AutoSequenceMatcher,
+    SequenceMatcherName.SORTED: SortedSequenceMatcher,
+    SequenceMatcherName.MULTISET: MultisetSequenceMatcher,
 }
 
 
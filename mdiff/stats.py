@@ -0,0 +1,120 @@
+"""
+This module provides optional instrumentation of diff pipeline. Instrumented code asks for currently collected
+DiffStats object with current_stats() once per call and skips recording when it's None, so there is no measurable
+overhead unless statistics are collected with collect_stats() context manager.
+
+Example:
+    >>> from mdiff import diff_lines_with_similarities
+    >>> with collect_stats() as stats:
+    ...     _ = diff_lines_with_similarities('aa1\\nbb2\\ncc3', 'aa1\\ncc2', cutoff=0.6)
+    >>> stats.symbol_table_size, stats.unique_anchors, stats.lis_length, stats.ratio_calls
+    (4, 1, 1, 2)
+"""
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, List, ContextManager
+
+_active_stats: ContextVar[Optional['DiffStats']] = ContextVar('mdiff_active_stats', default=None)
+_no_phase = nullcontext()
+
+
+@dataclass
+class DiffStats:
+    """
+    Statistics collected during diff generation.
+        phase_times: wall time (in seconds) spent in each phase. Nested phases are named with "/" separated path,
+            so time of nested phase is also included in its parent phase time.
+        symbol_table_size: number of distinct elements in line level matcher symbol table.
+        unique_anchors: number of elements occurring exactly once in both sequences.
+        lis_length: length of the longest increasing subsequence of matched elements ("equal" elements).
+        ratio_calls: number of SequenceMatcher.ratio() calls made during similar lines search.
+        peak_opcodes: the biggest number of opcodes generated at once.
+        degradations: degradation stages applied because diff went over budget (see mdiff.budget).
+        auto_matcher: name of algorithm chosen by AutoSequenceMatcher (None if it wasn't used).
+    """
+    phase_times: Dict[str, float] = field(default_factory=dict)
+    symbol_table_size: int = 0
+    unique_anchors: int = 0
+    lis_length: int = 0
+    ratio_calls: int = 0
+    peak_opcodes: int = 0
+    degradations: List[str] = field(default_factory=list)
+    auto_matcher: Optional[str] = None
+    _phases_stack: List[str] = field(default_factory=list, repr=False, compare=False)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measures wall time of code block and adds it to the phase time."""
+        self._phases_stack.append(name)
+        path = '/'.join(self._phases_stack)
+        # register phase on entry, so parent phases are reported before nested ones
+        self.phase_times.setdefault(path, 0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[path] += time.perf_counter() - start
+            self._phases_stack.pop()
+
+    @property
+    def current_phase(self) -> Optional[str]:
+        return '/'.join(self._phases_stack) or None
+
+    def update_peak_opcodes(self, opcodes_number: int):
+        self.peak_opcodes = max(self.peak_opcodes, opcodes_number)
+
+    def format(self) -> str:
+        """Returns human-readable statistics report."""
+        lines = ['Phase times:']
+        for path, seconds in self.phase_times.items():
+            *parents, name = path.split('/')
+            lines.append(f'{"  " * (len(parents) + 1)}{name:{32 - 2 * len(parents)}} {seconds * 1000:10.3f} ms')
+        lines.extend([
+            f'Symbol table size: {self.symbol_table_size}',
+            f'Unique anchors: {self.unique_anchors}',
+            f'LIS length: {self.lis_length}',
+            f'ratio() calls: {self.ratio_calls}',
+            f'Peak opcodes: {self.peak_opcodes}',
+        ])
+        if self.auto_matcher is not None:
+            lines.append(f'Auto matcher: {self.auto_matcher}')
+        if self.degradations:
+            lines.append(f'Degradations: {", ".join(self.degradations)}')
+        return '\n'.join(lines)
+
+
+def current_stats() -> Optional[DiffStats]:
+    """Returns DiffStats object collecting statistics in current context or None when statistics are not collected."""
+    return _active_stats.get()
+
+
+@contextmanager
+def collect_stats(stats: DiffStats = None):
+    """
+    Context manager enabling statistics collection of diff functions called within it.
+    Yields DiffStats object (new one if not passed) filled with collected statistics.
+    """
+    if stats is None:
+        stats = DiffStats()
+    token = _active_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _active_stats.reset(token)
+
+
+@contextmanager
+def suspended_stats():
+    """Disables statistics collection within context (i.e. for nested diffs of similar lines)."""
+    token = _active_stats.set(None)
+    try:
+        yield
+    finally:
+        _active_stats.reset(token)
+
+
+def phase(stats: Optional[DiffStats], name: str) -> ContextManager:
+    """Returns context manager measuring phase time if stats are collected, no-op context manager otherwise."""
+    return _no_phase if stats is None else stats.phase(name)
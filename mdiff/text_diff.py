@@ -1,8 +1,17 @@
 from difflib import SequenceMatcher
-from typing import Sequence, Generator, List, Tuple
+from functools import partial
+from pathlib import Path
+from typing import Sequence, Generator, List, Tuple, Callable, Dict, Hashable, Iterable
 
-from mdiff.seqmatch.heckel import HeckelSequenceMatcher
-from mdiff.utils import OpCodesType, OpCode, CompositeOpCode, SequenceMatcherBase
+from mdiff.budget import current_budget, budgeted, DiffBudget, BudgetExceededException, SKIP_SIMILARITIES, \
+    DISPLACEMENT_TO_HECKEL, COARSE_REPLACE, coarse_opcodes
+from mdiff.profiling import profile_from_env
+from mdiff.progress import current_monitor, monitored, ProgressCallback, CancellationToken, progress_suspended, \
+    DiffMonitor
+from mdiff.seqmatch.heckel import HeckelSequenceMatcher, DisplacementSequenceMatcher
+from mdiff.stats import current_stats, phase, suspended_stats, DiffStats
+from mdiff.utils import OpCodesType, OpCode, CompositeOpCode, SequenceMatcherBase, LazyCompositeOpCode, OpCodeType, \
+    Text, TextBuffer, split_lines, read_files_lines
 
 
 def find_best_similar_match(i1: int, i2: int, j1: int, j2: int, a: Sequence, b: Sequence, sm: SequenceMatcher = None) \
@@ -26,25 +35,49 @@ def find_best_similar_match(i1: int, i2: int, j1: int, j2: int, a: Sequence, b:
     """
     best_ratio = 0.0
     best_i = best_j = None
+    ratio_calls = charged_ratio_calls = 0
+    monitor = current_monitor()
+    budget = current_budget()
     if not sm:
         sm = SequenceMatcher()
 
     for i in range(i1, i2):
+        if monitor is not None:
+            monitor.raise_if_cancelled()
+        if budget is not None:
+            budget.charge_ratio_calls(ratio_calls - charged_ratio_calls)
+            charged_ratio_calls = ratio_calls
         sm.set_seq1(a[i])
         for j in range(j1, j2):
             if a[i] == b[j]:
                 continue
             sm.set_seq2(b[j])
-            if sm.real_quick_ratio() > best_ratio and sm.quick_ratio() > best_ratio and sm.ratio() > best_ratio:
-                best_i = i
-                best_j = j
-                best_ratio = sm.ratio()
+            if sm.real_quick_ratio() > best_ratio and sm.quick_ratio() > best_ratio:
+                ratio_calls += 1
+                ratio = sm.ratio()
+                if ratio > best_ratio:
+                    best_i = i
+                    best_j = j
+                    best_ratio = ratio
 
+    stats = current_stats()
+    if stats is not None:
+        stats.ratio_calls += ratio_calls
+    if budget is not None:
+        budget.charge_ratio_calls(ratio_calls - charged_ratio_calls)
     return best_i, best_j, best_ratio
 
 
+def inline_opcodes(a_item: Sequence, b_item: Sequence, sm: SequenceMatcherBase) -> List[OpCode]:
+    """Generates opcodes between elements of two sequences (i.e. characters of similar lines)."""
+    sm.set_seqs(a_item, b_item)
+    return [OpCode(*i) for i in sm.get_opcodes()]
+
+
 def extract_replace_similarities(tag: str, i1: int, i2: int, j1: int, j2: int, a: Sequence, b: Sequence, cutoff: float,
-                                 sm: SequenceMatcherBase = None) -> Generator[CompositeOpCode, None, None]:
+                                 sm: SequenceMatcherBase = None, lazy_inline: bool = False,
+                                 cancel: CancellationToken = None) \
+        -> Generator[CompositeOpCode, None, None]:
     """
     Finds and extracts similarities in sequences bounded by indexes a[i1:i2], b[j1: j2].
     Returns CompositeOpCode object with subsequence level of opcodes for pair of elements from sequences "a" and "b"
@@ -64,26 +97,51 @@ def extract_replace_similarities(tag: str, i1: int, i2: int, j1: int, j2: int, a
     :param b: second sequence.
     :param cutoff: Value in range of (0.0: 1.0). Elements similarity ratio cutoff to generate subsequence diff.
     :param sm: SequenceMatcher object. Creates new difflib.SequenceMatcher instance if not passed.
+    :param lazy_inline: If True, subsequence opcodes are generated on first access to children_opcodes.
+    :param cancel: Cancellation token. DiffCancelledException is raised when cancellation is requested.
 
     :return: Generator of CompositeOpCode elements with potential subsequences opcodes.
     """
     if sm is None:
         sm = SequenceMatcher()
 
-    match_i, match_j, match_ratio = find_best_similar_match(i1, i2, j1, j2, a, b)
+    with monitored(cancel=cancel):
+        yield from _extract_replace_similarities(
+            tag, i1, i2, j1, j2, cutoff,
+            find_match=lambda *bounds: find_best_similar_match(*bounds, a, b),
+            make_children=lambda i, j: inline_opcodes(a[i], b[j], sm),
+            lazy_inline=lazy_inline)
+
+
+MatchFinder = Callable[[int, int, int, int], Tuple[int, int, float]]
+ChildrenFactory = Callable[[int, int], List[OpCode]]
+
+
+def _extract_replace_similarities(tag: str, i1: int, i2: int, j1: int, j2: int, cutoff: float,
+                                  find_match: MatchFinder, make_children: ChildrenFactory, lazy_inline: bool) \
+        -> Generator[CompositeOpCode, None, None]:
+    """
+    Implementation of extract_replace_similarities, where finding the most similar pair of elements
+    and generating its subsequence opcodes are delegated to find_match and make_children functions.
+    """
+    match_i, match_j, match_ratio = find_match(i1, i2, j1, j2)
     if match_ratio > cutoff:
         # left
-        yield from extract_replace_similarities(tag, i1, match_i, j1, match_j, a, b, cutoff, sm)
+        yield from _extract_replace_similarities(tag, i1, match_i, j1, match_j, cutoff,
+                                                 find_match, make_children, lazy_inline)
 
         # replace middle
-        sm.set_seqs(a=a[match_i], b=b[match_j])
-        opcodes = [OpCode(*i) for i in sm.get_opcodes()]
-        opcode = CompositeOpCode(tag, match_i, match_i + 1, match_j, match_j + 1)
-        opcode.children_opcodes.extend(opcodes)
-        yield opcode
+        if lazy_inline:
+            yield LazyCompositeOpCode(tag, match_i, match_i + 1, match_j, match_j + 1,
+                                      partial(make_children, match_i, match_j))
+        else:
+            opcode = CompositeOpCode(tag, match_i, match_i + 1, match_j, match_j + 1)
+            opcode.children_opcodes.extend(make_children(match_i, match_j))
+            yield opcode
 
         # right
-        yield from extract_replace_similarities(tag, match_i + 1, i2, match_j + 1, j2, a, b, cutoff, sm)
+        yield from _extract_replace_similarities(tag, match_i + 1, i2, match_j + 1, j2, cutoff,
+                                                 find_match, make_children, lazy_inline)
     else:
         if not (i1 == i2 and j1 == j2):
             if i1 == i2:
@@ -95,7 +153,9 @@ def extract_replace_similarities(tag: str, i1: int, i2: int, j1: int, j2: int, a
 
 
 def extract_similarities(opcodes: OpCodesType, a: Sequence, b: Sequence, cutoff: float,
-                         sm: SequenceMatcherBase = None) -> Generator[CompositeOpCode, None, None]:
+                         sm: SequenceMatcherBase = None, lazy_inline: bool = False,
+                         progress: ProgressCallback = None, cancel: CancellationToken = None) \
+        -> Generator[CompositeOpCode, None, None]:
     """
     Translate OpCodes into CompositeOpCodes. Input sequences must contain sequences
     (for example list of strings generated by str.splitlines() function).
@@ -108,6 +168,10 @@ def extract_similarities(opcodes: OpCodesType, a: Sequence, b: Sequence, cutoff:
     :param b: second sequence.
     :param cutoff: Value in range of (0.0: 1.0). Elements similarity ratio cutoff to generate subsequence diff.
     :param sm: SequenceMatcher object. Creates new difflib.SequenceMatcher instance if not passed.
+    :param lazy_inline: If True, subsequence opcodes are generated on first access to children_opcodes.
+    :param progress: Callback called with ("similarities", done, total) arguments, where done and total are numbers
+    of processed and all "a" sequence elements in "replace" opcodes.
+    :param cancel: Cancellation token. DiffCancelledException is raised when cancellation is requested.
 
     :return: Generator of CompositeOpCode where children_opcodes attribute may contain opcodes regarding
     subsequence comparison (for example similar text lines).
@@ -115,27 +179,90 @@ def extract_similarities(opcodes: OpCodesType, a: Sequence, b: Sequence, cutoff:
     if sm is None:
         sm = SequenceMatcher()
 
+    with monitored(progress, cancel):
+        yield from _extract_similarities(
+            opcodes, cutoff,
+            find_match=lambda *bounds: find_best_similar_match(*bounds, a, b),
+            make_children=lambda i, j: inline_opcodes(a[i], b[j], sm),
+            lazy_inline=lazy_inline)
+
+
+def _extract_similarities(opcodes: OpCodesType, cutoff: float, find_match: MatchFinder,
+                          make_children: ChildrenFactory, lazy_inline: bool) \
+        -> Generator[CompositeOpCode, None, None]:
+    monitor = current_monitor()
+    budget = current_budget()
+    if monitor is not None:
+        opcodes = list(opcodes)
+        total = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'replace')
+        done = 0
+        _similarities_checkpoint(monitor, done, total)
+
     for tag, i1, i2, j1, j2 in opcodes:
         if tag == 'replace':
-            yield from extract_replace_similarities(tag, i1, i2, j1, j2, a, b, cutoff, sm)
+            if budget is None:
+                yield from _extract_replace_similarities(tag, i1, i2, j1, j2, cutoff,
+                                                         find_match, make_children, lazy_inline)
+            else:
+                yield from _budgeted_replace_similarities(budget, tag, i1, i2, j1, j2, cutoff,
+                                                          find_match, make_children, lazy_inline)
+            if monitor is not None:
+                done += i2 - i1
+                _similarities_checkpoint(monitor, done, total)
         else:
             yield CompositeOpCode(tag, i1, i2, j1, j2)
 
 
-def diff_lines_with_similarities(a: str, b: str, cutoff=0.75,
+def _similarities_checkpoint(monitor: DiffMonitor, done: int, total: int):
+    try:
+        monitor.checkpoint('similarities', done, total)
+    except BudgetExceededException:
+        # exceeded budget doesn't stop the diff, the rest of replace blocks is skipped instead
+        pass
+
+
+def _budgeted_replace_similarities(budget: DiffBudget, tag: str, i1: int, i2: int, j1: int, j2: int, cutoff: float,
+                                   find_match: MatchFinder, make_children: ChildrenFactory, lazy_inline: bool) \
+        -> Generator[CompositeOpCode, None, None]:
+    """
+    Extracts similarities in replace block unless it exceeds the budget. Block is presented as a single
+    "replace" opcode when budget is already exceeded, when it has more lines pairs to compare than ratio() calls left
+    or when budget is exceeded during the search.
+    """
+    if budget.time_exceeded() or budget.ratio_calls_left() < (i2 - i1) * (j2 - j1):
+        budget.degrade(SKIP_SIMILARITIES)
+        yield CompositeOpCode(tag, i1, i2, j1, j2)
+        return
+    try:
+        block = list(_extract_replace_similarities(tag, i1, i2, j1, j2, cutoff,
+                                                   find_match, make_children, lazy_inline))
+    except BudgetExceededException:
+        budget.degrade(SKIP_SIMILARITIES)
+        block = [CompositeOpCode(tag, i1, i2, j1, j2)]
+    yield from block
+
+
+def diff_lines_with_similarities(a: TextBuffer, b: TextBuffer, cutoff=0.75,
                                  line_sm: SequenceMatcherBase = None,
                                  inline_sm: SequenceMatcherBase = None,
                                  keepends=False,
-                                 case_sensitive=True) \
-        -> Tuple[List[str], List[str], List[CompositeOpCode]]:
+                                 case_sensitive=True,
+                                 lazy_inline=False,
+                                 progress: ProgressCallback = None,
+                                 cancel: CancellationToken = None,
+                                 budget_seconds: float = None,
+                                 max_ratio_calls: int = None) \
+        -> Tuple[List[Text], List[Text], List[CompositeOpCode]]:
     """
     Takes input strings "a" and "b", splits them by newline characters and generates line diff opcodes.
     For every "replace" tag generated on line level, a search for similar lines is performed,
     if similarity exceeds line_similarity_cutoff value, 
     then additional opcodes are generated on character level that distinguish similar lines.
+    Inputs can also be bytes-like buffers (bytes mode): they are split into bytes lines and compared without decoding,
+    and in-line opcodes of similar lines are generated on byte level.
 
-    :param a: source input text.
-    :param b: target input text.
+    :param a: source input text (str, bytes, bytearray or memoryview).
+    :param b: target input text (str, bytes, bytearray or memoryview).
     :param cutoff: Value in range of (0.0: 1.0) where 0.0 means that lines are completely different
     and 1.0 means that lines are exactly the same. Line similarity cutoff is used to determine
     if sub opcodes for similar lines should be generated.
@@ -143,6 +270,15 @@ def diff_lines_with_similarities(a: str, b: str, cutoff=0.75,
     :param inline_sm: SequenceMatcher object used to generate diff tags between characters in similar lines.
     :param keepends: Whether to keep newline characters when splitting input sequences.
     :param case_sensitive: Whether to perform string case sensitive comparison when generating diff.
+    :param lazy_inline: Whether to postpone character level diff generation until children_opcodes of similar lines
+    opcode is accessed (useful when only part of diff result is presented).
+    :param progress: Callback called with (phase, done, total) arguments while diff is generated.
+    :param cancel: Cancellation token. DiffCancelledException is raised when cancellation is requested.
+    :param budget_seconds: Time budget of the diff. When it's exceeded, diff degrades in stages (see mdiff.budget):
+    skips similar lines search in replace blocks, replaces DisplacementSequenceMatcher with HeckelSequenceMatcher
+    and finally emits coarse replace blocks.
+    :param max_ratio_calls: Maximal number of ratio() calls in similar lines search. Replace blocks which would
+    exceed it are not searched for similar lines.
 
     :return: (a_lines, b_lines, opcodes) where:
         a_lines: is "a" input text split by newline characters.
@@ -153,6 +289,7 @@ def diff_lines_with_similarities(a: str, b: str, cutoff=0.75,
             between similar lines. children_opcode list is empty when no lines meets line_similarity_cutoff condition.
             (note that similar lines opcodes are generated only for "replace" tags, so children_opcodes list
             will be empty for every other tag).
+            It's DiffOpCodes list, which degradations attribute contains names of applied degradation stages.
 
     Example:
     >>> a, b, opcodes = diff_lines_with_similarities(a='aa1\\nbb2\\ncc3', b='aa1\\ncc2', cutoff=0.6)
@@ -165,29 +302,238 @@ def diff_lines_with_similarities(a: str, b: str, cutoff=0.75,
     >>> opcodes[2].children_opcodes
     [OpCode('equal', 0, 2, 0, 2), OpCode('replace', 2, 3, 2, 3)]
     """
-    if not 0.0 <= cutoff <= 1.0:
-        raise ValueError('Cutoff must have value in range 0.0 <= cutoff <= 1.0')
+    session = DiffSession(a, b)
+    return session.diff(cutoff=cutoff, line_sm=line_sm, inline_sm=inline_sm, keepends=keepends,
+                        case_sensitive=case_sensitive, lazy_inline=lazy_inline, progress=progress, cancel=cancel,
+                        budget_seconds=budget_seconds, max_ratio_calls=max_ratio_calls)
 
-    if line_sm is None:
-        line_sm = HeckelSequenceMatcher()
-    if inline_sm is None:
-        inline_sm = SequenceMatcher()
 
-    a_lines = a.splitlines(keepends=keepends)
-    b_lines = b.splitlines(keepends=keepends)
-    if case_sensitive:
-        sm_a_lines = a_lines
-        sm_b_lines = b_lines
-    else:
-        sm_a_lines = [i.lower() for i in a_lines]
-        sm_b_lines = [i.lower() for i in b_lines]
-    line_sm.set_seqs(sm_a_lines, sm_b_lines)
-    line_opcodes = line_sm.get_opcodes()
+def diff_files(a: Path, b: Path, cutoff=0.75,
+               line_sm: SequenceMatcherBase = None,
+               inline_sm: SequenceMatcherBase = None,
+               keepends=False,
+               case_sensitive=True,
+               lazy_inline=False,
+               progress: ProgressCallback = None,
+               cancel: CancellationToken = None,
+               budget_seconds: float = None,
+               max_ratio_calls: int = None,
+               binary=False) \
+        -> Tuple[List[Text], List[Text], List[CompositeOpCode]]:
+    """
+    Generates diff of files, the same way as diff_lines_with_similarities does for texts.
+    Files compressed with gzip, bz2 or xz (detected by magic bytes) are decompressed while they are read.
+    Both files are read in separate threads and split into lines chunk by chunk, so whole (decompressed)
+    content of files is never held in memory, only their lines.
+
+    :param a: source file path.
+    :param b: target file path.
+    :param binary: Whether to compare undecoded bytes lines (bytes mode).
+    Other parameters and result are the same as in diff_lines_with_similarities.
+    """
+    with phase(current_stats(), 'read'):
+        a_lines, b_lines = read_files_lines(a, b, keepends, binary)
+    session = DiffSession.from_lines(a_lines, b_lines, keepends)
+    return session.diff(cutoff=cutoff, line_sm=line_sm, inline_sm=inline_sm, keepends=keepends,
+                        case_sensitive=case_sensitive, lazy_inline=lazy_inline, progress=progress, cancel=cancel,
+                        budget_seconds=budget_seconds, max_ratio_calls=max_ratio_calls)
+
+
+def _sm_key(sm: SequenceMatcherBase) -> Hashable:
+    """Returns key identifying SequenceMatcher configuration for memoization purposes."""
+    return type(sm), getattr(sm, 'replace_mode', None), getattr(sm, 'detect_moves', None)
+
+
+class DiffSession:
+    """
+    Diff of two input texts with memoized pipeline stages:
+    split into lines -> normalize (case) -> line level opcodes -> similar lines search -> in-line opcodes.
+
+    Every stage result is cached and keyed with parameters that affect it, so repeated diffs with changed
+    parameters (i.e. cutoff or in-line SequenceMatcher in GUI) reuse results of unaffected stages. For example
+    line opcodes are reused across cutoff changes, and similarity ratios of lines are reused when only cutoff changes.
+
+    Parameters:
+        a: source input text (str, or bytes-like buffer compared without decoding).
+        b: target input text (str, or bytes-like buffer compared without decoding).
+
+    Example:
+    >>> session = DiffSession('aa1\\nbb2\\ncc3', 'aa1\\ncc2')
+    >>> _, _, opcodes = session.diff(cutoff=0.6)
+    >>> opcodes
+    [CompositeOpCode('equal', 0, 1, 0, 1), CompositeOpCode('delete', 1, 2, 1, 1), CompositeOpCode('replace', 2, 3, 1, 2)*]
+    >>> _, _, opcodes = session.diff(cutoff=0.7)
+    >>> opcodes
+    [CompositeOpCode('equal', 0, 1, 0, 1), CompositeOpCode('replace', 1, 3, 1, 2)]
+    """
+
+    def __init__(self, a: TextBuffer, b: TextBuffer):
+        self.a = a
+        self.b = b
+        self._lines: Dict[bool, Tuple[List[Text], List[Text]]] = {}
+        self._normalized_lines: Dict[Tuple[bool, bool], Tuple[List[Text], List[Text]]] = {}
+        self._line_opcodes: Dict[Hashable, List[OpCodeType]] = {}
+        self._best_matches: Dict[Hashable, Tuple[int, int, float]] = {}
+        self._inline_opcodes: Dict[Hashable, List[OpCode]] = {}
+
+    @classmethod
+    def from_lines(cls, a_lines: List[Text], b_lines: List[Text], keepends=False) -> 'DiffSession':
+        """
+        Creates session of texts already split into lines (i.e. read with read_file_lines). Input texts are not
+        kept, so diff can be generated only with the same keepends value as lines were split with.
+        """
+        session = cls(None, None)
+        session._lines[keepends] = a_lines, b_lines
+        return session
+
+    def lines(self, keepends=False) -> Tuple[List[Text], List[Text]]:
+        """Returns input texts split into lines (bytes lines for bytes-like inputs)."""
+        if keepends not in self._lines:
+            if self.a is None:
+                raise ValueError(f'Session lines were split with keepends={not keepends}.')
+            self._lines[keepends] = split_lines(self.a, keepends), split_lines(self.b, keepends)
+        return self._lines[keepends]
+
+    def normalized_lines(self, keepends=False, case_sensitive=True) -> Tuple[List[Text], List[Text]]:
+        """Returns lines used for comparison (lower case lines for case insensitive comparison)."""
+        if case_sensitive:
+            return self.lines(keepends)
+        key = keepends, case_sensitive
+        if key not in self._normalized_lines:
+            a_lines, b_lines = self.lines(keepends)
+            self._normalized_lines[key] = [i.lower() for i in a_lines], [i.lower() for i in b_lines]
+        return self._normalized_lines[key]
+
+    def line_opcodes(self, line_sm: SequenceMatcherBase = None, keepends=False, case_sensitive=True) \
+            -> List[OpCodeType]:
+        """Returns line level opcodes."""
+        if line_sm is None:
+            line_sm = HeckelSequenceMatcher()
+        key = _sm_key(line_sm), keepends, case_sensitive
+        if key not in self._line_opcodes:
+            sm_a_lines, sm_b_lines = self.normalized_lines(keepends, case_sensitive)
+            stats = current_stats()
+            with phase(stats, 'line_opcodes'):
+                line_sm.set_seqs(sm_a_lines, sm_b_lines)
+                self._line_opcodes[key] = line_sm.get_opcodes()
+            if stats is not None:
+                stats.update_peak_opcodes(len(self._line_opcodes[key]))
+        return self._line_opcodes[key]
+
+    def find_best_similar_match(self, i1: int, i2: int, j1: int, j2: int, keepends=False, case_sensitive=True) \
+            -> Tuple[int, int, float]:
+        """Memoized find_best_similar_match for normalized lines."""
+        key = i1, i2, j1, j2, keepends, case_sensitive
+        if key not in self._best_matches:
+            sm_a_lines, sm_b_lines = self.normalized_lines(keepends, case_sensitive)
+            self._best_matches[key] = find_best_similar_match(i1, i2, j1, j2, sm_a_lines, sm_b_lines)
+        return self._best_matches[key]
+
+    def inline_opcodes(self, i: int, j: int, inline_sm: SequenceMatcherBase, keepends=False, case_sensitive=True) \
+            -> List[OpCode]:
+        """Returns memoized opcodes between similar lines a_lines[i] and b_lines[j]."""
+        key = i, j, _sm_key(inline_sm), keepends, case_sensitive
+        if key not in self._inline_opcodes:
+            sm_a_lines, sm_b_lines = self.normalized_lines(keepends, case_sensitive)
+            self._inline_opcodes[key] = inline_opcodes(sm_a_lines[i], sm_b_lines[j], inline_sm)
+        return self._inline_opcodes[key]
+
+    def diff(self, cutoff=0.75, line_sm: SequenceMatcherBase = None, inline_sm: SequenceMatcherBase = None,
+             keepends=False, case_sensitive=True, lazy_inline=False, progress: ProgressCallback = None,
+             cancel: CancellationToken = None, budget_seconds: float = None, max_ratio_calls: int = None) \
+            -> Tuple[List[Text], List[Text], List[CompositeOpCode]]:
+        """
+        Generates diff for session texts. Takes the same parameters and returns the same result
+        as diff_lines_with_similarities function.
+        """
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError('Cutoff must have value in range 0.0 <= cutoff <= 1.0')
+
+        budget = None
+        if budget_seconds is not None or max_ratio_calls is not None:
+            budget = DiffBudget(budget_seconds, max_ratio_calls, cancel)
+            cancel = budget
+
+        with profile_from_env(), monitored(progress, cancel), budgeted(budget):
+            return self._diff(cutoff, line_sm, inline_sm, keepends, case_sensitive, lazy_inline)
+
+    def _budgeted_line_opcodes(self, budget: DiffBudget, line_sm: SequenceMatcherBase, keepends: bool,
+                               case_sensitive: bool) -> List[OpCodeType]:
+        """
+        Returns line level opcodes degrading line SequenceMatcher when time budget is exceeded:
+        DisplacementSequenceMatcher gets half of remaining time and it's replaced with HeckelSequenceMatcher
+        when it exceeds it. Coarse opcodes are returned when HeckelSequenceMatcher exceeds the budget as well.
+        """
+        if isinstance(line_sm, DisplacementSequenceMatcher):
+            try:
+                with budget.limited(0.5):
+                    return self.line_opcodes(line_sm, keepends, case_sensitive)
+            except BudgetExceededException:
+                budget.degrade(DISPLACEMENT_TO_HECKEL)
+                line_sm = HeckelSequenceMatcher(replace_mode=line_sm.replace_mode)
+        try:
+            return self.line_opcodes(line_sm, keepends, case_sensitive)
+        except BudgetExceededException:
+            budget.degrade(COARSE_REPLACE)
+            return coarse_opcodes(*self.normalized_lines(keepends, case_sensitive))
+
+    def _diff(self, cutoff: float, line_sm: SequenceMatcherBase, inline_sm: SequenceMatcherBase, keepends: bool,
+              case_sensitive: bool, lazy_inline: bool) -> Tuple[List[Text], List[Text], List[CompositeOpCode]]:
+        if inline_sm is None:
+            inline_sm = SequenceMatcher()
+
+        a_lines, b_lines = self.lines(keepends)
+        budget = current_budget()
+        if budget is None:
+            line_opcodes = self.line_opcodes(line_sm, keepends, case_sensitive)
+        else:
+            line_opcodes = self._budgeted_line_opcodes(budget, line_sm, keepends, case_sensitive)
+
+        if cutoff == 1.0:
+            opcodes = list(line_opcodes)
+        else:
+            stats = current_stats()
+            make_children = partial(self.inline_opcodes, inline_sm=inline_sm, keepends=keepends,
+                                    case_sensitive=case_sensitive)
+            if stats is not None:
+                make_children = partial(_measured_inline, stats, make_children)
+            monitor = current_monitor()
+            if monitor is not None and monitor.progress is not None:
+                make_children = partial(_quiet_inline, make_children)
+            with phase(stats, 'similarities'):
+                opcodes = list(_extract_similarities(
+                    line_opcodes, cutoff,
+                    find_match=partial(self.find_best_similar_match, keepends=keepends,
+                                       case_sensitive=case_sensitive),
+                    make_children=make_children,
+                    lazy_inline=lazy_inline))
+            if stats is not None:
+                stats.update_peak_opcodes(len(opcodes))
+
+        return a_lines, b_lines, DiffOpCodes(opcodes, budget.degradations if budget is not None else ())
+
+
+class DiffOpCodes(list):
+    """
+    List of diff opcodes. Its degradations attribute contains names of degradation stages applied
+    because diff went over budget (see mdiff.budget), it's empty when diff was generated within budget.
+    """
+
+    def __init__(self, opcodes: Iterable[OpCodeType] = (), degradations: Iterable[str] = ()):
+        super().__init__(opcodes)
+        self.degradations = list(degradations)
+
+
+def _measured_inline(stats: DiffStats, make_children: ChildrenFactory, i: int, j: int) -> List[OpCode]:
+    """
+    Generates in-line opcodes measuring "inline" phase time. Statistics of in-line SequenceMatcher are not collected,
+    so they don't override line level statistics.
+    """
+    with stats.phase('inline'), suspended_stats():
+        return make_children(i, j)
 
-    if cutoff == 1.0:
-        opcodes = line_opcodes
-    else:
-        line_opcodes_with_similarities = extract_similarities(line_opcodes, sm_a_lines, sm_b_lines, cutoff, inline_sm)
-        opcodes = list(line_opcodes_with_similarities)
 
-    return a_lines, b_lines, opcodes
+def _quiet_inline(make_children: ChildrenFactory, i: int, j: int) -> List[OpCode]:
+    """Generates in-line opcodes without reporting progress of in-line SequenceMatcher."""
+    with progress_suspended():
+        return make_children(i, j)
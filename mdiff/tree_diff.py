@@ -0,0 +1,230 @@
+"""
+This module compares directory trees. Files are paired by relative paths first, then files which exist only
+in one of trees are paired by identical content (renamed or moved files) and finally by near-identical content,
+estimated with bottom-k sketches of line hashes. Files are listed, compared and hashed by a thread pool
+(reading files and hashing release GIL). Diffs of paired files are not generated here (see TreeConsoleDiffer).
+"""
+import hashlib
+import heapq
+import os
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from mdiff.stats import current_stats, phase
+from mdiff.utils import READ_CHUNK_SIZE, files_identical, iter_file_line_chunks
+
+T = TypeVar('T')
+
+UNCHANGED = 'unchanged'
+MODIFIED = 'modified'
+ADDED = 'added'
+REMOVED = 'removed'
+RENAMED = 'renamed'
+
+# number of the smallest line hashes kept in file sketch
+SKETCH_SIZE = 128
+# minimal estimated similarity of renamed files with changed content
+MIN_RENAME_SIMILARITY = 0.5
+# sketch hashes shared by more files (i.e. of empty or boilerplate lines) are not used to find rename candidates
+MAX_HASH_POSTINGS = 64
+# number of files processed by a single thread pool task (per task overhead is bigger than reading of small file)
+FILES_PER_TASK = 256
+
+
+@dataclass(frozen=True)
+class TreeEntry:
+    """
+    Compared file of directory trees.
+        status: "unchanged", "modified", "added", "removed" or "renamed" (renamed or moved file).
+        a: path of file relative to source tree (None for added file).
+        b: path of file relative to target tree (None for removed file).
+        similarity: content similarity of renamed files (1.0 for identical content).
+    """
+    status: str
+    a: Optional[str]
+    b: Optional[str]
+    similarity: float = 1.0
+
+    @property
+    def path(self) -> str:
+        """Path by which entries are ordered (source path, or target path of added file)."""
+        return self.a if self.a is not None else self.b
+
+
+def list_files(root: Path) -> Dict[str, int]:
+    """Returns sizes of regular files in directory tree by their "/" separated paths relative to root."""
+    files = {}
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for entry in it:
+                rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel_path)
+                elif entry.is_file():
+                    files[rel_path] = entry.stat().st_size
+    return files
+
+
+def hash_file(p: Path) -> bytes:
+    """Returns digest of file content."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(p, 'rb') as file:
+        for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def line_sketch(p: Path, size: int = SKETCH_SIZE) -> List[int]:
+    """Returns sorted list of the smallest distinct hashes of file lines (bottom-k sketch of set of lines)."""
+    hashes = set()
+    for chunk_lines in iter_file_line_chunks(p, binary=True):
+        hashes.update(map(zlib.crc32, chunk_lines))
+    return heapq.nsmallest(size, hashes)
+
+
+def sketch_similarity(x: Sequence[int], y: Sequence[int], size: int = SKETCH_SIZE) -> float:
+    """
+    Estimates Jaccard similarity of sets of lines from their sketches: the fraction of the smallest hashes
+    of both sets, which are present in both sketches.
+
+    >>> sketch_similarity([1, 2, 3, 4], [1, 2, 3, 5]), sketch_similarity([1, 2], [3, 4])
+    (0.6, 0.0)
+    """
+    common = set(x).intersection(y)
+    union = heapq.nsmallest(size, set(x).union(y))
+    if not union:
+        return 1.0
+    return sum(h in common for h in union) / len(union)
+
+
+def _map_files(executor: ThreadPoolExecutor, fn: Callable[[str], T], paths: Sequence[str]) -> List[T]:
+    """Maps fn over paths by thread pool tasks processing FILES_PER_TASK paths each."""
+    chunks = [paths[i:i + FILES_PER_TASK] for i in range(0, len(paths), FILES_PER_TASK)]
+    return [result for chunk in executor.map(lambda chunk: list(map(fn, chunk)), chunks) for result in chunk]
+
+
+def diff_trees(a: Path, b: Path, min_similarity: float = MIN_RENAME_SIMILARITY,
+               workers: Optional[int] = None) -> List[TreeEntry]:
+    """
+    Compares directory trees and returns entries of all files ordered by their paths (see TreeEntry.path).
+    Files with the same path are compared by size and content. Identical files of different paths are paired
+    as renamed files by size and content hash (files with the same name are paired first), the rest of them
+    by similarity of sets of lines greater or equal to min_similarity (the most similar files are paired first).
+
+    :param a: source directory.
+    :param b: target directory.
+    :param min_similarity: minimal estimated similarity of renamed files with changed content
+    (renames of changed files are not detected if greater than 1.0).
+    :param workers: number of threads listing, comparing and hashing files.
+    """
+    stats = current_stats()
+    a, b = Path(a), Path(b)
+    with ThreadPoolExecutor(workers) as executor:
+        with phase(stats, 'tree_list'):
+            a_files, b_files = executor.map(list_files, (a, b))
+
+        with phase(stats, 'tree_compare'):
+            common = sorted(a_files.keys() & b_files.keys())
+            same_size = [p for p in common if a_files[p] == b_files[p]]
+            identical = _map_files(executor, lambda p: files_identical(a / p, b / p), same_size)
+            identical = dict(zip(same_size, identical))
+            entries = [TreeEntry(UNCHANGED if identical.get(p) else MODIFIED, p, p) for p in common]
+
+        removed = sorted(a_files.keys() - b_files.keys())
+        added = sorted(b_files.keys() - a_files.keys())
+        with phase(stats, 'tree_renames'):
+            renames = _pair_identical(executor, a, b, removed, added, a_files, b_files)
+            paired_a = {i.a for i in renames}
+            paired_b = {i.b for i in renames}
+            removed = [p for p in removed if p not in paired_a]
+            added = [p for p in added if p not in paired_b]
+            if removed and added and min_similarity <= 1.0:
+                similar = _pair_similar(executor, a, b, removed, added, min_similarity)
+                renames.extend(similar)
+                paired_a.update(i.a for i in similar)
+                paired_b.update(i.b for i in similar)
+
+    entries.extend(renames)
+    entries.extend(TreeEntry(REMOVED, p, None) for p in removed if p not in paired_a)
+    entries.extend(TreeEntry(ADDED, None, p) for p in added if p not in paired_b)
+    entries.sort(key=lambda i: (i.path, i.b or ''))
+    return entries
+
+
+def _pair_identical(executor: ThreadPoolExecutor, a: Path, b: Path, removed: List[str], added: List[str],
+                    a_files: Dict[str, int], b_files: Dict[str, int]) -> List[TreeEntry]:
+    """Pairs removed and added files with identical content. Only files of sizes present in both lists are hashed."""
+    sizes = {a_files[p] for p in removed} & {b_files[p] for p in added}
+    removed = [p for p in removed if a_files[p] in sizes]
+    added = [p for p in added if b_files[p] in sizes]
+    groups: Dict[Tuple[int, bytes], Tuple[List[str], List[str]]] = defaultdict(lambda: ([], []))
+    for p, digest in zip(removed, _map_files(executor, lambda p: hash_file(a / p), removed)):
+        groups[a_files[p], digest][0].append(p)
+    for p, digest in zip(added, _map_files(executor, lambda p: hash_file(b / p), added)):
+        groups[b_files[p], digest][1].append(p)
+
+    renames = []
+    for a_paths, b_paths in groups.values():
+        renames.extend(TreeEntry(RENAMED, x, y) for x, y in _pair_by_name(a_paths, b_paths))
+    return renames
+
+
+def _pair_by_name(a_paths: List[str], b_paths: List[str]) -> Iterable[Tuple[str, str]]:
+    """Pairs paths with the same file name (moved files) first, then the rest of them in order."""
+    by_name = defaultdict(list)
+    for p in reversed(b_paths):
+        by_name[p.rsplit('/', 1)[-1]].append(p)
+    paired = set()
+    rest = []
+    for p in a_paths:
+        candidates = by_name.get(p.rsplit('/', 1)[-1])
+        if candidates:
+            target = candidates.pop()
+            paired.add(target)
+            yield p, target
+        else:
+            rest.append(p)
+    yield from zip(rest, (p for p in b_paths if p not in paired))
+
+
+def _pair_similar(executor: ThreadPoolExecutor, a: Path, b: Path, removed: List[str], added: List[str],
+                  min_similarity: float) -> List[TreeEntry]:
+    """
+    Pairs removed and added files with similar content. Candidates are files sharing any sketch hash
+    (found with inverted index of hashes), the most similar pairs are paired first.
+    """
+    a_sketches = _map_files(executor, lambda p: line_sketch(a / p), removed)
+    b_sketches = _map_files(executor, lambda p: line_sketch(b / p), added)
+    postings = defaultdict(list)
+    for j, sketch in enumerate(b_sketches):
+        for h in sketch:
+            postings[h].append(j)
+
+    candidates = []
+    for i, sketch in enumerate(a_sketches):
+        shared = Counter()
+        for h in sketch:
+            files = postings.get(h)
+            if files is not None and len(files) <= MAX_HASH_POSTINGS:
+                shared.update(files)
+        for j in shared:
+            similarity = sketch_similarity(sketch, b_sketches[j])
+            if similarity >= min_similarity:
+                candidates.append((-similarity, removed[i], added[j]))
+
+    candidates.sort()
+    paired_a = set()
+    paired_b = set()
+    renames = []
+    for similarity, x, y in candidates:
+        if x not in paired_a and y not in paired_b:
+            paired_a.add(x)
+            paired_b.add(y)
+            renames.append(TreeEntry(RENAMED, x, y, -similarity))
+    return renames
@@ -1,13 +1,23 @@
 """
 This module provides functions and structures for common package usage.
 """
+import bz2
+import gzip
+import io
 import logging
+import lzma
 import math
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
 from enum import Enum
 from functools import lru_cache
 from pathlib import Path
-from typing import NamedTuple, Any, Tuple, List, Sequence, Union, Protocol, Type, Iterable
+from typing import NamedTuple, Any, Tuple, List, Sequence, Union, Protocol, Type, Iterable, Callable, Optional, \
+    Iterator
 
 
 class OpCode:
@@ -76,6 +86,28 @@ class CompositeOpCode(OpCode):
         return f"{super().__repr__()}{'*' if self.children_opcodes else ''}"
 
 
+class LazyCompositeOpCode(CompositeOpCode):
+    """
+    CompositeOpCode which generates children_opcodes on first access using children_factory function.
+    It allows to postpone in-line diff generation until it's needed (i.e. when line is displayed).
+    """
+
+    def __init__(self, tag, i1, i2, j1, j2, children_factory: Callable[[], List[OpCode]]):
+        super().__init__(tag, i1, i2, j1, j2)
+        self._children_factory = children_factory
+        self._children_opcodes: Optional[List[OpCode]] = None
+
+    @property
+    def children_opcodes(self) -> List[OpCode]:
+        if self._children_opcodes is None:
+            self._children_opcodes = self._children_factory()
+        return self._children_opcodes
+
+    @children_opcodes.setter
+    def children_opcodes(self, value: List[OpCode]):
+        self._children_opcodes = value
+
+
 class OpCodeExtractable(ABC):
     @abstractmethod
     def get_opcodes(self) -> List[OpCodesType]:
@@ -168,6 +200,24 @@ def longest_increasing_subsequence(x: Sequence[Any], key=lambda x: x, a_lt_b=lam
     return s
 
 
+def intern_sequences(a: Sequence[Any], b: Sequence[Any]) -> Tuple[List[int], List[int], int]:
+    """
+    Replaces elements of both sequences with integer ids from shared symbol table, so equal elements get equal ids.
+    Comparing integers is much cheaper than comparing i.e. text lines in algorithms inner loops.
+
+    Returns:
+        (a_ids, b_ids, symbols) where symbols is the number of distinct elements.
+
+    Example:
+        >>> intern_sequences(['x', 'y', 'x'], ['y', 'z'])
+        ([0, 1, 0], [1, 2], 3)
+    """
+    symbols = {}
+    a_ids = [symbols.setdefault(i, len(symbols)) for i in a]
+    b_ids = [symbols.setdefault(i, len(symbols)) for i in b]
+    return a_ids, b_ids, len(symbols)
+
+
 def sequences_equal(a: Sequence[Any], b: Sequence[Any]) -> bool:
     """Compares sequences elements and returns True if they are all equal."""
     return tuple(a) == tuple(b)
@@ -236,12 +286,178 @@ def len_or_1(a):
         return 1
 
 
+# text compared by diff functions: str or bytes (bytes mode, lines are not decoded)
+Text = Union[str, bytes]
+TextBuffer = Union[str, bytes, bytearray, memoryview]
+
+
+# magic bytes and open function of compressed file formats, which are decompressed while files are read
+COMPRESSION_FORMATS = {
+    'gzip': (b'\x1f\x8b', gzip.open),
+    'bz2': (b'BZh', bz2.open),
+    'xz': (b'\xfd7zXZ\x00', lzma.open),
+}
+
+# size of chunks in which files are read and split into lines
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def detect_compression(header: bytes) -> Optional[str]:
+    """
+    Returns name of compression format detected by magic bytes at the beginning of file (None if not compressed).
+
+    >>> detect_compression(b'\\x1f\\x8b\\x08'), detect_compression(b'BZh9'), detect_compression(b'plain')
+    ('gzip', 'bz2', None)
+    """
+    for name, (magic, _) in COMPRESSION_FORMATS.items():
+        if header.startswith(magic):
+            return name
+    return None
+
+
+@contextmanager
+def open_file(p: Path, binary=False):
+    """
+    Opens file for reading. Files compressed with gzip, bz2 or xz (detected by magic bytes, not by extension)
+    are decompressed while they are read. Magic bytes are peeked without consuming them, so pipes can be read too.
+    """
+    with open(p, 'rb') as raw:
+        compression = detect_compression(raw.peek(6)[:6])
+        file = raw if compression is None else COMPRESSION_FORMATS[compression][1](raw)
+        with file if binary else io.TextIOWrapper(file) as file:
+            yield file
+
+
 def read_file(p: Path):
-    with open(p) as file:
+    with open_file(p) as file:
         content = file.read()
     return content
 
 
+def read_file_bytes(p: Path) -> bytes:
+    with open_file(p, binary=True) as file:
+        content = file.read()
+    return content
+
+
+def iter_file_line_chunks(p: Path, keepends=False, binary=False) -> Iterator[List[Text]]:
+    """
+    Reads file in chunks and yields lists of lines of consecutive chunks. Lines are split the same way as split_lines
+    does, but the whole (decompressed) content of file is never held in memory (only lines of a chunk, or a single
+    line longer than chunk). In binary mode lines are not decoded.
+    """
+    lf, cr = (b'\n', b'\r') if binary else ('\n', '\r')
+    # pieces of line continued in the next chunks, joined once line break is read
+    pending = []
+    with open_file(p, binary) as file:
+        while True:
+            chunk = file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            # lines are split up to the last line break, CR at the end of chunk may be followed by LF of CRLF
+            end = max(chunk.rfind(lf), chunk.rfind(cr, 0, len(chunk) - 1)) + 1
+            if not end:
+                pending.append(chunk)
+                continue
+            pending.append(chunk[:end])
+            yield lf[:0].join(pending).splitlines(keepends)
+            pending = [chunk[end:]]
+    yield lf[:0].join(pending).splitlines(keepends)
+
+
+def read_file_lines(p: Path, keepends=False, binary=False) -> List[Text]:
+    """Reads file split into lines (see iter_file_line_chunks)."""
+    lines = []
+    for chunk_lines in iter_file_line_chunks(p, keepends, binary):
+        lines.extend(chunk_lines)
+    return lines
+
+
+def files_identical(a: Path, b: Path) -> bool:
+    """
+    Checks if regular files have identical content: compares sizes first, then content chunk by chunk, stopping
+    at the first differing chunk. Returns False for other files (i.e. pipes), which can be read only once.
+    """
+    a_stat = os.stat(a)
+    b_stat = os.stat(b)
+    if not (stat.S_ISREG(a_stat.st_mode) and stat.S_ISREG(b_stat.st_mode)) or a_stat.st_size != b_stat.st_size:
+        return False
+    if os.path.samestat(a_stat, b_stat):
+        return True
+    with open(a, 'rb') as a_file, open(b, 'rb') as b_file:
+        while True:
+            a_chunk = a_file.read(READ_CHUNK_SIZE)
+            if a_chunk != b_file.read(READ_CHUNK_SIZE):
+                return False
+            if not a_chunk:
+                return True
+
+
+def read_files_lines(a: Path, b: Path, keepends=False, binary=False) -> Tuple[List[Text], List[Text]]:
+    """
+    Reads lines of both files (see read_file_lines) in two threads, so decompression of compressed files
+    (which releases GIL) overlaps. Files are read one by one on single CPU machines, where threads only add
+    switching overhead.
+    """
+    if (os.cpu_count() or 1) < 2:
+        return read_file_lines(a, keepends, binary), read_file_lines(b, keepends, binary)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        a_lines = executor.submit(read_file_lines, a, keepends, binary)
+        b_lines = executor.submit(read_file_lines, b, keepends, binary)
+        return a_lines.result(), b_lines.result()
+
+
+def iter_file_lines(p: Path, binary=False) -> Iterator[Text]:
+    """
+    Yields lines of file (without line endings) while it's read (and decompressed, see open_file).
+    In binary mode lines are not decoded (bytes objects are yielded).
+    """
+    if not binary:
+        with open_file(p) as file:
+            for line in file:
+                yield line.rstrip('\n')
+        return
+    with open_file(p, binary=True) as file:
+        for line in file:
+            if line.endswith(b'\n'):
+                line = line[:-1]
+                if line.endswith(b'\r'):
+                    line = line[:-1]
+            yield line
+
+
+def split_lines(text: TextBuffer, keepends=False) -> List[Text]:
+    """
+    Splits text into lines. Bytes-like buffers (bytes, bytearray, memoryview) are split into bytes lines
+    without decoding (buffers other than bytes are copied into bytes once, which is much faster than slicing
+    them line by line).
+
+    >>> split_lines('a\\nb'), split_lines(memoryview(b'a\\r\\nb'))
+    (['a', 'b'], [b'a', b'b'])
+    """
+    if not isinstance(text, (str, bytes)):
+        text = bytes(text)
+    return text.splitlines(keepends)
+
+
+def join_lines(lines: Sequence[Text], like: Text) -> Text:
+    """Joins lines with newline character of the same type as "like" text (str or bytes)."""
+    return ('\n' if isinstance(like, str) else b'\n').join(lines)
+
+
+def decode_line(line: Text, encoding: str = 'utf-8') -> str:
+    """
+    Decodes bytes line for presentation (undecodable bytes are replaced with U+FFFD character).
+    Strings are returned unchanged.
+
+    >>> decode_line(b'caf\\xc3\\xa9 \\xff'), decode_line('abc')
+    ('café �', 'abc')
+    """
+    if isinstance(line, str):
+        return line
+    return bytes(line).decode(encoding, errors='replace')
+
+
 class AttributeSequenceHandler:
     def __init__(self, seq):
         self.seq = seq
@@ -299,38 +515,107 @@ def pop_default(lst: List, index=-1, default=None):
         return default
 
 
-def sort_seq_by_other_seq_indexes(seq: Sequence, other: Sequence) -> List[Tuple[int, Any]]:
-    b_hash = dict()
-    seq = enumerate(seq)
-    for i, item in enumerate(other):
-        b_hash.setdefault(item, []).append(i)
+def sort_seq_by_other_seq_order(seq: Sequence, other: Sequence, key: Callable[[Any], Any] = None) -> List[int]:
+    """
+    Returns indexes of seq elements ordered by positions of the same elements in other sequence:
+    k-th occurrence of element in seq takes position of k-th occurrence of that element in other.
+    Elements missing in other (and surplus occurrences) are placed at the end, keeping their order.
+
+    Occurrences are taken with cursors (position of unique element or stack of positions of repeated one)
+    and placed directly into slots of other positions, so it runs in O(n + m) time regardless of number of duplicates.
+    Key function (i.e. str.lower) is applied to elements on the fly, without copies of sequences.
+
+    >>> sort_seq_by_other_seq_order('FEDE', 'ABED')
+    [1, 2, 0, 3]
+    """
+    positions = {}
+    last = len(other) - 1
+    for j, item in enumerate(reversed(other) if key is None else map(key, reversed(other))):
+        # positions are added in descending order, so pop() takes the first unused occurrence
+        cursor = positions.get(item)
+        if cursor is None:
+            positions[item] = last - j
+        elif type(cursor) is int:
+            positions[item] = [cursor, last - j]
+        else:
+            cursor.append(last - j)
+
+    slots = [-1] * len(other)
+    rest = []
+    for i, item in enumerate(seq if key is None else map(key, seq)):
+        cursor = positions.get(item)
+        if cursor is None:
+            rest.append(i)
+        elif type(cursor) is int:
+            slots[cursor] = i
+            del positions[item]
+        else:
+            slots[cursor.pop()] = i
+            if not cursor:
+                del positions[item]
+    order = [i for i in slots if i >= 0]
+    order.extend(rest)
+    return order
+
 
-    result = sorted(seq, key=lambda x: pop_default(b_hash.get(x[1], []), 0, math.inf))
-    return result
+def sort_seq_by_other_seq_indexes(seq: Sequence, other: Sequence) -> List[Tuple[int, Any]]:
+    return [(i, seq[i]) for i in sort_seq_by_other_seq_order(seq, other)]
 
 
 def sort_seq_by_other_seq(seq: Sequence, other: Sequence) -> List:
-    return [i[1] for i in sort_seq_by_other_seq_indexes(seq, other)]
+    return [seq[i] for i in sort_seq_by_other_seq_order(seq, other)]
 
 
-def sort_string_seq_by_other(seq: Sequence[str], other: Sequence[str], case_sensitive=True) -> List[str]:
-    if case_sensitive:
-        a_seq = seq
-        b_seq = other
-    else:
-        a_seq = [i.lower() for i in seq]
-        b_seq = [i.lower() for i in other]
+def sort_string_seq_by_other(seq: Sequence[Text], other: Sequence[Text], case_sensitive=True) -> List[Text]:
+    key = None if case_sensitive else _lower
+    return [seq[i] for i in sort_seq_by_other_seq_order(seq, other, key)]
 
-    idx_sort, _ = zip(*sort_seq_by_other_seq_indexes(a_seq, b_seq))
-    result = [seq[i] for i in idx_sort]
-    return result
 
-
-def sort_string_seq(seq: Sequence[str], case_sensitive=True) -> List[str]:
+def sort_string_seq(seq: Sequence[Text], case_sensitive=True) -> List[Text]:
     if case_sensitive:
         return sorted(seq)
     else:
-        return sorted(seq, key=lambda x: x.lower())
+        return sorted(seq, key=_lower)
+
+
+def _lower(text: Text) -> Text:
+    return text.lower()
+
+
+class SortMode(StringEnumChoice):
+    NO = 'no'
+    YES = 'yes'
+    BY_SOURCE = 'by-source'
+    BY_TARGET = 'by-target'
+
+
+def sort_lines(a_lines: Sequence[Text], b_lines: Sequence[Text], mode: SortMode, case_sensitive=True) \
+        -> Tuple[Sequence[Text], Sequence[Text]]:
+    """
+    Preprocessing stage sorting lines before diff:
+        no: lines are not sorted.
+        yes: both sequences are sorted.
+        by-source: target lines are aligned with the order of the same source lines (see sort_string_seq_by_other).
+        by-target: source lines are aligned with the order of the same target lines.
+    """
+    mode = SortMode(mode)
+    if mode == SortMode.YES:
+        return sort_string_seq(a_lines, case_sensitive), sort_string_seq(b_lines, case_sensitive)
+    elif mode == SortMode.BY_SOURCE:
+        return a_lines, sort_string_seq_by_other(b_lines, a_lines, case_sensitive)
+    elif mode == SortMode.BY_TARGET:
+        return sort_string_seq_by_other(a_lines, b_lines, case_sensitive), b_lines
+    return a_lines, b_lines
+
+
+def sort_text_lines(a: Text, b: Text, mode: SortMode, case_sensitive=True) -> Tuple[Text, Text]:
+    """Applies sort_lines to lines of texts (str or bytes). Texts which are not sorted are returned unchanged."""
+    mode = SortMode(mode)
+    if mode == SortMode.NO:
+        return a, b
+    a_lines, b_lines = sort_lines(split_lines(a), split_lines(b), mode, case_sensitive)
+    return a if mode == SortMode.BY_SOURCE else join_lines(a_lines, a), \
+        b if mode == SortMode.BY_TARGET else join_lines(b_lines, b)
 
 
 @lru_cache
@@ -339,6 +624,39 @@ def get_app_version() -> str:
     return version
 
 
+class ObjectPool:
+    """
+    Thread-safe pool of reusable objects (i.e. algorithm scratch buffers).
+    New object is created by factory function when pool is empty. At most max_size released objects are kept.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int = 16):
+        self.factory = factory
+        self.max_size = max_size
+        self._items = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Any:
+        with self._lock:
+            if self._items:
+                return self._items.pop()
+        return self.factory()
+
+    def release(self, item: Any):
+        with self._lock:
+            if len(self._items) < self.max_size:
+                self._items.append(item)
+
+    @contextmanager
+    def borrow(self):
+        """Context manager acquiring object from the pool and releasing it back on exit."""
+        item = self.acquire()
+        try:
+            yield item
+        finally:
+            self.release(item)
+
+
 def get_idx_or_default(_list: list, idx: int, default=None):
     try:
         return _list[idx]
@@ -1,13 +1,14 @@
 import tkinter as tk
 from enum import Enum
-from itertools import zip_longest
+from tkinter import font as tkfont
 from tkinter import ttk
-from typing import Protocol, Union
+from typing import Protocol, Union, List, Dict, Tuple, Optional, Sequence
 
-from mdiff import diff_lines_with_similarities, CompositeOpCode
+from mdiff import CompositeOpCode
+from mdiff.layout import DiffLayout
+from mdiff.text_diff import DiffSession
 from mdiff.seqmatch.utils import SequenceMatcherName, seq_matcher_factory
-from mdiff.utils import CompositeDelegationMixin, get_enum_values, sort_seq_by_other_seq, sort_string_seq, \
-    sort_string_seq_by_other
+from mdiff.utils import OpCode, CompositeDelegationMixin, get_enum_values, SortMode, sort_text_lines
 from mdiff.visualisation.gui_tkinter.utils import ScrolledText, WindowBuilder
 
 
@@ -71,24 +72,52 @@ class SortChoices(str, Enum):
     YES = 'Yes'
 
 
+sort_choice_to_mode = {
+    SortChoices.NO: SortMode.NO,
+    SortChoices.BY_SOURCE: SortMode.BY_SOURCE,
+    SortChoices.BY_TARGET: SortMode.BY_TARGET,
+    SortChoices.YES: SortMode.YES
+}
+
+
 class SequenceMatcherChoices(str, Enum):
     STANDARD = 'Standard'
     HECKEL = 'Heckel'
     DISPLACEMENT = 'Displacement'
+    MYERS = 'Myers'
+    PATIENCE = 'Patience'
+    HISTOGRAM = 'Histogram'
+    AUTO = 'Auto'
+    SORTED = 'Sorted'
+    MULTISET = 'Multiset'
 
 
 sm_choice_to_factory_name = {
     SequenceMatcherChoices.STANDARD: SequenceMatcherName.STANDARD,
     SequenceMatcherChoices.HECKEL: SequenceMatcherName.HECKEL,
-    SequenceMatcherChoices.DISPLACEMENT: SequenceMatcherName.DISPLACEMENT
+    SequenceMatcherChoices.DISPLACEMENT: SequenceMatcherName.DISPLACEMENT,
+    SequenceMatcherChoices.MYERS: SequenceMatcherName.MYERS,
+    SequenceMatcherChoices.PATIENCE: SequenceMatcherName.PATIENCE,
+    SequenceMatcherChoices.HISTOGRAM: SequenceMatcherName.HISTOGRAM,
+    SequenceMatcherChoices.AUTO: SequenceMatcherName.AUTO,
+    SequenceMatcherChoices.SORTED: SequenceMatcherName.SORTED,
+    SequenceMatcherChoices.MULTISET: SequenceMatcherName.MULTISET
 }
 factory_name_to_sm_choice = {v: k for k, v in sm_choice_to_factory_name.items()}
 
 
 class ResultText(ScrolledText):
+    """
+    Text widget presenting part of diff result. Vertical scrollbar is not bound to Text widget content,
+    because widget holds only rendered window of diff rows. Scrollbar position is managed by VirtualDiffView.
+    """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+    def _yscrollcommand(self, first, last):
+        self.on_yscrollcommand(first, last)
+
 
 class TextComposite(tk.Text, CompositeDelegationMixin):
     """Allows to treat group of Text widgets as one component."""
@@ -98,6 +127,197 @@ class TextComposite(tk.Text, CompositeDelegationMixin):
         super().__init__()
 
 
+class TaggedTextBuffer:
+    """
+    Accumulates tagged text chunks for a Text widget. Whole content is inserted into a widget with a single call,
+    and every tag is applied afterwards over merged index ranges (one range per contiguous run of a tag),
+    which avoids a Tcl round-trip for every inserted chunk.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.ranges: Dict[str, List[Tuple[str, str]]] = {}
+        self._line = 1
+        self._column = 0
+        self._last_tag: Optional[str] = None
+
+    def _index(self) -> str:
+        return f'{self._line}.{self._column}'
+
+    def append(self, text: str, tag: Optional[str] = None):
+        """Append text chunk tagged with tag (or untagged if tag is None)."""
+        if not text:
+            return
+        start = self._index()
+        newlines = text.count('\n')
+        if newlines:
+            self._line += newlines
+            self._column = len(text) - text.rfind('\n') - 1
+        else:
+            self._column += len(text)
+        self.parts.append(text)
+
+        if tag is not None:
+            tag_ranges = self.ranges.setdefault(tag, [])
+            if tag == self._last_tag:
+                # extend contiguous run of the same tag
+                tag_ranges[-1] = (tag_ranges[-1][0], self._index())
+            else:
+                tag_ranges.append((start, self._index()))
+        self._last_tag = tag
+
+    def get_text(self) -> str:
+        return ''.join(self.parts)
+
+    def insert_into(self, text: tk.Text):
+        """Insert buffered content into empty Text widget and apply tags."""
+        text.insert('1.0', self.get_text())
+        for tag, ranges in self.ranges.items():
+            for start, end in ranges:
+                text.tag_add(tag, start, end)
+
+
+class VirtualDiffView:
+    """
+    Keeps aligned rows of diff result in memory and renders into pair of Text widgets only rows visible
+    in a viewport plus a margin, so huge diffs doesn't need to be loaded into Text widgets at once.
+    In-line diff for similar lines is generated only for rendered rows (when opcodes are lazy).
+    """
+
+    def __init__(self, text_source: ResultText, text_target: ResultText, margin: int = 200):
+        self.text_source = text_source
+        self.text_target = text_target
+        self.margin = margin
+        self.a_lines: Sequence[str] = []
+        self.b_lines: Sequence[str] = []
+        self.layout = DiffLayout([])
+        self.first_row = 0
+        self.window_start = 0
+        self.window_stop = 0
+        self._rendering = False
+
+    @property
+    def rows_number(self) -> int:
+        return len(self.layout)
+
+    def set_diff(self, a_lines: Sequence[str], b_lines: Sequence[str], opcodes: Sequence[OpCode]):
+        self.a_lines = a_lines
+        self.b_lines = b_lines
+        self.layout = DiffLayout(opcodes)
+        self.first_row = min(self.first_row, max(self.rows_number - 1, 0))
+
+    def visible_rows(self) -> int:
+        """Returns number of rows that fits in Text widget height."""
+        linespace = tkfont.Font(font=self.text_source['font']).metrics('linespace')
+        return max(self.text_source.winfo_height() // max(linespace, 1), 1)
+
+    def _append_row(self, source: TaggedTextBuffer, target: TaggedTextBuffer, row: int, opcode: OpCode):
+        a_idx, b_idx, tag = self.layout.row(row)
+        if tag == 'replace' and isinstance(opcode, CompositeOpCode) and opcode.children_opcodes:
+            for il_tag, il_i1, il_i2, il_j1, il_j2 in opcode.children_opcodes:
+                il_text_tag = inline_opcode_tag_to_text_tag[il_tag].value
+                source.append(self.a_lines[a_idx][il_i1:il_i2], il_text_tag)
+                target.append(self.b_lines[b_idx][il_j1:il_j2], il_text_tag)
+            source.append('\n', TextDiffTag.REPLACE.value)
+            target.append('\n', TextDiffTag.REPLACE.value)
+            return
+
+        if tag == 'replace':
+            left_tag = TextDiffTag.DELETE.value
+            right_tag = TextDiffTag.INSERT.value
+        else:
+            left_tag = right_tag = line_opcode_tag_to_text_tag[tag].value
+
+        if a_idx is None:
+            source.append('\n')
+        else:
+            source.append(self.a_lines[a_idx] + '\n', left_tag)
+        if b_idx is None:
+            target.append('\n')
+        else:
+            target.append(self.b_lines[b_idx] + '\n', right_tag)
+
+    def render(self):
+        """Renders window of rows around first_row into Text widgets."""
+        self._rendering = True
+        try:
+            visible = self.visible_rows()
+            self.window_start = max(self.first_row - self.margin, 0)
+            self.window_stop = min(self.first_row + visible + self.margin, self.rows_number)
+            source = TaggedTextBuffer()
+            target = TaggedTextBuffer()
+            for row, opcode, _ in self.layout.iter_rows(self.window_start, self.window_stop):
+                self._append_row(source, target, row, opcode)
+
+            for text, buffer in ((self.text_source, source), (self.text_target, target)):
+                text.configure(state='normal')
+                text.delete('1.0', tk.END)
+                buffer.insert_into(text)
+                text.configure(state='disabled')
+            self._show_first_row()
+        finally:
+            self._rendering = False
+
+    def _show_first_row(self):
+        index = f'{self.first_row - self.window_start + 1}.0'
+        self.text_source.yview(index)
+        self.text_target.yview(index)
+        self.update_scrollbars()
+
+    def update_scrollbars(self):
+        total = max(self.rows_number, 1)
+        first = self.first_row / total
+        last = min((self.first_row + self.visible_rows()) / total, 1.0)
+        self.text_source.vbar.set(first, last)
+        self.text_target.vbar.set(first, last)
+
+    def scroll_to(self, row: int):
+        """Sets row as the first visible row. Renders new window of rows if needed."""
+        visible = self.visible_rows()
+        self.first_row = min(max(row, 0), max(self.rows_number - visible, 0))
+        within_window = self.window_start <= self.first_row and \
+            self.first_row + visible <= self.window_stop
+        if within_window:
+            self._rendering = True
+            try:
+                self._show_first_row()
+            finally:
+                self._rendering = False
+        else:
+            self.render()
+
+    def yview(self, *args):
+        """Vertical scrollbar command. Maps scrollbar position to diff rows."""
+        action, value, *rest = args
+        if action == tk.MOVETO:
+            self.scroll_to(round(float(value) * self.rows_number))
+        elif action == tk.SCROLL:
+            step = self.visible_rows() if rest and rest[0] == tk.PAGES else 1
+            self.scroll_to(self.first_row + int(value) * step)
+
+    def next_change(self):
+        """Scrolls to the next change block."""
+        row = self.layout.next_change(self.first_row)
+        if row is not None:
+            self.scroll_to(row)
+
+    def prev_change(self):
+        """Scrolls to the previous change block."""
+        row = self.layout.prev_change(self.first_row)
+        if row is not None:
+            self.scroll_to(row)
+
+    def on_text_scrolled(self, text: tk.Text):
+        """
+        Handles scrolling of Text widget content (i.e. by mouse wheel or keyboard).
+        Keeps both Text widgets at the same row and renders next window of rows when window edge is reached.
+        """
+        if self._rendering:
+            return
+        top_line = int(text.index('@0,0').split('.')[0])
+        self.scroll_to(self.window_start + top_line - 1)
+
+
 class DiffResult(tk.Frame):
     """
     Main diff result frame containing two Text widgets side by side for presenting diff result.
@@ -108,6 +328,7 @@ class DiffResult(tk.Frame):
 
         self.a = ''
         self.b = ''
+        self.session: Optional[DiffSession] = None
 
         self.frame_bottom = tk.Frame(self)
         self.frame_bottom.grid(column=0, row=1, sticky='nsew', padx=3, pady=1)
@@ -121,7 +342,11 @@ class DiffResult(tk.Frame):
         self.texts.__children__.extend([self.text_source, self.text_target])
         configure_tags(self.texts)
         self.texts.tag_raise('sel')
-        # setup text widgets to scroll simultaneously
+        # render only visible part of diff result, setup text widgets to scroll simultaneously
+        self.view = VirtualDiffView(self.text_source, self.text_target)
+        self.text_source.vbar['command'] = self.view.yview
+        self.text_target.vbar['command'] = self.view.yview
+        self.text_source.bind('<Configure>', self.on_configure_text, add='+')
         self.text_source.on_xscrollcommand = self.on_xscrollcommand_source
         self.text_source.on_yscrollcommand = self.on_yscrollcommand_source
         self.text_target.on_xscrollcommand = self.on_xscrollcommand_target
@@ -164,6 +389,7 @@ class DiffResult(tk.Frame):
         self.scale_cutoff = tk.Scale(self.frame_cutoff, orient=tk.HORIZONTAL, length=200, from_=0.0, to=1.0,
                                      resolution=0.01, showvalue=False, variable=self.scale_cutoff_value)
         self.scale_cutoff.set(0.75)
+        self.scale_cutoff.bind('<ButtonRelease-1>', self.cutoff_selection)
         self.scale_cutoff.grid(column=1, row=0, sticky='nw')
         self.lbl_cutoff_value = tk.Label(self.frame_cutoff, textvariable=self.scale_cutoff_value)
         self.lbl_cutoff_value.grid(column=2, row=0, sticky='nw')
@@ -189,6 +415,12 @@ class DiffResult(tk.Frame):
         self.button_generate = tk.Button(self.frame_top, text='Generate Diff', command=self.generate_diff)
         self.button_generate.grid(column=5, row=0, sticky='nw', padx=10)
 
+        # ---GUI--- changes navigation
+        self.button_prev_change = tk.Button(self.frame_top, text='Previous Change', command=self.view.prev_change)
+        self.button_prev_change.grid(column=6, row=0, sticky='nw', padx=(10, 0))
+        self.button_next_change = tk.Button(self.frame_top, text='Next Change', command=self.view.next_change)
+        self.button_next_change.grid(column=7, row=0, sticky='nw')
+
         self.text_source.grid(column=0, row=0, sticky='nsew')
         self.text_target.grid(column=1, row=0, sticky='nsew')
         #
@@ -207,9 +439,9 @@ class DiffResult(tk.Frame):
     def set_diff_params(self, a: str, b: str,
                         line_sm_name: SequenceMatcherName = SequenceMatcherName.HECKEL,
                         inline_sm_name: SequenceMatcherName = SequenceMatcherName.HECKEL,
-                        cutoff: float = 1.0, case_sensitive: bool = True):
+                        cutoff: float = 1.0, case_sensitive: bool = True, session: DiffSession = None):
         """
-        Set diff parameters for a widget
+        Set diff parameters for a widget. Optional session with memoized diff stages for the same texts can be passed.
         """
         if not 0.0 <= cutoff <= 1.0:
             raise ValueError('cutoff must be in range: 0.0 <= cutoff <= 1.0')
@@ -219,90 +451,57 @@ class DiffResult(tk.Frame):
         self.combo_line_sm.set(factory_name_to_sm_choice[line_sm_name.value])
         self.combo_in_line_sm.set(factory_name_to_sm_choice[inline_sm_name.value])
         self.case_sensitive.set(value=case_sensitive)
+        self.session = session
 
     def handle_sort(self):
         """Sort source and target text lines"""
-        a_lines = self.a.splitlines(keepends=False)
-        b_lines = self.b.splitlines(keepends=False)
         option = SortChoices(self.combo_sort_by.get())
-        case_sensitive = self.case_sensitive.get()
-        if option == SortChoices.NO:
-            return self.a, self.b
-        elif option == SortChoices.YES:
-            return '\n'.join(sort_string_seq(a_lines, case_sensitive)), \
-                   '\n'.join(sort_string_seq(a_lines, case_sensitive))
-        elif option == SortChoices.BY_SOURCE:
-            return self.a, '\n'.join(sort_string_seq_by_other(b_lines, a_lines, case_sensitive))
-        elif option == SortChoices.BY_TARGET:
-            return '\n'.join(sort_string_seq_by_other(a_lines, b_lines, case_sensitive)), self.b
+        return sort_text_lines(self.a, self.b, sort_choice_to_mode[option], self.case_sensitive.get())
 
     def generate_diff(self):
         """
         Takes parameters info from widgets and generates diff for intput texts.
         """
-        src_yview = self.text_source.yview()
-        tgt_yview = self.text_target.yview()
-        self.texts.configure(state='normal')
-        self.texts.delete('1.0', tk.END)
-
         a, b = self.handle_sort()
+        session = self.get_session(a, b)
         cutoff = self.scale_cutoff_value.get()
         line_sm = seq_matcher_factory(sm_choice_to_factory_name[self.combo_line_sm.get()])()
         inline_sm = seq_matcher_factory(sm_choice_to_factory_name[self.combo_in_line_sm.get()])()
-        a_lines, b_lines, opcodes = diff_lines_with_similarities(
-            a=a, b=b, cutoff=cutoff, line_sm=line_sm, inline_sm=inline_sm, keepends=True,
-            case_sensitive=self.case_sensitive.get())
-
-        for opcode in opcodes:
-            tag, i1, i2, j1, j2 = opcode
-            left_len = i2 - i1
-            right_len = j2 - j1
-            max_len = max(left_len, right_len)
-
-            if tag == 'replace':
-                if isinstance(opcode, CompositeOpCode) and opcode.children_opcodes:
-                    for inline_opcode in opcode.children_opcodes:
-                        il_tag, il_i1, il_i2, il_j1, il_j2 = inline_opcode
-                        il_text_tag = inline_opcode_tag_to_text_tag[il_tag].value
-                        self.text_source.insert('end', a_lines[i1][il_i1:il_i2], (il_text_tag,))
-                        self.text_target.insert('end', b_lines[j1][il_j1:il_j2], (il_text_tag,))
-                    continue
-
-                else:
-                    delete_tag = line_opcode_tag_to_text_tag['delete'].value
-                    insert_tag = line_opcode_tag_to_text_tag['insert'].value
-                    left_tags = [delete_tag] * left_len + [None] * (max_len - left_len)
-                    right_tags = [insert_tag] * right_len + [None] * (max_len - right_len)
-            else:
-                text_tag = line_opcode_tag_to_text_tag[tag].value
-                left_tags = [text_tag] * left_len + [None] * (max_len - left_len)
-                right_tags = [text_tag] * right_len + [None] * (max_len - right_len)
+        a_lines, b_lines, opcodes = session.diff(
+            cutoff=cutoff, line_sm=line_sm, inline_sm=inline_sm, keepends=False,
+            case_sensitive=self.case_sensitive.get(), lazy_inline=True)
 
-            for left_line, right_line, left_text_tag, right_text_tag in \
-                    zip_longest(a_lines[i1:i2], b_lines[j1:j2], left_tags, right_tags, fillvalue='\n'):
-                self.text_source.insert('end', left_line, (left_text_tag,))
-                self.text_target.insert('end', right_line, (right_text_tag,))
+        self.view.set_diff(a_lines, b_lines, opcodes)
+        self.view.render()
 
-        self.texts.configure(state='disabled')
-        self.text_source.yview_moveto(src_yview[0])
-        self.text_target.yview_moveto(tgt_yview[0])
+    def get_session(self, a: str, b: str) -> DiffSession:
+        """Returns diff session for input texts. Session is reused as long as texts doesn't change."""
+        if self.session is None or not (self.session.a == a and self.session.b == b):
+            self.session = DiffSession(a, b)
+        return self.session
 
     def sort_by_selection(self, event=None):
         """Triggered on Sort By: combo box selection"""
-        pass
+        self.generate_diff()
 
     def line_sm_selection(self, event=None):
         """Triggered on Line SM: combo box selection"""
-        pass
+        self.generate_diff()
 
     def in_line_sm_selection(self, event=None):
         """Triggered on InLine SM: combo box selection"""
-        pass
+        self.generate_diff()
+
+    def cutoff_selection(self, event=None):
+        """Triggered on Cutoff: slider release"""
+        self.generate_diff()
+
+    def on_configure_text(self, event=None):
+        """Renders rows window again when Text widget size changes."""
+        self.view.render()
 
     def on_yscrollcommand_source(self, first, last):
-        if not self.has_text_scrollbars_the_same_position():
-            view_pos = self.text_source.yview()
-            self.text_target.yview_moveto(view_pos[0])
+        self.view.on_text_scrolled(self.text_source)
 
     def on_xscrollcommand_source(self, first, last):
         if not self.has_text_scrollbars_the_same_position():
@@ -310,9 +509,7 @@ class DiffResult(tk.Frame):
             self.text_target.xview_moveto(view_pos[0])
 
     def on_yscrollcommand_target(self, first, last):
-        if not self.has_text_scrollbars_the_same_position():
-            view_pos = self.text_target.yview()
-            self.text_source.yview_moveto(view_pos[0])
+        self.view.on_text_scrolled(self.text_target)
 
     def on_xscrollcommand_target(self, first, last):
         if not self.has_text_scrollbars_the_same_position():
@@ -320,8 +517,7 @@ class DiffResult(tk.Frame):
             self.text_source.xview_moveto(view_pos[0])
 
     def has_text_scrollbars_the_same_position(self):
-        return self.text_source.hbar.get() == self.text_target.hbar.get() and \
-               self.text_source.vbar.get() == self.text_target.vbar.get()
+        return self.text_source.hbar.get() == self.text_target.hbar.get()
 
 
 class DiffResultWindowBuilder(WindowBuilder):
@@ -1,13 +1,20 @@
 import abc
+import sys
+import time
 from dataclasses import dataclass
 from itertools import zip_longest
 from math import log10
 from operator import itemgetter
-from typing import Sequence, Dict, Literal, Union, Tuple
+from typing import Sequence, Dict, Literal, Union, Tuple, Iterable
 
 import colorama
 
-from mdiff.utils import CompositeOpCode, OpCodeType, OpCode
+from mdiff.layout import DiffLayout
+from mdiff.profiling import profile_from_env
+from mdiff.seqmatch.merge_join import MergeJoinRow
+from mdiff.seqmatch.multiset import MultisetDiff
+from mdiff.stats import current_stats, phase
+from mdiff.utils import CompositeOpCode, OpCodeType, OpCode, Text, decode_line
 
 STYLE_RESET = colorama.Style.RESET_ALL + colorama.Fore.RESET + colorama.Back.RESET
 
@@ -24,6 +31,7 @@ class ConsoleCharacters:
     symbol_line_replace: str
     symbol_line_similar: str
     line_fill_char: str
+    symbol_fold: str = '...'
 
     def __post_init__(self):
         self.op_char = {
@@ -157,7 +165,8 @@ unicode_console_characters = ConsoleCharacters(
     symbol_line_move_down='🠗',
     symbol_line_replace='≠',
     symbol_line_similar='≠',
-    line_fill_char=' '
+    line_fill_char=' ',
+    symbol_fold='⋯'
 )
 # ǀ ≠ 🠕 🠗 ⇅
 
@@ -180,6 +189,40 @@ def get_console_characters(char_set: str):
     return console_characters[char_set]
 
 
+class ConsoleProgressBar:
+    """
+    Progress callback (see mdiff.progress) drawing progress bar of current diff phase on stderr.
+    Redraws are throttled to min_interval seconds (except of phase change).
+    """
+
+    def __init__(self, width: int = 30, stream=None, min_interval: float = 0.1):
+        self.width = width
+        self.stream = stream if stream is not None else sys.stderr
+        self.min_interval = min_interval
+        self._phase = None
+        self._last_draw = 0.0
+        self._drawn = False
+
+    def __call__(self, phase: str, done: int, total: int):
+        now = time.monotonic()
+        if phase == self._phase and now - self._last_draw < self.min_interval and done < total:
+            return
+        self._phase = phase
+        self._last_draw = now
+        fraction = done / total if total else 1.0
+        filled = int(self.width * fraction)
+        self.stream.write(f'\r{phase:14} [{"#" * filled}{"." * (self.width - filled)}] {fraction:4.0%}')
+        self.stream.flush()
+        self._drawn = True
+
+    def close(self):
+        """Clears progress bar line."""
+        if self._drawn:
+            self.stream.write('\r' + ' ' * (self.width + 23) + '\r')
+            self.stream.flush()
+            self._drawn = False
+
+
 def longest_string_in_list(s_list: Sequence[str]):
     return max(s_list, key=lambda x: len(x))
 
@@ -195,7 +238,12 @@ class ConsolePrinter(abc.ABC):
 
 
 class LineDiffConsolePrinter:
-    def __init__(self, a: Sequence[str], b: Sequence[str], seq: Sequence[CompositeOpCode],
+    """
+    Prints side by side diff of lines. Lines can be strings or bytes (bytes mode), bytes lines
+    (and their in-line diff parts) are decoded only when they are printed, with undecodable bytes replaced.
+    """
+
+    def __init__(self, a: Sequence[Text], b: Sequence[Text], seq: Sequence[CompositeOpCode],
                  characters: ConsoleCharacters, colors: ConsoleColors,
                  line_margin=3, equal_context=-1, op_char_space=1):
         self.a = a
@@ -208,15 +256,8 @@ class LineDiffConsolePrinter:
         self.op_char_space = op_char_space
 
         # build formatting
-        self.longest_string_len = {
-            'a': len(longest_string_in_list(self.a)),
-            'b': len(longest_string_in_list(self.b))
-        }
-
-        self.line_digits_number = {
-            'a': digits_number(len(self.a)),
-            'b': digits_number(len(self.b))
-        }
+        self.set_formatting(a_lines=len(self.a), b_lines=len(self.b),
+                            a_longest=max(map(len, self.a), default=0), b_longest=max(map(len, self.b), default=0))
 
         self.op_chars = {
             'equal': ('', ''),
@@ -227,6 +268,18 @@ class LineDiffConsolePrinter:
             'replace': (self.characters.get_op_char('replace'), self.characters.get_op_char('replace'))
         }
 
+    def set_formatting(self, a_lines: int, b_lines: int, a_longest: int, b_longest: int):
+        """Sets column widths from numbers of lines and lengths of the longest lines."""
+        self.longest_string_len = {
+            'a': a_longest,
+            'b': b_longest
+        }
+
+        self.line_digits_number = {
+            'a': digits_number(max(a_lines, 1)),
+            'b': digits_number(max(b_lines, 1))
+        }
+
     def get_line_digits_number(self, side: Literal['a', 'b']):
         return self.line_digits_number[side]
 
@@ -267,7 +320,7 @@ class LineDiffConsolePrinter:
                        + reset + f'{self.characters.sep_line_num}'
         return label_string
 
-    def get_line_string(self, line: str, opcode: Union[OpCodeType, CompositeOpCode], side: Literal['a', 'b']) -> str:
+    def get_line_string(self, line: Text, opcode: Union[OpCodeType, CompositeOpCode], side: Literal['a', 'b']) -> str:
         if side == 'a':
             get_opcode_start_idx = itemgetter(1)
             get_opcode_end_idx = itemgetter(2)
@@ -288,13 +341,15 @@ class LineDiffConsolePrinter:
                 i2 = get_opcode_end_idx(child_opcode)
                 if tag in tags:
                     in_line_style = self.colors.get_in_line_color(tag)
-                    line_content_parts.append(in_line_style + line[i1:i2])
+                    line_content_parts.append(in_line_style + decode_line(line[i1:i2]))
                 else:
                     # keep print style on a line level (note that there is no 'equal' in tags variable)
-                    line_content_parts.append(line_style + line[i1:i2])
+                    line_content_parts.append(line_style + decode_line(line[i1:i2]))
             line_content_parts.append(line_style)
             line_content = ''.join(line_content_parts)
+            line = decode_line(line)
         else:
+            line = decode_line(line)
             if line_tag in tags:
                 line_content = line_style + line
             else:
@@ -397,9 +452,81 @@ class LineDiffConsolePrinter:
                     b_line_content=right
                 )
 
+    def print_rows(self, layout: DiffLayout, start: int, stop: int):
+        for row, opcode, offset in layout.iter_rows(start, stop):
+            a_idx, b_idx, _ = layout.row(row)
+            self.print_entry(
+                opcode=opcode,
+                curr_opcode_index=offset,
+                a_line_content='' if a_idx is None else self.a[a_idx],
+                b_line_content='' if b_idx is None else self.b[b_idx]
+            )
+
+    def print_fold(self):
+        print(f'{self.colors.line_filler}{self.characters.symbol_fold}{STYLE_RESET}')
+
+    def print(self):
+        with profile_from_env(), phase(current_stats(), 'render'):
+            colorama.init(autoreset=False, convert=True)
+            layout = DiffLayout(self.seq)
+            if self.equal_context < 0:
+                ranges = [(0, len(layout))]
+            else:
+                ranges = layout.context_ranges(self.equal_context)
+            for start, stop in ranges:
+                if start > 0:
+                    self.print_fold()
+                self.print_rows(layout, start, stop)
+            if len(layout) and (not ranges or ranges[-1][1] < len(layout)):
+                self.print_fold()
+            print(colorama.Fore.RESET + colorama.Back.RESET)
+            colorama.deinit()
+
+
+class MergeJoinConsolePrinter(LineDiffConsolePrinter):
+    """
+    Prints merge-join rows (see mdiff.seqmatch.merge_join) while they are generated, so diff of sorted files
+    is printed in constant memory. Numbers of lines and lengths of the longest lines have to be known in advance
+    to align columns.
+    """
+
+    def __init__(self, rows: Iterable[MergeJoinRow], a_lines: int, b_lines: int, a_longest: int, b_longest: int,
+                 characters: ConsoleCharacters, colors: ConsoleColors, line_margin=3, op_char_space=1):
+        super().__init__(a=(), b=(), seq=(), characters=characters, colors=colors, line_margin=line_margin,
+                         op_char_space=op_char_space)
+        self.rows = rows
+        self.set_formatting(a_lines, b_lines, a_longest, b_longest)
+
+    def print(self):
+        with profile_from_env(), phase(current_stats(), 'render'):
+            colorama.init(autoreset=False, convert=True)
+            for tag, i, j, a_item, b_item in self.rows:
+                opcode = OpCode(tag, i, i + (tag != 'insert'), j, j + (tag != 'delete'))
+                self.print_entry(opcode=opcode, curr_opcode_index=0,
+                                 a_line_content='' if a_item is None else a_item,
+                                 b_line_content='' if b_item is None else b_item)
+            print(colorama.Fore.RESET + colorama.Back.RESET)
+            colorama.deinit()
+
+
+class MultisetConsolePrinter(ConsolePrinter):
+    """
+    Prints removed and added lines of multiset diff (in sorted order) with number of occurrences.
+    """
+
+    def __init__(self, diff: MultisetDiff, characters: ConsoleCharacters, colors: ConsoleColors):
+        self.diff = diff
+        self.characters = characters
+        self.colors = colors
+
     def print(self):
-        colorama.init(autoreset=False, convert=True)
-        for opcode in self.seq:
-            self.print_opcode(opcode)
-        print(colorama.Fore.RESET + colorama.Back.RESET)
-        colorama.deinit()
+        with profile_from_env(), phase(current_stats(), 'render'):
+            colorama.init(autoreset=False, convert=True)
+            for tag, counter in (('delete', self.diff.removed), ('insert', self.diff.added)):
+                line_style = self.colors.get_line_color(tag)
+                op_char = self.characters.get_op_char(tag)
+                for line in sorted(counter):
+                    count = counter[line]
+                    occurrences = f' (x{count})' if count > 1 else ''
+                    print(f'{line_style}{op_char} {decode_line(line)}{occurrences}{STYLE_RESET}')
+            colorama.deinit()
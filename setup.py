@@ -10,7 +10,7 @@ VERSION = '0.1.5'
 
 setuptools.setup(
     name='mdiff',
-    packages=setuptools.find_packages(exclude=['tests', 'tests.*']),
+    packages=setuptools.find_packages(exclude=['tests', 'tests.*', 'benchmarks', 'benchmarks.*']),
     version=VERSION,
     license='MIT',
     description='Sequence matcher with displacement detection.',
@@ -23,6 +23,8 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             'mdiff=mdiff.cli:main',
+            'mdiff-cluster=mdiff.cli:cluster_main',
+            'mdiff-fleet=mdiff.cli:fleet_main',
             'mdiff-gui=mdiff.visualisation.gui_tkinter.main:start_app'
         ]
     },
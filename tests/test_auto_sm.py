@@ -0,0 +1,96 @@
+import random
+import unittest
+
+from mdiff import AutoSequenceMatcher, HeckelSequenceMatcher, MyersSequenceMatcher, HistogramSequenceMatcher
+from mdiff.seqmatch.auto import profile_sequences, choose_matcher, SequencesProfile, HECKEL, MYERS, HISTOGRAM
+from mdiff.seqmatch.utils import seq_matcher_factory, SequenceMatcherName
+from mdiff.stats import collect_stats
+
+
+def numbered_lines(n):
+    return [f'line {i}' if i % 7 else '' for i in range(n)]
+
+
+class TestProfileSequences(unittest.TestCase):
+
+    def test_profile(self):
+        self.assertEqual(SequencesProfile(6, 4, 2, 1, 0.0, 0.0, 4), profile_sequences('abcxyz', 'abQz'))
+        self.assertEqual(SequencesProfile(3, 3, 3, 0, 0.0, 0.0, 0), profile_sequences('abc', 'abc'))
+        profile = profile_sequences('xaab', 'ybba')
+        self.assertEqual(0.25, profile.duplicate_ratio)
+        self.assertEqual(4, profile.estimated_edit_distance)
+
+    def test_displaced_anchors(self):
+        a = list(range(100))
+        profile = profile_sequences(a, a[50:] + a[:50])
+        self.assertEqual(1.0, profile.anchor_density)
+        self.assertEqual(2, profile.estimated_edit_distance)
+
+
+class TestChooseMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.rnd = random.Random(0)
+        self.a = numbered_lines(20000)
+
+    def choose(self, a, b):
+        return choose_matcher(profile_sequences(a, b))
+
+    def test_nearly_identical(self):
+        b = list(self.a)
+        for k in range(20):
+            b[self.rnd.randrange(len(b))] = f'changed {k}'
+        self.assertEqual(MYERS, self.choose(self.a, b))
+
+    def test_many_scattered_changes(self):
+        b = list(self.a)
+        for k in range(3000):
+            b[self.rnd.randrange(len(b))] = f'changed {k}'
+        self.assertEqual(HISTOGRAM, self.choose(self.a, b))
+
+    def test_replaced_block(self):
+        b = self.a[:5000] + [f'new {i}' for i in range(3000)] + self.a[8000:]
+        self.assertEqual(HISTOGRAM, self.choose(self.a, b))
+
+    def test_shuffled(self):
+        b = list(self.a)
+        self.rnd.shuffle(b)
+        self.assertEqual(HECKEL, self.choose(self.a, b))
+
+    def test_duplicate_heavy(self):
+        a = [self.rnd.choice(['', '}', '{', 'return;']) for _ in range(20000)]
+        b = [self.rnd.choice(['', '}', '{']) for _ in range(20000)]
+        self.assertEqual(HECKEL, self.choose(a, b))
+
+
+class TestAutoSequenceMatcher(unittest.TestCase):
+
+    def test_delegates_to_chosen_matcher(self):
+        a = numbered_lines(1000)
+        b = a[500:] + a[:500]
+        b[10] = 'changed'
+        expected = {
+            HECKEL: HeckelSequenceMatcher,
+            MYERS: MyersSequenceMatcher,
+            HISTOGRAM: HistogramSequenceMatcher,
+        }
+        for replace_mode in (True, False):
+            with self.subTest(replace_mode=replace_mode):
+                sm = AutoSequenceMatcher(a, b, replace_mode=replace_mode)
+                opcodes = sm.get_opcodes()
+                self.assertEqual(MYERS, sm.chosen)
+                self.assertEqual(expected[sm.chosen](a, b, replace_mode=replace_mode).get_opcodes(), opcodes)
+
+    def test_stats(self):
+        with collect_stats() as stats:
+            AutoSequenceMatcher().compute('abcxyz', 'abQz')
+        self.assertEqual(MYERS, stats.auto_matcher)
+        self.assertIn('auto', stats.phase_times)
+        self.assertIn('Auto matcher: myers', stats.format())
+
+    def test_factory(self):
+        self.assertIs(AutoSequenceMatcher, seq_matcher_factory(SequenceMatcherName.AUTO))
+
+
+if __name__ == '__main__':
+    unittest.main()
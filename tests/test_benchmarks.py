@@ -0,0 +1,75 @@
+import unittest
+
+from benchmarks.corpora import corpora
+from benchmarks.suite import scaling_exponent, run_benchmark, find_regressions, targets, time_exponent, \
+    benchmark_sizes, run_suite
+
+
+class TestCorpora(unittest.TestCase):
+
+    def test_corpora_are_deterministic(self):
+        for name, corpus in corpora.items():
+            with self.subTest(corpus=name):
+                a, b = corpus(200, 1)
+                self.assertEqual((a, b), corpus(200, 1))
+                self.assertTrue(a)
+                self.assertTrue(b)
+                self.assertNotEqual(a, b)
+
+
+class TestSuite(unittest.TestCase):
+
+    def test_scaling_exponent(self):
+        self.assertAlmostEqual(1.0, scaling_exponent([100, 200, 400], [1, 2, 4]))
+        self.assertAlmostEqual(2.0, scaling_exponent([100, 200, 400], [1, 4, 16]))
+        self.assertAlmostEqual(0.0, scaling_exponent([100, 100], [1, 2]))
+
+    def test_time_exponent(self):
+        # times shorter than MIN_SECONDS are noise and are not fitted
+        self.assertAlmostEqual(1.0, time_exponent([100, 200, 400, 800], [0.001, 0.01, 0.1, 0.2]))
+        self.assertIsNone(time_exponent([100, 200, 400], [0.001, 0.002, 0.1]))
+
+    def test_benchmark_sizes(self):
+        self.assertEqual([100, 200], benchmark_sizes('sparse_edits', 'heckel', [100, 200]))
+        self.assertIsNone(benchmark_sizes('long_single_lines', 'heckel', [100, 200]))
+        self.assertEqual([6, 12], benchmark_sizes('long_single_lines', 'diff_lines_with_similarities', [100, 200]))
+        self.assertEqual(['long_single_lines/diff_lines_with_similarities'],
+                         list(run_suite(['long_single_lines'], sorted(targets), [64], repeat=1)))
+
+    def test_run_benchmark(self):
+        for target in targets:
+            with self.subTest(target=target):
+                result = run_benchmark('sparse_edits', target, [50, 100], repeat=1)
+                self.assertEqual([50, 100], result['sizes'])
+                self.assertEqual(2, len(result['seconds']))
+                self.assertEqual([i / result['reference_seconds'] for i in result['seconds']],
+                                 result['relative_time'])
+                self.assertTrue(all(i > 0 for i in result['peak_kib']))
+
+    def test_find_regressions(self):
+        baseline = {'c/t': {'sizes': [10, 20], 'seconds': [0.1, 0.2], 'relative_time': [1.0, 2.0],
+                            'peak_kib': [10, 20], 'time_exponent': 1.0, 'memory_exponent': 1.0}}
+        same = {'c/t': dict(baseline['c/t'])}
+        self.assertEqual([], find_regressions(same, baseline))
+
+        quadratic = {'c/t': dict(baseline['c/t'], seconds=[0.1, 0.4], time_exponent=2.0)}
+        self.assertEqual(['c/t: time_exponent 1.00 -> 2.00'], find_regressions(quadratic, baseline))
+
+        # time is compared relative to reference workload time of the same run
+        slower = {'c/t': dict(baseline['c/t'], seconds=[0.5, 1.0], relative_time=[5.0, 10.0])}
+        self.assertEqual(['c/t: relative_time at n=20 2 -> 10'], find_regressions(slower, baseline))
+        self.assertEqual([], find_regressions(slower, baseline, time_tolerance=None))
+        slower_machine = {'c/t': dict(baseline['c/t'], seconds=[0.5, 1.0])}
+        self.assertEqual([], find_regressions(slower_machine, baseline))
+
+        # short times are noise
+        fast = {'c/t': dict(baseline['c/t'], seconds=[0.001, 0.002], relative_time=[0.01, 0.02])}
+        fast_slower = {'c/t': dict(fast['c/t'], seconds=[0.01, 0.02], relative_time=[0.1, 0.2])}
+        self.assertEqual([], find_regressions(fast_slower, fast))
+
+        bigger = {'c/t': dict(baseline['c/t'], peak_kib=[20, 40])}
+        self.assertEqual(['c/t: peak_kib at n=20 20 -> 40'], find_regressions(bigger, baseline))
+
+        self.assertEqual([], find_regressions({'other/t': same['c/t']}, baseline))
+        # reference targets are not compared
+        self.assertEqual([], find_regressions({'c/difflib': quadratic['c/t']}, {'c/difflib': baseline['c/t']}))
@@ -0,0 +1,109 @@
+import time
+import unittest
+from unittest import mock
+
+from mdiff import diff_lines_with_similarities, DisplacementSequenceMatcher, HeckelSequenceMatcher, CompositeOpCode
+from mdiff.budget import DiffBudget, BudgetExceededException, coarse_opcodes, SKIP_SIMILARITIES, \
+    DISPLACEMENT_TO_HECKEL, COARSE_REPLACE
+from mdiff.progress import CancellationToken, DiffCancelledException
+from mdiff.stats import collect_stats
+from mdiff.utils import OpCode
+
+
+def replace_block_texts(n):
+    a = '\n'.join(f'line number {i}' for i in range(n))
+    b = '\n'.join(f'line number {i}!' for i in range(n))
+    return a, b
+
+
+class TestDiffBudget(unittest.TestCase):
+
+    def test_ratio_calls_budget(self):
+        budget = DiffBudget(max_ratio_calls=10)
+        budget.charge_ratio_calls(10)
+        self.assertEqual(0, budget.ratio_calls_left())
+        with self.assertRaises(BudgetExceededException):
+            budget.charge_ratio_calls(1)
+
+    def test_time_budget(self):
+        budget = DiffBudget(seconds=0.0)
+        time.sleep(0.001)
+        self.assertTrue(budget.time_exceeded())
+        self.assertRaises(BudgetExceededException, budget.raise_if_cancelled)
+        self.assertFalse(DiffBudget().time_exceeded())
+
+    def test_cancellation_is_not_budget_exception(self):
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(DiffCancelledException) as ctx:
+            DiffBudget(seconds=10, cancel=token).raise_if_cancelled()
+        self.assertNotIsInstance(ctx.exception, BudgetExceededException)
+
+    def test_coarse_opcodes(self):
+        self.assertEqual([OpCode('equal', 0, 3, 0, 3)], coarse_opcodes('abc', 'abc'))
+        self.assertEqual([OpCode('equal', 0, 1, 0, 1), OpCode('insert', 1, 1, 1, 3), OpCode('equal', 1, 2, 3, 4)],
+                         coarse_opcodes('ab', 'axyb'))
+        self.assertEqual([OpCode('delete', 0, 2, 0, 0)], coarse_opcodes('ab', ''))
+        self.assertEqual([OpCode('equal', 0, 2, 0, 2), OpCode('delete', 2, 3, 2, 2)], coarse_opcodes('aaa', 'aa'))
+
+
+class TestBudgetedDiff(unittest.TestCase):
+
+    def test_within_budget(self):
+        a, b = replace_block_texts(10)
+        expected = diff_lines_with_similarities(a, b, cutoff=0.5)
+        result = diff_lines_with_similarities(a, b, cutoff=0.5, budget_seconds=60, max_ratio_calls=100)
+        self.assertEqual(expected, result)
+        self.assertEqual([], result[2].degradations)
+        self.assertEqual([], expected[2].degradations)
+
+    def test_large_replace_block_skipped(self):
+        a, b = replace_block_texts(20)
+        with collect_stats() as stats:
+            _, _, opcodes = diff_lines_with_similarities(a, b, cutoff=0.5, max_ratio_calls=399)
+        self.assertEqual([CompositeOpCode('replace', 0, 20, 0, 20)], opcodes)
+        self.assertEqual([SKIP_SIMILARITIES], opcodes.degradations)
+        self.assertEqual([SKIP_SIMILARITIES], stats.degradations)
+        self.assertEqual(0, stats.ratio_calls)
+
+    def test_budget_spent_by_previous_block(self):
+        a1, b1 = replace_block_texts(10)
+        a = a1 + '\nanchor\n' + a1
+        b = b1 + '\nanchor\n' + b1
+        with collect_stats() as stats:
+            _, _, opcodes = diff_lines_with_similarities(a, b, cutoff=0.5, max_ratio_calls=105)
+        self.assertEqual([SKIP_SIMILARITIES], opcodes.degradations)
+        self.assertLessEqual(stats.ratio_calls, 105)
+        # the first block is searched for similar lines, the second one exceeds the rest of the budget
+        self.assertEqual(CompositeOpCode('replace', 0, 1, 0, 1), opcodes[0])
+        self.assertTrue(opcodes[0].children_opcodes)
+        self.assertEqual(CompositeOpCode('replace', 11, 21, 11, 21), opcodes[-1])
+
+    def test_displacement_falls_back_to_heckel(self):
+        a, b = replace_block_texts(10)
+        expected = diff_lines_with_similarities(a, b, cutoff=1.0, line_sm=HeckelSequenceMatcher())
+
+        def slow_displacement_run(alg):
+            time.sleep(0.05)
+            raise BudgetExceededException()
+
+        with mock.patch('mdiff.seqmatch.heckel.DisplacementAlgorithm.run', slow_displacement_run):
+            result = diff_lines_with_similarities(a, b, cutoff=1.0, line_sm=DisplacementSequenceMatcher(),
+                                                  budget_seconds=60)
+        self.assertEqual(expected, result)
+        self.assertEqual([DISPLACEMENT_TO_HECKEL], result[2].degradations)
+
+    def test_coarse_replace(self):
+        a = 'a\nb\nc\nd'
+        b = 'a\nc\nb\nd'
+        _, _, opcodes = diff_lines_with_similarities(a, b, cutoff=0.5, line_sm=DisplacementSequenceMatcher(),
+                                                     budget_seconds=0)
+        self.assertEqual([DISPLACEMENT_TO_HECKEL, COARSE_REPLACE, SKIP_SIMILARITIES], opcodes.degradations)
+        self.assertEqual([CompositeOpCode('equal', 0, 1, 0, 1), CompositeOpCode('replace', 1, 3, 1, 3),
+                          CompositeOpCode('equal', 3, 4, 3, 4)], opcodes)
+
+    def test_user_cancellation_is_not_degraded(self):
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(DiffCancelledException):
+            diff_lines_with_similarities('a\nb', 'b\na', budget_seconds=60, cancel=token)
@@ -5,6 +5,7 @@ import typer
 from typer.testing import CliRunner
 
 from mdiff.cli import cli_diff, SequenceMatcherName, ColorMode, CharacterMode
+from mdiff.utils import SortMode
 
 runner = CliRunner()
 
@@ -21,7 +22,19 @@ class TestCLI(unittest.TestCase):
                  char_mode=CharacterMode.UTF8,
                  color_mode=ColorMode.FORE,
                  gui=False,
-                 case_sensitive=True
+                 case_sensitive=True,
+                 stats=False,
+                 profile=None,
+                 progress=False,
+                 budget_seconds=None,
+                 max_ratio_calls=None,
+                 assume_sorted=False,
+                 multiset=False,
+                 sort=SortMode.NO,
+                 bytes_mode=False,
+                 quiet=False,
+                 stat=False,
+                 jobs=None
                  )
 
     def test_cli_run(self):
@@ -32,3 +45,37 @@ class TestCLI(unittest.TestCase):
                                ['tests/resources/compares/comp1/a.txt', 'tests/resources/compares/comp1/b.txt'])
         self.assertEqual(result.exit_code, 0)
 
+    def test_cli_run_assume_sorted(self):
+        """Test if sorted files are compared with streaming merge-join"""
+        app = typer.Typer()
+        app.command()(cli_diff)
+        for files in (['tests/resources/compares/comp1/a.txt', 'tests/resources/compares/comp1/b.txt'],
+                      ['tests/resources/compares/comp4/a.txt', 'tests/resources/compares/comp4/b.txt']):
+            result = runner.invoke(app, files + ['--assume-sorted'])
+            self.assertEqual(result.exit_code, 0)
+
+    def test_cli_run_sort(self):
+        """Test if lines are sorted before diff"""
+        app = typer.Typer()
+        app.command()(cli_diff)
+        for sort in ('yes', 'by-source', 'by-target'):
+            result = runner.invoke(app, ['tests/resources/compares/comp1/a.txt', 'tests/resources/compares/comp1/b.txt',
+                                         '--sort', sort])
+            self.assertEqual(result.exit_code, 0)
+
+    def test_cli_run_multiset(self):
+        """Test if files are compared as multisets of lines"""
+        app = typer.Typer()
+        app.command()(cli_diff)
+        result = runner.invoke(app, ['tests/resources/compares/comp1/a.txt', 'tests/resources/compares/comp1/b.txt',
+                                     '--multiset', '--char-mode', 'ascii'])
+        self.assertEqual(result.exit_code, 0)
+
+    def test_cli_run_bytes(self):
+        """Test if files are compared as undecoded bytes lines"""
+        app = typer.Typer()
+        app.command()(cli_diff)
+        files = ['tests/resources/compares/comp1/a.txt', 'tests/resources/compares/comp1/b.txt', '--bytes']
+        for extra in ([], ['--multiset'], ['--assume-sorted']):
+            result = runner.invoke(app, files + extra + ['--char-mode', 'ascii'])
+            self.assertEqual(result.exit_code, 0)
@@ -0,0 +1,131 @@
+import random
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff import find_similar, similarity_clusters, SimilarPair, DiffSummary, HeckelSequenceMatcher
+from mdiff.cli import cli_cluster
+from mdiff.cluster import minhash_signature, lsh_candidates, file_signature, files_similarity
+from tests.utils import TempDirTestCase
+
+runner = CliRunner()
+
+
+class ClusterTestCase(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rnd = random.Random(0)
+        self.files = []
+        for base in range(20):
+            lines = [f'option_{base}_{i} = {rnd.randint(0, 1000)}' for i in range(100)]
+            positions = rnd.sample(range(100), 10)
+            changed = list(lines)
+            for version in range(3):
+                for i in positions[5 * (version - 1):5 * version]:
+                    changed[i] = f'changed = {version} {i}'
+                self.files.append(self.write(f'{base}/{version}.conf', '\n'.join(changed)))
+
+
+class TestSignatures(unittest.TestCase):
+
+    def test_minhash_signature(self):
+        rnd = random.Random(0)
+        x = set(rnd.getrandbits(64) for _ in range(1000))
+        y = set(list(x)[:500]) | set(rnd.getrandbits(64) for _ in range(500))
+        x_signature = minhash_signature(x)
+        y_signature = minhash_signature(y)
+        self.assertEqual(128, len(x_signature))
+        # estimated Jaccard similarity of sets is 1/3
+        self.assertAlmostEqual(1 / 3, sum(map(int.__eq__, x_signature, y_signature)) / 128, delta=0.15)
+        self.assertEqual(x_signature, minhash_signature(sorted(x, reverse=True)))
+        # empty bins of small sets are filled
+        self.assertEqual(8, len(set(minhash_signature([7], num_perm=8))))
+        self.assertEqual(minhash_signature([]), minhash_signature([]))
+
+    def test_lsh_candidates(self):
+        signatures = [(1, 2, 3, 4), (1, 2, 5, 6), (7, 8, 5, 6), (9, 9, 9, 9)]
+        self.assertEqual({(0, 1), (1, 2)}, lsh_candidates(signatures, bands=2))
+        self.assertEqual(set(), lsh_candidates(signatures, bands=1))
+        self.assertEqual(set(), lsh_candidates([]))
+        with self.assertRaises(ValueError):
+            lsh_candidates(signatures, bands=5)
+
+    def test_ratio(self):
+        a = [f'line {i}' for i in range(10)]
+        b = a[5:] + a[:4] + ['new']
+        self.assertEqual(0.9, DiffSummary().count(HeckelSequenceMatcher().compute(a, b)).ratio())
+        self.assertEqual(1.0, DiffSummary().ratio())
+
+
+class TestFindSimilar(ClusterTestCase):
+
+    def test_find_similar(self):
+        pairs = find_similar(self.files, threshold=0.85, jobs=1)
+        # versions 0 and 1, 1 and 2 of every base file are 95% similar, versions 0 and 2 are 90% similar
+        self.assertEqual(60, len(pairs))
+        self.assertEqual([x.similarity for x in pairs], sorted((x.similarity for x in pairs), reverse=True))
+        for pair in pairs:
+            self.assertEqual(pair.a.parent, pair.b.parent)
+            self.assertLess(self.files.index(pair.a), self.files.index(pair.b))
+            self.assertEqual(files_similarity(pair.a, pair.b), pair.similarity)
+        self.assertEqual(40, len(find_similar(self.files, threshold=0.92, jobs=1)))
+
+    def test_candidates_are_not_all_pairs(self):
+        with mock.patch('mdiff.cluster._similarities', wraps=lambda sm, task: [1.0] * len(task[1])) as similarities:
+            find_similar(self.files, jobs=1)
+        compared = sum(len(call.args[1][1]) for call in similarities.call_args_list)
+        self.assertLess(compared, 100)
+
+    def test_identical_files(self):
+        copies = [self.write(f'copy{i}.conf', self.files[0].read_text()) for i in range(3)]
+        with mock.patch('mdiff.cluster._similarities', wraps=lambda sm, task: [0.0] * len(task[1])):
+            pairs = find_similar([self.files[0]] + copies + [self.files[1]], jobs=1)
+        self.assertEqual([SimilarPair(self.files[0], p, 1.0) for p in copies], pairs)
+
+    def test_processes(self):
+        files = self.files[:9]
+        self.assertEqual(find_similar(files, jobs=1), find_similar(files, jobs=2))
+
+    def test_threshold(self):
+        with self.assertRaises(ValueError):
+            find_similar(self.files, threshold=1.5)
+
+    def test_similarity_clusters(self):
+        a, b, c, d, e = map(Path, 'abcde')
+        pairs = [SimilarPair(d, e, 0.9), SimilarPair(a, d, 0.9), SimilarPair(b, c, 0.9)]
+        self.assertEqual([[a, d, e], [b, c]], similarity_clusters([a, b, c, d, e], pairs))
+        clusters = similarity_clusters(self.files, find_similar(self.files, jobs=1))
+        self.assertEqual([self.files[i:i + 3] for i in range(0, 60, 3)], clusters)
+
+    def test_file_signature(self):
+        digest, signature = file_signature(self.files[0])
+        crlf = self.write('crlf.conf', self.files[0].read_text().replace('\n', '\r\n'))
+        self.assertEqual(digest, file_signature(crlf)[0])
+        self.assertNotEqual(digest, file_signature(self.files[1])[0])
+
+
+class TestClusterCli(ClusterTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = typer.Typer()
+        self.app.command()(cli_cluster)
+
+    def test_clusters(self):
+        result = runner.invoke(self.app, [str(self.tmp_path / '0'), str(self.tmp_path / '1'), '-j', '1'])
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual('\n\n'.join('\n'.join(map(str, self.files[i:i + 3])) for i in (0, 3)) + '\n', result.stdout)
+
+    def test_graph(self):
+        result = runner.invoke(self.app, [str(p) for p in self.files[:4]] + ['--graph', '--threshold', '0.92'])
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual([f'0.950\t{self.files[0]}\t{self.files[1]}', f'0.950\t{self.files[1]}\t{self.files[2]}'],
+                         result.stdout.splitlines())
+
+
+if __name__ == '__main__':
+    unittest.main()
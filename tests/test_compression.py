@@ -0,0 +1,114 @@
+import bz2
+import gzip
+import lzma
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff import diff_files, diff_lines_with_similarities
+from mdiff.cli import cli_diff
+from mdiff.utils import detect_compression, open_file, read_file, read_file_lines, read_files_lines, \
+    iter_file_lines, iter_file_line_chunks
+from tests.utils import TempDirTestCase
+
+runner = CliRunner()
+
+COMPRESSORS = {
+    'gzip': gzip.compress,
+    'bz2': bz2.compress,
+    'xz': lzma.compress,
+}
+
+
+class TestCompressedFiles(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.content = 'line1\nline2\r\nline3\rcafé\n\nlast'
+
+    def test_detect_compression(self):
+        for name, compress in COMPRESSORS.items():
+            self.assertEqual(name, detect_compression(compress(b'abc')))
+        self.assertIsNone(detect_compression(b'abc'))
+        self.assertIsNone(detect_compression(b''))
+
+    def test_open_compressed_files(self):
+        data = self.content.encode()
+        for name, compress in COMPRESSORS.items():
+            # format is detected by magic bytes, not by extension
+            p = self.write(f'{name}.txt', compress(data))
+            with self.subTest(compression=name):
+                with open_file(p, binary=True) as file:
+                    self.assertEqual(data, file.read())
+                self.assertEqual([b'line1', b'line2', b'line3\rcaf\xc3\xa9', b'', b'last'],
+                                 list(iter_file_lines(p, binary=True)))
+                self.assertEqual(self.content.replace('\r\n', '\n').replace('\r', '\n'),
+                                 read_file(p))
+
+    def test_read_file_lines(self):
+        data = self.content.encode()
+        p = self.write('a.txt', data)
+        gz = self.write('a.gz', gzip.compress(data))
+        for chunk_size in (1, 2, 3, 5, 1024):
+            with self.subTest(chunk_size=chunk_size), mock.patch('mdiff.utils.READ_CHUNK_SIZE', chunk_size):
+                for keepends in (False, True):
+                    self.assertEqual(data.splitlines(keepends), read_file_lines(p, keepends, binary=True))
+                    self.assertEqual(data.splitlines(keepends), read_file_lines(gz, keepends, binary=True))
+                self.assertEqual(read_file(p).splitlines(), read_file_lines(p))
+        self.assertEqual([], read_file_lines(self.write('empty.txt', b'')))
+
+    def test_read_file_lines_without_lf(self):
+        data = b'line1\rline2\r\rline3\r\n' + b'long' * 10
+        p = self.write('cr.txt', data)
+        for chunk_size in (1, 2, 3, 5, 1024):
+            with self.subTest(chunk_size=chunk_size), mock.patch('mdiff.utils.READ_CHUNK_SIZE', chunk_size):
+                for keepends in (False, True):
+                    self.assertEqual(data.splitlines(keepends), read_file_lines(p, keepends, binary=True))
+        # CR-only lines are yielded chunk by chunk, not kept until the end of file
+        with mock.patch('mdiff.utils.READ_CHUNK_SIZE', 6):
+            self.assertEqual([[b'line1', b'line2', b''], [b'line3'], [b'long' * 10]],
+                             list(iter_file_line_chunks(p, binary=True)))
+
+    def test_read_files_lines(self):
+        a = self.write('a.gz', gzip.compress(b'a\nb'))
+        b = self.write('b.xz', lzma.compress(b'c\nd'))
+        for cpu_count in (1, 4):
+            with mock.patch('os.cpu_count', return_value=cpu_count):
+                self.assertEqual(([b'a', b'b'], [b'c', b'd']), read_files_lines(a, b, binary=True))
+
+
+class TestDiffFiles(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.a = read_file(Path('tests/resources/compares/comp3/a.txt'))
+        self.b = read_file(Path('tests/resources/compares/comp3/b.txt'))
+        self.a_path = self.write('a.txt.gz', gzip.compress(self.a.encode()))
+        self.b_path = self.write('b.txt.bz2', bz2.compress(self.b.encode()))
+
+    def test_diff_files(self):
+        expected = diff_lines_with_similarities(self.a, self.b)
+        result = diff_files(self.a_path, self.b_path)
+        self.assertEqual(expected, result)
+        self.assertEqual([i.children_opcodes for i in expected[2]], [i.children_opcodes for i in result[2]])
+
+    def test_diff_files_bytes(self):
+        expected = diff_lines_with_similarities(self.a.encode(), self.b.encode(), keepends=True)
+        self.assertEqual(expected, diff_files(self.a_path, self.b_path, keepends=True, binary=True))
+
+    def test_cli(self):
+        app = typer.Typer()
+        app.command()(cli_diff)
+        for options in ([], ['--bytes'], ['--sort', 'yes'], ['--multiset'], ['--assume-sorted']):
+            with self.subTest(options=options):
+                result = runner.invoke(app, [str(self.a_path), str(self.b_path), '--char-mode', 'ascii',
+                                             '--color-mode', 'fore'] + options)
+                self.assertEqual(0, result.exit_code)
+                self.assertIn('qwerty', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
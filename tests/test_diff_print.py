@@ -1,4 +1,6 @@
+import io
 import unittest
+from contextlib import redirect_stdout
 from difflib import SequenceMatcher
 from pathlib import Path
 
@@ -44,3 +46,34 @@ class TestLineDiffPrint(unittest.TestCase):
                                                  characters=cli_vis.unicode_console_characters,
                                                  colors=cli_vis.console_colors_fore, line_margin=3, equal_context=-1)
         printer.print()
+
+    def test_diff_print_with_folded_context(self):
+        a = '\n'.join(f'line{i}' for i in range(100))
+        b = a.replace('line50', 'line fifty')
+        a_lines, b_lines, opcodes = diff_lines_with_similarities(a=a, b=b, cutoff=0.75)
+        printer = cli_vis.LineDiffConsolePrinter(a=a_lines, b=b_lines, seq=opcodes,
+                                                 characters=cli_vis.ascii_console_characters,
+                                                 colors=cli_vis.console_colors_fore, line_margin=3, equal_context=2)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            printer.print()
+        lines = output.getvalue().splitlines()
+        # fold, 2 context lines, replaced line, 2 context lines, fold, trailing style reset line
+        self.assertEqual(8, len(lines))
+        self.assertIn('line48', lines[1])
+        self.assertIn('line52', lines[5])
+
+    def test_bytes_diff_print(self):
+        a = b'w11111\ncaf\xe9 latin\nw33333'
+        b = b'w11111\ncaf\xc3\xa9 latin\nw33333'
+        a_lines, b_lines, opcodes = diff_lines_with_similarities(a=a, b=b, cutoff=0.75)
+        printer = cli_vis.LineDiffConsolePrinter(a=a_lines, b=b_lines, seq=opcodes,
+                                                 characters=cli_vis.ascii_console_characters,
+                                                 colors=cli_vis.console_colors_fore, line_margin=3, equal_context=-1)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            printer.print()
+        # undecodable bytes are replaced, valid UTF-8 is decoded
+        self.assertIn('caf� latin', output.getvalue())
+        self.assertIn('café latin', output.getvalue())
+        self.assertNotIn("b'", output.getvalue())
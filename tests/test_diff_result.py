@@ -0,0 +1,143 @@
+import unittest
+
+from mdiff import diff_lines_with_similarities, HeckelSequenceMatcher
+from mdiff.utils import OpCode, LazyCompositeOpCode
+from mdiff.visualisation.gui_tkinter.diff_result import TaggedTextBuffer, VirtualDiffView
+
+
+class FakeText:
+    """Records calls made on tkinter Text widget."""
+
+    def __init__(self):
+        self.inserted = []
+        self.tags = []
+
+    def insert(self, index, chars, *args):
+        self.inserted.append((index, chars))
+
+    def tag_add(self, tag_name, index1, *args):
+        self.tags.append((tag_name, index1, *args))
+
+
+class TestTaggedTextBuffer(unittest.TestCase):
+
+    def test_contiguous_tag_runs_are_merged(self):
+        buffer = TaggedTextBuffer()
+        buffer.append('line1\n', 'EQUAL')
+        buffer.append('line2\n', 'EQUAL')
+        buffer.append('li', 'IL_EQUAL')
+        buffer.append('ne3\n', 'IL_REPLACE')
+        buffer.append('\n', None)
+        buffer.append('line5\n', 'EQUAL')
+
+        self.assertEqual('line1\nline2\nline3\n\nline5\n', buffer.get_text())
+        expected_ranges = {
+            'EQUAL': [('1.0', '3.0'), ('5.0', '6.0')],
+            'IL_EQUAL': [('3.0', '3.2')],
+            'IL_REPLACE': [('3.2', '4.0')]
+        }
+        self.assertEqual(expected_ranges, buffer.ranges)
+
+    def test_single_insert_call(self):
+        buffer = TaggedTextBuffer()
+        for i in range(100):
+            buffer.append(f'line{i}\n', 'DELETE' if i % 10 else 'INSERT')
+        text = FakeText()
+        buffer.insert_into(text)
+        self.assertEqual(1, len(text.inserted))
+        self.assertEqual(20, len(text.tags))
+        self.assertEqual(('INSERT', '1.0', '2.0'), text.tags[0])
+
+    def test_empty_chunks_are_skipped(self):
+        buffer = TaggedTextBuffer()
+        buffer.append('', 'INSERT')
+        buffer.append('a', 'DELETE')
+        buffer.append('', 'INSERT')
+        buffer.append('b', 'DELETE')
+        self.assertEqual({'DELETE': [('1.0', '1.2')]}, buffer.ranges)
+
+
+class FakeScrollbar:
+    def __init__(self):
+        self.position = None
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+
+class FakeResultText(FakeText):
+    """Records content rendered into ResultText widget."""
+
+    def __init__(self):
+        super().__init__()
+        self.vbar = FakeScrollbar()
+        self.top = None
+
+    def configure(self, **kwargs):
+        pass
+
+    def delete(self, index1, index2=None):
+        self.inserted.clear()
+        self.tags.clear()
+
+    def yview(self, *args):
+        self.top = args[0]
+
+    def content(self):
+        return ''.join(chars for _, chars in self.inserted)
+
+
+class FixedHeightVirtualDiffView(VirtualDiffView):
+    def visible_rows(self) -> int:
+        return 10
+
+
+class TestVirtualDiffView(unittest.TestCase):
+
+    def test_render_only_rows_window(self):
+        a = '\n'.join(f'line{i}' for i in range(1000))
+        b = '\n'.join(f'line{i}' if i % 100 else f'changed line{i}' for i in range(1000))
+        a_lines, b_lines, opcodes = diff_lines_with_similarities(a, b, cutoff=0.5, lazy_inline=True)
+        text_source, text_target = FakeResultText(), FakeResultText()
+        view = FixedHeightVirtualDiffView(text_source, text_target, margin=20)
+        view.set_diff(a_lines, b_lines, opcodes)
+        view.scroll_to(500)
+
+        self.assertEqual((480, 530), (view.window_start, view.window_stop))
+        self.assertEqual('21.0', text_source.top)
+        self.assertEqual((0.5, 0.51), text_source.vbar.position)
+        self.assertTrue(text_source.content().startswith('line480\n'))
+        self.assertEqual(50, text_target.content().count('\n'))
+        # in-line diff generated only for rendered similar lines
+        rendered = [op for op in opcodes if isinstance(op, LazyCompositeOpCode) and op._children_opcodes is not None]
+        self.assertEqual([500], [op.i1 for op in rendered])
+
+    def test_scroll_within_window_does_not_render(self):
+        a_lines = [f'line{i}' for i in range(100)]
+        text_source, text_target = FakeResultText(), FakeResultText()
+        view = FixedHeightVirtualDiffView(text_source, text_target, margin=20)
+        view.set_diff(a_lines, a_lines, [OpCode('equal', 0, 100, 0, 100)])
+        view.render()
+        view.yview('scroll', '1', 'pages')
+        self.assertEqual(10, view.first_row)
+        self.assertEqual((0, 30), (view.window_start, view.window_stop))
+        self.assertEqual('11.0', text_target.top)
+        view.yview('moveto', '0.9')
+        self.assertEqual(90, view.first_row)
+        self.assertEqual((70, 100), (view.window_start, view.window_stop))
+
+    def test_changes_navigation(self):
+        a_lines = [f'line{i}' for i in range(100)]
+        b_lines = a_lines[:40] + ['new line'] + a_lines[40:80] + a_lines[81:]
+        text_source, text_target = FakeResultText(), FakeResultText()
+        view = FixedHeightVirtualDiffView(text_source, text_target, margin=20)
+        view.set_diff(a_lines, b_lines, HeckelSequenceMatcher(a_lines, b_lines).get_opcodes())
+        view.render()
+        view.next_change()
+        self.assertEqual(40, view.first_row)
+        view.next_change()
+        self.assertEqual(81, view.first_row)
+        view.next_change()
+        self.assertEqual(81, view.first_row)
+        view.prev_change()
+        self.assertEqual(40, view.first_row)
@@ -0,0 +1,114 @@
+import random
+import unittest
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff import diffstat, diffstat_files, DiffSummary, diff_lines_with_similarities, HeckelSequenceMatcher, \
+    MyersSequenceMatcher
+from mdiff.cli import cli_diff
+from mdiff.utils import read_file, OpCode
+from tests.utils import TempDirTestCase
+
+runner = CliRunner()
+
+
+class TestDiffSummary(unittest.TestCase):
+
+    def test_count(self):
+        opcodes = [OpCode('equal', 0, 2, 0, 2), OpCode('move', 2, 4, 5, 5), OpCode('insert', 4, 4, 2, 3),
+                   OpCode('replace', 4, 5, 3, 5), OpCode('moved', 6, 6, 5, 7), OpCode('delete', 5, 8, 7, 7)]
+        summary = DiffSummary().count(iter(opcodes))
+        self.assertEqual(DiffSummary(equal=2, inserted=1, deleted=3, moved=2, replaced_source=1, replaced_target=2,
+                                     blocks=Counter({'equal': 1, 'move': 1, 'insert': 1, 'replace': 1, 'moved': 1,
+                                                     'delete': 1})),
+                         summary)
+        self.assertTrue(summary)
+        self.assertFalse(DiffSummary().count([OpCode('equal', 0, 2, 0, 2)]))
+
+    def test_format(self):
+        report = DiffSummary(equal=2, replaced_source=1, replaced_target=3, blocks=Counter({'equal': 1})).format()
+        self.assertIn('Replaced lines: 1 -> 3', report)
+        self.assertIn('Blocks: equal 1', report)
+
+
+class TestDiffstat(unittest.TestCase):
+
+    def setUp(self):
+        self.a = read_file(Path('tests/resources/compares/comp2/a.txt'))
+        self.b = read_file(Path('tests/resources/compares/comp2/b.txt'))
+
+    def test_summary_of_diff(self):
+        """Summary is the same as summary of the whole diff"""
+        for cutoff in (1.0, 0.75, 0.5):
+            for line_sm in (HeckelSequenceMatcher(), MyersSequenceMatcher()):
+                with self.subTest(cutoff=cutoff, line_sm=line_sm):
+                    _, _, opcodes = diff_lines_with_similarities(self.a, self.b, cutoff=cutoff, line_sm=line_sm)
+                    self.assertEqual(DiffSummary().count(opcodes),
+                                     diffstat(self.a, self.b, cutoff=cutoff, line_sm=line_sm))
+
+    def test_similar_lines(self):
+        summary = diffstat('aa1\nbb2\ncc3', 'aa1\ncc2', cutoff=0.6)
+        self.assertEqual((1, 1, 0, 0), (summary.similar, summary.deleted, summary.replaced_source,
+                                        summary.replaced_target))
+
+    def test_inline_opcodes_are_not_generated(self):
+        with mock.patch('mdiff.text_diff.inline_opcodes') as inline_opcodes:
+            diffstat(self.a, self.b, cutoff=0.5)
+        inline_opcodes.assert_not_called()
+
+    def test_moves_and_case(self):
+        lines = [f'line {i}' for i in range(100)]
+        b = lines[50:] + lines[:50]
+        summary = diffstat('\n'.join(lines), '\n'.join(b).upper(), case_sensitive=False)
+        self.assertEqual((50, 50, 2), (summary.equal, summary.moved, summary.blocks['move'] + summary.blocks['moved']))
+
+    def test_cutoff(self):
+        with self.assertRaises(ValueError):
+            diffstat('a', 'b', cutoff=1.5)
+
+
+class TestDiffstatFiles(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        rnd = random.Random(0)
+        lines = sorted(f'row {rnd.randint(0, 1000):04}' for _ in range(500))
+        changed = list(lines)
+        for _ in range(20):
+            changed[rnd.randrange(len(changed))] = f'row {rnd.randint(0, 1000):04}'
+        changed.sort()
+        self.a = self.write('a.txt', '\n'.join(lines))
+        self.b = self.write('b.txt', '\n'.join(changed))
+        self.a_copy = self.write('c.txt', '\n'.join(lines))
+
+    def test_diffstat_files(self):
+        self.assertEqual(diffstat(read_file(self.a), read_file(self.b)), diffstat_files(self.a, self.b))
+
+    def test_identical_files(self):
+        with mock.patch('mdiff.diffstat.session_diffstat') as session_diffstat:
+            summary = diffstat_files(self.a, self.a_copy)
+        session_diffstat.assert_not_called()
+        self.assertEqual(DiffSummary(equal=500, blocks=Counter({'equal': 1})), summary)
+        self.assertEqual(DiffSummary(), diffstat_files(self.write('e1.txt', ''), self.write('e2.txt', '')))
+
+    def test_cli(self):
+        app = typer.Typer()
+        app.command()(cli_diff)
+        expected = diffstat_files(self.a, self.b).format()
+        for options in ([], ['--assume-sorted'], ['--sort', 'yes'], ['--bytes']):
+            with self.subTest(options=options):
+                result = runner.invoke(app, [str(self.a), str(self.b), '--stat'] + options)
+                self.assertEqual(0, result.exit_code)
+                summary = result.stdout.splitlines()
+                self.assertEqual(expected.splitlines()[:2], summary[:2])
+        result = runner.invoke(app, [str(self.a), str(self.b), '--stat', '--multiset'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('Moved lines: 0', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
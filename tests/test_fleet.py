@@ -0,0 +1,154 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff import fleet_drift, fleet_drift_files, HeckelSequenceMatcher, MyersSequenceMatcher
+from mdiff.cli import cli_fleet
+from mdiff.differ import FleetConsoleDiffer
+from mdiff.fleet import SymbolTable
+from mdiff.utils import OpCode
+from tests.utils import TempDirTestCase
+
+runner = CliRunner()
+
+
+class TestSymbolTable(unittest.TestCase):
+
+    def test_intern(self):
+        table = SymbolTable()
+        self.assertEqual([0, 1, 0], table.intern(['a', 'b', 'a']))
+        self.assertEqual([1, 2], table.intern(['b', 'c']))
+        self.assertEqual(['a', 'b', 'c'], table.lines)
+        table = SymbolTable(case_sensitive=False)
+        self.assertEqual([0, 0, 1], table.intern(['a', 'A', 'b']))
+        self.assertEqual(['a', 'b'], table.lines)
+
+
+class TestFleetDrift(unittest.TestCase):
+
+    def setUp(self):
+        self.baseline = [f'line {i}' for i in range(10)]
+        drifted = self.baseline[:3] + self.baseline[4:] + ['extra']
+        self.hosts = {
+            'h1': list(self.baseline),
+            'h2': drifted,
+            'h3': list(self.baseline),
+            'h4': list(drifted),
+            'h5': self.baseline[1:],
+        }
+
+    def test_deviations(self):
+        drift = fleet_drift(self.baseline, self.hosts)
+        self.assertEqual(['h1', 'h2', 'h3', 'h4', 'h5'], drift.hosts)
+        self.assertEqual([(0, ['h5']), (3, ['h2', 'h4'])], drift.line_deviations())
+        self.assertEqual(0b01010, drift.deviation_bitmap(3))
+        self.assertEqual([], drift.deviating_hosts(5))
+        # presence bitmap of line missing in baseline
+        self.assertEqual(0b01010, drift.presence[drift.table.symbols['extra']])
+
+    def test_groups(self):
+        drift = fleet_drift(self.baseline, self.hosts)
+        self.assertEqual([(['h1', 'h3'], [], []), (['h2', 'h4'], [3], ['extra']), (['h5'], [0], [])],
+                         [(group.hosts, group.missing, group.extra) for group in drift.groups])
+        for group in drift.groups:
+            self.assertEqual([group.hosts], [variant.hosts for variant in group.variants])
+            variant = group.variants[0]
+            expected = HeckelSequenceMatcher().compute(self.baseline, self.hosts[variant.representative])
+            self.assertEqual(expected, variant.opcodes)
+            self.assertEqual(self.hosts[variant.representative], drift.host_lines(variant.representative))
+
+    def test_diff_only_representatives(self):
+        line_sm = HeckelSequenceMatcher()
+        with mock.patch.object(line_sm, 'get_opcodes', wraps=line_sm.get_opcodes) as get_opcodes:
+            fleet_drift(self.baseline, self.hosts, line_sm=line_sm)
+        # hosts identical to baseline aren't diffed
+        self.assertEqual(2, get_opcodes.call_count)
+
+    def test_order_and_repetitions(self):
+        # signature is a pair of sets, so reordered hosts belong to the same group, but to different variants
+        drift = fleet_drift(['a', 'b', 'c'], {'h1': ['a', 'b', 'c'], 'h2': ['c', 'b', 'a', 'a'], 'h3': ['a', 'b', 'c'],
+                                              'h4': ['c', 'b', 'a', 'a']}, line_sm=MyersSequenceMatcher())
+        self.assertEqual([(['h1', 'h2', 'h3', 'h4'], [], [])],
+                         [(group.hosts, group.missing, group.extra) for group in drift.groups])
+        variants = drift.groups[0].variants
+        self.assertEqual([['h1', 'h3'], ['h2', 'h4']], [variant.hosts for variant in variants])
+        self.assertEqual([OpCode('equal', 0, 3, 0, 3)], variants[0].opcodes)
+        self.assertEqual(MyersSequenceMatcher(list('abc'), list('cbaa')).get_opcodes(), variants[1].opcodes)
+        self.assertNotEqual(['equal'], [i.tag for i in variants[1].opcodes])
+
+        drift = fleet_drift(['a', 'b', 'c'], {'h1': ['b', 'a', 'x'], 'h2': ['a', 'b', 'x']})
+        self.assertEqual([(['h1', 'h2'], [2], ['x'])], [(group.hosts, group.missing, group.extra)
+                                                        for group in drift.groups])
+        self.assertEqual(2, len(drift.groups[0].variants))
+
+    def test_case_sensitive(self):
+        drift = fleet_drift(['a', 'B'], {'h1': ['A', 'b'], 'h2': ['a', 'B']}, case_sensitive=False)
+        self.assertEqual([['h1', 'h2']], [group.hosts for group in drift.groups])
+        self.assertEqual([], drift.line_deviations())
+
+    def test_empty(self):
+        drift = fleet_drift([], {'h1': [], 'h2': ['a']})
+        self.assertEqual([([], [], []), ([OpCode('insert', 0, 0, 0, 1)], [], ['a'])],
+                         [(group.variants[0].opcodes, group.missing, group.extra) for group in drift.groups])
+        self.assertEqual([], fleet_drift(['a'], {}).groups)
+
+
+class FleetFilesTestCase(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.baseline = self.write('baseline.conf', 'a\nb\nc\n')
+        self.hosts = [self.write('hosts/h1.conf', 'a\nb\nc\n'), self.write('hosts/h2.conf', 'a\nc\nx\n'),
+                      self.write('hosts/h3.conf', 'a\nc\nx\n')]
+
+
+class TestFleetFiles(FleetFilesTestCase):
+
+    def test_fleet_drift_files(self):
+        for binary in (False, True):
+            with self.subTest(binary=binary):
+                drift = fleet_drift_files(self.baseline, self.hosts, binary=binary)
+                self.assertEqual([str(p) for p in self.hosts], drift.hosts)
+                self.assertEqual([(1, [str(p) for p in self.hosts[1:]])], drift.line_deviations())
+                x = b'x' if binary else 'x'
+                self.assertEqual([[], [x]], [group.extra for group in drift.groups])
+
+    def test_console_differ(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            different = FleetConsoleDiffer(self.baseline, self.hosts, line_sm='heckel', case_sensitive=True,
+                                           color_mode='fore', character_mode='ascii').run()
+        self.assertTrue(different)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(f'Line 2 is missing on 2 of 3 hosts: {self.hosts[1]}, {self.hosts[2]}', lines[0])
+        self.assertEqual('  b', lines[1])
+        self.assertEqual(f'Group 1: 1 hosts: {self.hosts[0]}', lines[2])
+        self.assertEqual('No differences', lines[3])
+        self.assertEqual(f'Group 2: 2 hosts: {self.hosts[1]}, {self.hosts[2]}', lines[4])
+        self.assertIn('x', '\n'.join(lines[5:]))
+
+    def test_console_differ_variants(self):
+        self.write('hosts/h3.conf', 'x\nc\na\n')
+        output = io.StringIO()
+        with redirect_stdout(output):
+            FleetConsoleDiffer(self.baseline, self.hosts, line_sm='heckel', case_sensitive=True,
+                               color_mode='fore', character_mode='ascii').run()
+        lines = output.getvalue().splitlines()
+        self.assertIn(f'Group 2: 2 hosts: {self.hosts[1]}, {self.hosts[2]}', lines)
+        self.assertIn(f'Variant 2.1: 1 hosts: {self.hosts[1]}', lines)
+        self.assertIn(f'Variant 2.2: 1 hosts: {self.hosts[2]}', lines)
+
+    def test_cli(self):
+        app = typer.Typer()
+        app.command()(cli_fleet)
+        result = runner.invoke(app, [str(self.baseline), str(self.tmp_path / 'hosts'), '--char-mode', 'ascii'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn(f'Group 2: 2 hosts: {self.hosts[1]}, {self.hosts[2]}', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
+import random
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from mdiff import DisplacementSequenceMatcher
-from mdiff.seqmatch.heckel import HeckelSequenceMatcher
+from mdiff.seqmatch.heckel import HeckelSequenceMatcher, DisplacementAlgorithm
 from mdiff.utils import OpCode, read_file
 
 
@@ -210,3 +212,77 @@ class TestDisplacementSequenceMatcher(unittest.TestCase):
                             OpCode('moved', 5, 5, 1, 2), OpCode('equal', 3, 4, 2, 3), OpCode('insert', 4, 4, 3, 4),
                             OpCode('equal', 4, 5, 4, 5), OpCode('move', 5, 6, 1, 1), OpCode('replace', 6, 7, 5, 7)]
         self.assertEqual(expected_opcodes, opcodes)
+
+    def test_occurrence_matching(self):
+        # k-th occurrence of element in "a" is matched with k-th occurrence of the same element in "b"
+        rnd = random.Random(0)
+        for _ in range(200):
+            a = [rnd.choice(['', '}', '{', rnd.randint(0, 5)]) for _ in range(rnd.randint(0, 40))]
+            b = [rnd.choice(['', '}', '{', rnd.randint(0, 5)]) for _ in range(rnd.randint(0, 40))]
+            alg = DisplacementAlgorithm(a, b)
+            alg.run()
+            expected_na = []
+            for idx, i in enumerate(a):
+                k = a[:idx].count(i)
+                occurrences = [j for j, v in enumerate(b) if v == i]
+                expected_na.append(occurrences[k] if k < len(occurrences) else None)
+            with self.subTest(a=a, b=b):
+                self.assertEqual(expected_na, [i if isinstance(i, int) else None for i in alg.na])
+                self.assertEqual(len(b), len(alg.oa))
+                for j, i in enumerate(alg.oa):
+                    if isinstance(i, int):
+                        self.assertEqual(j, alg.na[i])
+
+    def test_duplicated_elements(self):
+        a = ['{', '', '}', '{', 'x', '}', '']
+        b = ['{', 'x', '}', '', '{', '}']
+        opcodes = DisplacementSequenceMatcher(a, b).get_opcodes()
+        expected_opcodes = [OpCode('equal', 0, 1, 0, 1), OpCode('move', 1, 2, 3, 3), OpCode('moved', 4, 4, 1, 2),
+                            OpCode('equal', 2, 3, 2, 3), OpCode('moved', 1, 1, 3, 4), OpCode('equal', 3, 4, 4, 5),
+                            OpCode('move', 4, 5, 1, 1), OpCode('equal', 5, 6, 5, 6), OpCode('delete', 6, 7, 6, 6)]
+        self.assertEqual(expected_opcodes, opcodes)
+
+
+class TestConcurrentCompute(unittest.TestCase):
+
+    @staticmethod
+    def random_pairs(n, seed=0):
+        rnd = random.Random(seed)
+        pairs = []
+        for _ in range(n):
+            a = [rnd.randint(0, 20) for _ in range(rnd.randint(0, 200))]
+            b = a[:]
+            for _ in range(rnd.randint(0, 20)):
+                op = rnd.randint(0, 2)
+                pos = rnd.randint(0, len(b))
+                if op == 0:
+                    b.insert(pos, rnd.randint(0, 30))
+                elif op == 1 and b:
+                    del b[min(pos, len(b) - 1)]
+                else:
+                    b[pos:pos] = b[:rnd.randint(0, 5)]
+            pairs.append((a, b))
+        return pairs
+
+    def check_concurrent_compute(self, sm_class):
+        pairs = self.random_pairs(200)
+        expected = [sm_class(a, b).get_opcodes() for a, b in pairs]
+        sm = sm_class()
+        self.assertEqual(expected, [sm.compute(a, b) for a, b in pairs])
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for _ in range(3):
+                result = list(executor.map(lambda pair: sm.compute(*pair), pairs))
+                self.assertEqual(expected, result)
+
+    def test_heckel_concurrent_compute(self):
+        self.check_concurrent_compute(HeckelSequenceMatcher)
+
+    def test_displacement_concurrent_compute(self):
+        self.check_concurrent_compute(DisplacementSequenceMatcher)
+
+    def test_compute_does_not_modify_matcher_state(self):
+        sm = HeckelSequenceMatcher([1, 2], [2, 1])
+        sm.compute([1, 2, 3], [3, 4])
+        self.assertEqual([1, 2], sm.a)
+        self.assertEqual([OpCode('move', 0, 1, 1, 1), OpCode('equal', 1, 2, 0, 1), OpCode('moved', 0, 0, 1, 2)],
+                         sm.get_opcodes())
@@ -0,0 +1,56 @@
+import unittest
+
+from mdiff.layout import DiffLayout
+from mdiff.seqmatch.heckel import HeckelSequenceMatcher
+from mdiff.utils import OpCode
+
+
+class TestDiffLayout(unittest.TestCase):
+
+    def setUp(self):
+        a = [1, 2, 3, 4, 5, 6, 7]
+        b = [1, 3, 2, 4, 8, 9, 6, 7]
+        self.opcodes = HeckelSequenceMatcher(a, b).get_opcodes()
+        # [equal(0,1,0,1), move(1,2,2,2), equal(2,3,1,2), moved(1,1,2,3), equal(3,4,3,4),
+        #  replace(4,5,4,6), equal(5,7,6,8)]
+        self.layout = DiffLayout(self.opcodes)
+
+    def test_rows(self):
+        rows = [self.layout.row(i) for i in range(len(self.layout))]
+        expected_rows = [(0, 0, 'equal'), (1, None, 'move'), (2, 1, 'equal'), (None, 2, 'moved'), (3, 3, 'equal'),
+                         (4, 4, 'replace'), (None, 5, 'replace'), (5, 6, 'equal'), (6, 7, 'equal')]
+        self.assertEqual(expected_rows, rows)
+
+    def test_line_to_opcode_lookup(self):
+        self.assertEqual(OpCode('replace', 4, 5, 4, 6), self.opcodes[self.layout.opcode_index_at_a(4)])
+        self.assertEqual(OpCode('moved', 1, 1, 2, 3), self.opcodes[self.layout.opcode_index_at_b(2)])
+        self.assertEqual(OpCode('equal', 5, 7, 6, 8), self.opcodes[self.layout.opcode_index_at_b(7)])
+        self.assertIsNone(self.layout.opcode_index_at_a(7))
+        self.assertEqual(1, self.layout.row_of_a(1))
+        self.assertEqual(6, self.layout.row_of_b(5))
+        self.assertEqual(8, self.layout.row_of_a(6))
+        self.assertEqual(OpCode('replace', 4, 5, 4, 6), self.layout.opcode_at_row(6))
+
+    def test_changes_navigation(self):
+        self.assertEqual([1, 3, 5], list(self.layout.change_rows))
+        self.assertEqual([2, 4, 7], list(self.layout.change_ends))
+        self.assertEqual(1, self.layout.next_change(0))
+        self.assertEqual(5, self.layout.next_change(3))
+        self.assertIsNone(self.layout.next_change(5))
+        self.assertEqual(3, self.layout.prev_change(5))
+        self.assertIsNone(self.layout.prev_change(1))
+
+    def test_context_ranges(self):
+        self.assertEqual([(1, 2), (3, 4), (5, 7)], self.layout.context_ranges(0))
+        self.assertEqual([(0, 8)], self.layout.context_ranges(1))
+
+    def test_iter_rows(self):
+        rows = [(row, opcode.tag, offset) for row, opcode, offset in self.layout.iter_rows(4, 8)]
+        expected_rows = [(4, 'equal', 0), (5, 'replace', 0), (6, 'replace', 1), (7, 'equal', 0)]
+        self.assertEqual(expected_rows, rows)
+
+    def test_empty_opcodes_are_skipped(self):
+        layout = DiffLayout([OpCode('equal', 0, 0, 0, 0), OpCode('insert', 0, 0, 0, 2)])
+        self.assertEqual(2, len(layout))
+        self.assertEqual(OpCode('insert', 0, 0, 0, 2), layout.opcode_at_row(0))
+        self.assertEqual([(0, 2)], layout.context_ranges(3))
@@ -0,0 +1,133 @@
+import unittest
+from unittest import mock
+
+from mdiff import merge3, MergeConflict, MyersSequenceMatcher, HeckelSequenceMatcher
+from mdiff.fleet import SymbolTable
+from mdiff.merge import BaseIndex, IndexedDisplacementAlgorithm
+from mdiff.seqmatch.heckel import DisplacementAlgorithm, HeckelOpCodeExtractor, _occurrences
+
+
+class TestIndexedDisplacementAlgorithm(unittest.TestCase):
+
+    def test_same_opcodes(self):
+        a = list('abcabdeffa')
+        b = list('fabxcadbe')
+        table = SymbolTable()
+        a_ids, b_ids = table.intern(a), table.intern(b)
+        alg = IndexedDisplacementAlgorithm(BaseIndex(a_ids, len(table)), b_ids)
+        alg.run()
+        expected = DisplacementAlgorithm(a_ids, b_ids)
+        expected.run()
+        self.assertEqual(HeckelOpCodeExtractor(expected).get_opcodes(), HeckelOpCodeExtractor(alg).get_opcodes())
+
+
+class TestMerge3(unittest.TestCase):
+
+    def setUp(self):
+        self.base = [f'line {i}' for i in range(10)]
+
+    def test_one_side(self):
+        changed = self.base[:2] + ['new'] + self.base[3:8] + self.base[9:]
+        self.assertEqual(changed, merge3(self.base, changed, self.base).lines())
+        self.assertEqual(changed, merge3(self.base, self.base, changed).lines())
+
+    def test_both_sides(self):
+        ours = ['first'] + self.base[:2] + ['ours'] + self.base[3:]
+        theirs = self.base[:7] + ['theirs'] + self.base[8:] + ['last']
+        result = merge3(self.base, ours, theirs)
+        self.assertEqual([], result.conflicts)
+        self.assertEqual(['first'] + self.base[:2] + ['ours'] + self.base[3:7] + ['theirs'] + self.base[8:] + ['last'],
+                         result.lines())
+
+    def test_identical_changes(self):
+        changed = self.base[:3] + ['new'] + self.base[5:]
+        result = merge3(self.base, changed, list(changed))
+        self.assertEqual([], result.conflicts)
+        self.assertEqual(changed, result.lines())
+
+    def test_edit_conflict(self):
+        ours = self.base[:3] + ['ours'] + self.base[4:]
+        theirs = self.base[:3] + ['theirs 1', 'theirs 2'] + self.base[5:]
+        result = merge3(self.base, ours, theirs)
+        self.assertEqual([MergeConflict(self.base[3:5], ['ours', 'line 4'], ['theirs 1', 'theirs 2'])],
+                         result.conflicts)
+        self.assertEqual(self.base[:3] + ['<<<<<<< ours', 'ours', 'line 4', '||||||| base', 'line 3', 'line 4',
+                                          '=======', 'theirs 1', 'theirs 2', '>>>>>>> theirs'] + self.base[5:],
+                         result.lines())
+        self.assertEqual('<<<<<<< a', result.lines(ours_name='a')[3])
+
+    def test_moved_and_edited(self):
+        # ours moves block of lines 2-4 to the end, theirs edits line 3 and inserts line after line 4
+        ours = self.base[:2] + self.base[5:] + self.base[2:5]
+        theirs = self.base[:3] + ['edited'] + self.base[4:5] + ['inserted'] + self.base[5:]
+        expected = self.base[:2] + self.base[5:] + ['line 2', 'edited', 'line 4', 'inserted']
+        self.assertEqual(expected, merge3(self.base, ours, theirs).lines())
+        self.assertEqual(expected, merge3(self.base, theirs, ours).lines())
+
+    def test_moves_of_both_sides(self):
+        ours = self.base[2:4] + self.base[:2] + self.base[4:]
+        theirs = self.base[:6] + self.base[8:] + self.base[6:8]
+        result = merge3(self.base, ours, theirs)
+        self.assertEqual([], result.conflicts)
+        self.assertEqual(self.base[2:4] + self.base[:2] + self.base[4:6] + self.base[8:] + self.base[6:8],
+                         result.lines())
+
+    def test_move_conflict(self):
+        ours = self.base[1:5] + self.base[:1] + self.base[5:]
+        theirs = self.base[1:] + self.base[:1]
+        result = merge3(self.base, ours, theirs)
+        self.assertEqual([MergeConflict(ours=['line 0'], kind='move'), MergeConflict(theirs=['line 0'], kind='move')],
+                         result.conflicts)
+        self.assertEqual(self.base[1:5] + [result.conflicts[0]] + self.base[5:] + [result.conflicts[1]],
+                         result.chunks)
+
+    def test_move_cycle(self):
+        # ours places line 1 after line 5, theirs places line 5 after line 1, so lines stay at base positions
+        ours = self.base[:1] + self.base[2:6] + self.base[1:2] + self.base[6:]
+        theirs = self.base[:2] + self.base[5:6] + self.base[2:5] + self.base[6:]
+        result = merge3(self.base, ours, theirs)
+        conflicts = [MergeConflict([line], [line], [line], 'move') for line in ('line 1', 'line 5')]
+        self.assertEqual(conflicts, result.conflicts)
+        self.assertEqual(self.base[:1] + conflicts[:1] + self.base[2:5] + conflicts[1:] + self.base[6:], result.chunks)
+
+    def test_texts(self):
+        result = merge3('a\nb\nc\n', 'b\nc\na\n', 'a\nB\nc\n')
+        self.assertEqual(['B', 'c', 'a'], result.lines())
+        result = merge3(b'a\nb\n', b'a\nc\n', b'a\nd\n')
+        self.assertEqual([b'a', b'<<<<<<< ours', b'c', b'||||||| base', b'b', b'=======', b'd', b'>>>>>>> theirs'],
+                         result.lines())
+
+    def test_empty(self):
+        self.assertEqual([], merge3([], [], []).chunks)
+        self.assertEqual(['x'], merge3([], ['x'], []).lines())
+        self.assertEqual([MergeConflict([], ['x'], ['y'])], merge3([], ['x'], ['y']).conflicts)
+        self.assertEqual([], merge3(['a'], [], []).lines())
+
+    def test_line_sm(self):
+        ours = self.base[:2] + ['ours'] + self.base[3:]
+        theirs = self.base[:8] + ['theirs'] + self.base[9:]
+        expected = self.base[:2] + ['ours'] + self.base[3:8] + ['theirs'] + self.base[9:]
+        for line_sm in (MyersSequenceMatcher(), HeckelSequenceMatcher()):
+            with self.subTest(line_sm=line_sm):
+                self.assertEqual(expected, merge3(self.base, ours, theirs, line_sm=line_sm).lines())
+
+    def test_line_sm_duplicated_lines(self):
+        # Heckel matcher reports blocks of duplicated lines as replaced by identical lines
+        line_sm = HeckelSequenceMatcher()
+        self.assertEqual([], merge3(['l1', 'l1'], [], ['l1', 'l1'], line_sm=line_sm).chunks)
+        self.assertEqual([], merge3(['l1', 'l1'], ['l1', 'l1'], [], line_sm=line_sm).chunks)
+        base = ['l1', 'l1', 'l2', 'l2']
+        result = merge3(base, ['l1', 'l1', 'l1', 'l2', 'l2'], ['l1', 'l1', 'l2', 'l2', 'l2'], line_sm=line_sm)
+        self.assertEqual([], result.conflicts)
+        self.assertEqual(['l1', 'l1', 'l1', 'l2', 'l2', 'l2'], result.lines())
+
+    def test_base_indexed_once(self):
+        ours = self.base[:2] + ['ours'] + self.base[3:]
+        with mock.patch('mdiff.merge._occurrences', wraps=_occurrences) as occurrences:
+            self.assertEqual(ours, merge3(self.base, ours, self.base).lines())
+        # base and both sides
+        self.assertEqual(3, occurrences.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import io
+import random
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from mdiff import SortedSequenceMatcher, HeckelSequenceMatcher
+from mdiff.differ import SortedFilesConsoleDiffer
+from mdiff.seqmatch.merge_join import is_sorted, merge_join, merge_join_opcodes, UnsortedSequenceError
+from mdiff.seqmatch.utils import seq_matcher_factory, SequenceMatcherName
+from mdiff.stats import collect_stats
+from mdiff.utils import OpCode
+from tests.utils import covered_indexes
+
+
+class TestMergeJoin(unittest.TestCase):
+
+    def test_is_sorted(self):
+        self.assertTrue(is_sorted([]))
+        self.assertTrue(is_sorted('aabc'))
+        self.assertFalse(is_sorted('aba'))
+        self.assertFalse(is_sorted(['a', 'B']))
+        self.assertTrue(is_sorted(['a', 'B'], key=str.lower))
+
+    def test_merge_join_rows(self):
+        self.assertEqual([('equal', 0, 0, 'a', 'a'), ('delete', 1, 1, 'a', None), ('insert', 2, 1, None, 'b'),
+                          ('equal', 2, 2, 'c', 'c')], list(merge_join('aac', 'abc')))
+        self.assertEqual([('insert', 0, 0, None, 'a')], list(merge_join('', 'a')))
+        self.assertEqual([('equal', 0, 0, 'A', 'a')], list(merge_join(['A'], ['a'], key=str.lower)))
+
+    def test_merge_join_of_iterators(self):
+        rows = list(merge_join(iter('abd'), iter('bcd')))
+        self.assertEqual(['delete', 'equal', 'insert', 'equal'], [row[0] for row in rows])
+
+    def test_unsorted_sequence(self):
+        with self.assertRaises(UnsortedSequenceError):
+            list(merge_join('ab', 'ba'))
+        with self.assertRaises(UnsortedSequenceError):
+            list(merge_join(iter('ba'), iter('ab')))
+
+    def test_opcodes(self):
+        self.assertEqual([OpCode('equal', 0, 1, 0, 1), OpCode('replace', 1, 3, 1, 2), OpCode('equal', 3, 4, 2, 3)],
+                         list(merge_join_opcodes('abdf', 'acf')))
+        self.assertEqual([OpCode('equal', 0, 1, 0, 1), OpCode('delete', 1, 3, 1, 1), OpCode('insert', 3, 3, 1, 2),
+                          OpCode('equal', 3, 4, 2, 3)],
+                         list(merge_join_opcodes('abdf', 'acf', replace_mode=False)))
+        self.assertEqual([], list(merge_join_opcodes('', '')))
+
+    def test_opcodes_cover_sequences(self):
+        rnd = random.Random(0)
+        for _ in range(300):
+            a = sorted(rnd.randint(0, 9) for _ in range(rnd.randint(0, 20)))
+            b = sorted(rnd.randint(0, 9) for _ in range(rnd.randint(0, 20)))
+            for replace_mode in (True, False):
+                opcodes = list(merge_join_opcodes(a, b, replace_mode))
+                with self.subTest(a=a, b=b, replace_mode=replace_mode):
+                    self.assertEqual((list(range(len(a))), list(range(len(b)))), covered_indexes(opcodes))
+                    matched = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal')
+                    common = sum(min(a.count(v), b.count(v)) for v in set(a))
+                    self.assertEqual(common, matched)
+                    for tag, i1, i2, j1, j2 in opcodes:
+                        if tag == 'equal':
+                            self.assertEqual(a[i1:i2], b[j1:j2])
+
+
+class TestSortedSequenceMatcher(unittest.TestCase):
+
+    def test_sorted_input(self):
+        with collect_stats() as stats:
+            opcodes = SortedSequenceMatcher('abdf', 'acf').get_opcodes()
+        self.assertEqual(list(merge_join_opcodes('abdf', 'acf')), opcodes)
+        self.assertIn('merge_join', stats.phase_times)
+
+    def test_unsorted_input_fallback(self):
+        a, b = 'abcde', 'cdeab'
+        self.assertEqual(HeckelSequenceMatcher(a, b).get_opcodes(), SortedSequenceMatcher(a, b).get_opcodes())
+
+    def test_factory(self):
+        self.assertIs(SortedSequenceMatcher, seq_matcher_factory(SequenceMatcherName.SORTED))
+
+
+class TestSortedFilesConsoleDiffer(unittest.TestCase):
+
+    def run_differ(self, a: str, b: str, case_sensitive=True):
+        with TemporaryDirectory() as tmp:
+            a_path = Path(tmp) / 'a.txt'
+            b_path = Path(tmp) / 'b.txt'
+            a_path.write_text(a)
+            b_path.write_text(b)
+            differ = SortedFilesConsoleDiffer(a_path, b_path, case_sensitive=case_sensitive,
+                                              color_mode='fore', character_mode='ascii')
+            output = io.StringIO()
+            with redirect_stdout(output):
+                result = differ.run()
+        return result, output.getvalue()
+
+    def test_streamed_diff(self):
+        result, output = self.run_differ('apple\nbanana\ncherry\n', 'apple\ncherry\nfig\n')
+        self.assertTrue(result)
+        for text in ('| 1 |apple', '| 2-|banana', '| 2 |cherry', '| 3+|fig'):
+            self.assertIn(text, output)
+
+    def test_case_insensitive(self):
+        result, output = self.run_differ('Apple\nbanana\n', 'apple\nBanana\n', case_sensitive=False)
+        self.assertTrue(result)
+        self.assertNotIn('-|', output)
+
+    def test_unsorted_files(self):
+        self.assertEqual((False, ''), self.run_differ('b\na\n', 'a\nb\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
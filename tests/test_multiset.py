@@ -0,0 +1,101 @@
+import io
+import random
+import unittest
+from collections import Counter
+from contextlib import redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from mdiff import MultisetSequenceMatcher, multiset_diff, multiset_diff_files
+from mdiff.seqmatch.multiset import MultisetDiff, multiset_positions, multiset_opcodes
+from mdiff.seqmatch.utils import seq_matcher_factory, SequenceMatcherName
+from mdiff.utils import OpCode
+from mdiff.visualisation.terminal import MultisetConsolePrinter, get_console_characters, get_console_colors
+from tests.utils import covered_indexes
+
+
+class TestMultisetDiff(unittest.TestCase):
+
+    def test_diff(self):
+        self.assertEqual(MultisetDiff(Counter({'a': 2}), Counter({'d': 1})), multiset_diff('abca', 'cbd'))
+        self.assertFalse(multiset_diff('abc', 'cab'))
+        self.assertTrue(multiset_diff('ab', 'abb'))
+
+    def test_positions(self):
+        self.assertEqual(([0, 3], [2]), multiset_positions('abca', 'cbd'))
+        self.assertEqual(([], []), multiset_positions('abc', 'cba'))
+
+    def test_opcodes(self):
+        self.assertEqual([OpCode('equal', 0, 3, 0, 3)], multiset_opcodes('abc', 'cab'))
+        self.assertEqual([OpCode('delete', 0, 1, 0, 0), OpCode('equal', 1, 3, 0, 2), OpCode('delete', 3, 4, 2, 2),
+                          OpCode('insert', 4, 4, 2, 3)], multiset_opcodes('abca', 'cbd', replace_mode=False))
+        self.assertEqual([OpCode('insert', 0, 0, 0, 2)], multiset_opcodes('', 'ab'))
+
+    def test_opcodes_report_multiset_difference(self):
+        rnd = random.Random(0)
+        for _ in range(300):
+            a = [rnd.randint(0, 6) for _ in range(rnd.randint(0, 20))]
+            b = [rnd.randint(0, 6) for _ in range(rnd.randint(0, 20))]
+            diff = multiset_diff(a, b)
+            for replace_mode in (True, False):
+                opcodes = multiset_opcodes(a, b, replace_mode)
+                with self.subTest(a=a, b=b, replace_mode=replace_mode):
+                    self.assertEqual((list(range(len(a))), list(range(len(b)))), covered_indexes(opcodes))
+                    removed = Counter(a[i] for tag, i1, i2, _, _ in opcodes if tag != 'equal' for i in range(i1, i2))
+                    added = Counter(b[j] for tag, _, _, j1, j2 in opcodes if tag != 'equal' for j in range(j1, j2))
+                    self.assertEqual(diff.removed, removed)
+                    self.assertEqual(diff.added, added)
+
+    def test_sequence_matcher(self):
+        a = ['root', 'alice', 'bob', 'bob', 'carol']
+        b = ['carol', 'root', 'dave', 'alice']
+        self.assertEqual(multiset_opcodes(a, b), MultisetSequenceMatcher(a, b).get_opcodes())
+        self.assertIs(MultisetSequenceMatcher, seq_matcher_factory(SequenceMatcherName.MULTISET))
+
+
+class TestMultisetDiffFiles(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        rnd = random.Random(0)
+        a = [f'user{rnd.randint(0, 500)}' for _ in range(2000)]
+        b = a[:1500] + [f'User{rnd.randint(0, 500)}' for _ in range(300)]
+        rnd.shuffle(b)
+        self.a = Path(self.tmp.name) / 'a.txt'
+        self.b = Path(self.tmp.name) / 'b.txt'
+        self.a.write_text('\n'.join(a) + '\n')
+        self.b.write_text('\n'.join(b) + '\n')
+        self.expected = multiset_diff(a, b)
+        self.expected_lowercase = multiset_diff(a, [line.lower() for line in b])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_partitioned_files(self):
+        for partitions in (None, 1, 7):
+            with self.subTest(partitions=partitions):
+                self.assertEqual(self.expected, multiset_diff_files(self.a, self.b, partitions=partitions))
+                self.assertEqual(self.expected_lowercase,
+                                 multiset_diff_files(self.a, self.b, partitions=partitions, lowercase=True))
+
+    def test_binary_files(self):
+        self.a.write_bytes(b'root\ncaf\xe9\nbob\n')
+        self.b.write_bytes(b'bob\nCAF\xe9\nroot\n')
+        self.assertEqual(MultisetDiff(Counter({b'caf\xe9': 1}), Counter({b'CAF\xe9': 1})),
+                         multiset_diff_files(self.a, self.b, binary=True))
+        for partitions in (None, 3):
+            self.assertFalse(multiset_diff_files(self.a, self.b, partitions=partitions, lowercase=True, binary=True))
+
+    def test_printer(self):
+        printer = MultisetConsolePrinter(MultisetDiff(Counter({'bob': 2}), Counter({'dave': 1})),
+                                         get_console_characters('ascii'), get_console_colors('fore'))
+        output = io.StringIO()
+        with redirect_stdout(output):
+            printer.print()
+        self.assertIn('- bob (x2)', output.getvalue())
+        self.assertIn('+ dave', output.getvalue())
+        self.assertNotIn('dave (x', output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
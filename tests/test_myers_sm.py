@@ -0,0 +1,146 @@
+import difflib
+import random
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from mdiff import MyersSequenceMatcher, diff_lines_with_similarities
+from mdiff.progress import CancellationToken, DiffCancelledException
+from mdiff.seqmatch.myers import myers_matching_runs
+from mdiff.seqmatch.utils import seq_matcher_factory, SequenceMatcherName
+from mdiff.stats import collect_stats
+from mdiff.utils import OpCode, intern_sequences
+from tests.utils import covered_indexes
+
+
+def lcs_length(a, b):
+    prev = [0] * (len(b) + 1)
+    for x in a:
+        curr = [0]
+        for j, y in enumerate(b):
+            curr.append(prev[j] + 1 if x == y else max(prev[j + 1], curr[j]))
+        prev = curr
+    return prev[-1]
+
+
+class TestMyersMatchingRuns(unittest.TestCase):
+
+    def test_paper_example(self):
+        runs = myers_matching_runs('abcabba', 'cbabac')
+        self.assertEqual(4, sum(length for _, _, length in runs))
+
+    def test_edge_cases(self):
+        self.assertEqual([], myers_matching_runs('', ''))
+        self.assertEqual([], myers_matching_runs('abc', ''))
+        self.assertEqual([], myers_matching_runs('', 'abc'))
+        self.assertEqual([(0, 0, 3)], myers_matching_runs('abc', 'abc'))
+        self.assertEqual([], myers_matching_runs('abc', 'xyz'))
+
+    def test_lcs_is_minimal(self):
+        rnd = random.Random(0)
+        for _ in range(500):
+            a = [rnd.randint(0, 4) for _ in range(rnd.randint(0, 25))]
+            b = [rnd.randint(0, 4) for _ in range(rnd.randint(0, 25))]
+            runs = myers_matching_runs(a, b)
+            with self.subTest(a=a, b=b):
+                self.assertEqual(lcs_length(a, b), sum(length for _, _, length in runs))
+                prev_i = prev_j = 0
+                for i, j, length in runs:
+                    self.assertEqual(a[i:i + length], b[j:j + length])
+                    self.assertGreaterEqual(i, prev_i)
+                    self.assertGreaterEqual(j, prev_j)
+                    prev_i, prev_j = i + length, j + length
+
+    def test_intern_sequences(self):
+        a_ids, b_ids, symbols = intern_sequences(['x', 'y', 'x'], ['y', 'z'])
+        self.assertEqual(([0, 1, 0], [1, 2], 3), (a_ids, b_ids, symbols))
+
+
+class TestMyersSequenceMatcher(unittest.TestCase):
+
+    def test_opcodes_without_moves(self):
+        a = 'a b c d e f'.split()
+        b = 'a x c d f g'.split()
+        opcodes = MyersSequenceMatcher(a, b, detect_moves=False).get_opcodes()
+        self.assertEqual([OpCode('equal', 0, 1, 0, 1), OpCode('replace', 1, 2, 1, 2), OpCode('equal', 2, 4, 2, 4),
+                          OpCode('delete', 4, 5, 4, 4), OpCode('equal', 5, 6, 4, 5), OpCode('insert', 6, 6, 5, 6)],
+                         opcodes)
+
+    def test_no_replace_mode(self):
+        opcodes = MyersSequenceMatcher('ab', 'xb', replace_mode=False, detect_moves=False).get_opcodes()
+        self.assertEqual([OpCode('delete', 0, 1, 0, 0), OpCode('insert', 1, 1, 0, 1), OpCode('equal', 1, 2, 1, 2)],
+                         opcodes)
+
+    def test_moves(self):
+        opcodes = MyersSequenceMatcher('abcde', 'cdeab').get_opcodes()
+        self.assertEqual([OpCode('move', 0, 2, 3, 3), OpCode('equal', 2, 5, 0, 3), OpCode('moved', 0, 0, 3, 5)],
+                         opcodes)
+        opcodes = MyersSequenceMatcher('abcde', 'cdeab', detect_moves=False).get_opcodes()
+        self.assertEqual([OpCode('delete', 0, 2, 0, 0), OpCode('equal', 2, 5, 0, 3), OpCode('insert', 5, 5, 3, 5)],
+                         opcodes)
+
+    def test_equal_lines_count_matches_difflib_for_unique_lines(self):
+        rnd = random.Random(1)
+        a = [f'line {i}' for i in range(300)]
+        b = list(a)
+        for _ in range(20):
+            b[rnd.randrange(len(b))] = f'changed {rnd.random()}'
+        del b[100:110]
+
+        def equal_lines(opcodes):
+            return sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal')
+
+        expected = equal_lines(difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes())
+        self.assertEqual(expected, equal_lines(MyersSequenceMatcher(a, b).get_opcodes()))
+
+    def test_opcodes_cover_sequences(self):
+        rnd = random.Random(2)
+        for _ in range(300):
+            a = [rnd.randint(0, 5) for _ in range(rnd.randint(0, 20))]
+            b = [rnd.randint(0, 5) for _ in range(rnd.randint(0, 20))]
+            for replace_mode in (True, False):
+                for detect_moves in (True, False):
+                    opcodes = MyersSequenceMatcher(a, b, replace_mode, detect_moves).get_opcodes()
+                    with self.subTest(a=a, b=b, replace_mode=replace_mode, detect_moves=detect_moves):
+                        self.assertEqual((list(range(len(a))), list(range(len(b)))), covered_indexes(opcodes))
+                        for tag, i1, i2, j1, j2 in opcodes:
+                            if tag == 'equal':
+                                self.assertEqual(a[i1:i2], b[j1:j2])
+                            elif tag == 'move':
+                                self.assertIn(OpCode('moved', i1, i1, j1, j1 + i2 - i1), opcodes)
+                                self.assertEqual(a[i1:i2], b[j1:j1 + i2 - i1])
+
+    def test_compute_thread_safety(self):
+        rnd = random.Random(3)
+        pairs = [([rnd.randint(0, 9) for _ in range(200)], [rnd.randint(0, 9) for _ in range(200)])
+                 for _ in range(8)]
+        sm = MyersSequenceMatcher()
+        expected = [MyersSequenceMatcher(a, b).get_opcodes() for a, b in pairs]
+        with ThreadPoolExecutor(4) as executor:
+            result = list(executor.map(lambda p: sm.compute(*p), pairs))
+        self.assertEqual(expected, result)
+
+    def test_stats_and_progress(self):
+        a = [f'line {i}' for i in range(50)]
+        b = a[:20] + ['x'] + a[25:]
+        progress = []
+        with collect_stats() as stats:
+            MyersSequenceMatcher(a, b).get_opcodes(progress=lambda *args: progress.append(args))
+        self.assertEqual(51, stats.symbol_table_size)
+        self.assertEqual(45, stats.lis_length)
+        self.assertIn('lcs', stats.phase_times)
+        self.assertIn('moves', stats.phase_times)
+        self.assertIn(('lcs', 96, 96), progress)
+
+    def test_cancellation(self):
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(DiffCancelledException):
+            MyersSequenceMatcher('abc', 'cab').get_opcodes(cancel=token)
+
+    def test_factory_and_text_diff(self):
+        self.assertIs(MyersSequenceMatcher, seq_matcher_factory(SequenceMatcherName.MYERS))
+        _, _, opcodes = diff_lines_with_similarities('aa1\nbb2\ncc3', 'aa1\ncc2', cutoff=0.6,
+                                                     line_sm=MyersSequenceMatcher())
+        self.assertEqual([OpCode('equal', 0, 1, 0, 1), OpCode('delete', 1, 2, 1, 1), OpCode('replace', 2, 3, 1, 2)],
+                         opcodes)
+        self.assertEqual([OpCode('equal', 0, 2, 0, 2), OpCode('replace', 2, 3, 2, 3)], opcodes[2].children_opcodes)
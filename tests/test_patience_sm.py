@@ -0,0 +1,87 @@
+import random
+import unittest
+
+from mdiff import PatienceSequenceMatcher, HistogramSequenceMatcher
+from mdiff.seqmatch.patience import unique_anchors, patience_matches, histogram_matches, MAX_CHAIN_LENGTH
+from mdiff.seqmatch.utils import seq_matcher_factory, SequenceMatcherName
+from mdiff.utils import OpCode
+from tests.utils import covered_indexes
+
+SOURCE_A = '''def f():
+    return 1
+
+def g():
+    return 2
+'''.splitlines()
+
+SOURCE_B = '''def f():
+    return 1
+
+def h():
+    return 3
+
+def g():
+    return 2
+'''.splitlines()
+
+
+class TestAnchors(unittest.TestCase):
+
+    def test_unique_anchors(self):
+        self.assertEqual([(2, 0)], unique_anchors('abcab', 0, 5, 'cbxa', 0, 4))
+        self.assertEqual([(0, 3), (1, 2)], unique_anchors('abcab', 0, 2, 'xcba', 0, 4))
+        self.assertEqual([], unique_anchors('aa', 0, 2, 'aa', 0, 2))
+
+    def test_patience_matches(self):
+        self.assertEqual([(0, 1, 1), (1, 2, 1)], patience_matches('abc', 0, 3, 'cab', 0, 3))
+        self.assertIsNone(patience_matches('aab', 0, 3, 'bba', 0, 3))
+        # region without common elements is left unmatched
+        self.assertEqual([], patience_matches('aab', 0, 3, 'cdd', 0, 3))
+
+    def test_histogram_matches(self):
+        # the least frequent element run is preferred
+        self.assertEqual([(2, 0, 2)], histogram_matches('aabc', 0, 4, 'bcaa', 0, 4))
+        self.assertEqual([(2, 0, 1)], histogram_matches('aab', 0, 3, 'bba', 0, 3))
+        self.assertEqual([], histogram_matches('ab', 0, 2, 'cd', 0, 2))
+        # elements occurring more than MAX_CHAIN_LENGTH times are not used as anchors
+        a = 'a' * (MAX_CHAIN_LENGTH + 1)
+        self.assertIsNone(histogram_matches(a, 0, len(a), 'ba', 0, 2))
+        self.assertEqual([(0, 1, 1)], histogram_matches(a[1:], 0, len(a) - 1, 'ba', 0, 2))
+
+
+class TestPatienceAndHistogramSequenceMatchers(unittest.TestCase):
+    matchers = (PatienceSequenceMatcher, HistogramSequenceMatcher)
+
+    def test_source_code_insertion(self):
+        for sm_class in self.matchers:
+            with self.subTest(sm_class=sm_class):
+                opcodes = sm_class(SOURCE_A, SOURCE_B).get_opcodes()
+                self.assertEqual([OpCode('equal', 0, 3, 0, 3), OpCode('insert', 3, 3, 3, 6),
+                                  OpCode('equal', 3, 5, 6, 8)], opcodes)
+
+    def test_moves(self):
+        for sm_class in self.matchers:
+            with self.subTest(sm_class=sm_class):
+                opcodes = sm_class('abcde', 'cdeab').get_opcodes()
+                self.assertEqual([OpCode('move', 0, 2, 3, 3), OpCode('equal', 2, 5, 0, 3),
+                                  OpCode('moved', 0, 0, 3, 5)], opcodes)
+
+    def test_opcodes_cover_sequences(self):
+        rnd = random.Random(0)
+        for sm_class in self.matchers:
+            for _ in range(200):
+                a = [rnd.randint(0, 6) for _ in range(rnd.randint(0, 25))]
+                b = [rnd.randint(0, 6) for _ in range(rnd.randint(0, 25))]
+                for replace_mode in (True, False):
+                    for detect_moves in (True, False):
+                        opcodes = sm_class(a, b, replace_mode, detect_moves).get_opcodes()
+                        with self.subTest(sm_class=sm_class, a=a, b=b, replace_mode=replace_mode,
+                                          detect_moves=detect_moves):
+                            self.assertEqual((list(range(len(a))), list(range(len(b)))), covered_indexes(opcodes))
+                            for tag, i1, i2, j1, j2 in opcodes:
+                                if tag == 'equal':
+                                    self.assertEqual(a[i1:i2], b[j1:j2])
+
+    def test_factory(self):
+        self.assertIs(PatienceSequenceMatcher, seq_matcher_factory(SequenceMatcherName.PATIENCE))
+        self.assertIs(HistogramSequenceMatcher, seq_matcher_factory(SequenceMatcherName.HISTOGRAM))
@@ -0,0 +1,87 @@
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from mdiff import diff_lines_with_similarities
+from mdiff.profiling import DiffProfiler, profile_to, PROFILE_ENV_VARIABLE
+from mdiff.stats import collect_stats
+
+
+def slow_texts():
+    a = '\n'.join(f'line number {i} with some common words' for i in range(40))
+    b = '\n'.join(f'line number {i} with some common word' for i in range(40))
+    return a, b
+
+
+class TestDiffProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / 'out.prof'
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_profile_files(self):
+        profiler = DiffProfiler(self.path, interval=0.0005)
+        with profiler.profiling():
+            diff_lines_with_similarities(*slow_texts())
+
+        functions = {func for _, _, func in pstats.Stats(str(self.path)).stats}
+        self.assertIn('find_best_similar_match', functions)
+
+        collapsed = self.path.with_suffix('.collapsed').read_text().splitlines()
+        self.assertTrue(collapsed)
+        for line in collapsed:
+            stack, count = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('['))
+            self.assertGreater(int(count), 0)
+        self.assertTrue(any(i.startswith('[similarities];') for i in collapsed))
+
+    def test_nested_profiling_is_ignored(self):
+        outer = DiffProfiler(self.path)
+        inner = DiffProfiler(Path(self.tmp_dir.name) / 'inner.prof')
+        with outer.profiling():
+            with inner.profiling():
+                diff_lines_with_similarities('a\nb', 'b\na')
+        self.assertTrue(self.path.exists())
+        self.assertFalse((Path(self.tmp_dir.name) / 'inner.prof').exists())
+
+    def test_concurrent_profiling_is_ignored(self):
+        paths = [Path(self.tmp_dir.name) / f'{i}.prof' for i in range(4)]
+        barrier = threading.Barrier(len(paths))
+
+        def run(path: Path):
+            with profile_to(path):
+                # all threads are in profiled block at once
+                barrier.wait(timeout=10)
+
+        threads = [threading.Thread(target=run, args=(p,)) for p in paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, sum(p.exists() for p in paths))
+
+    def test_profiling_uses_collected_stats(self):
+        with collect_stats() as stats, profile_to(self.path):
+            diff_lines_with_similarities(*slow_texts())
+        self.assertIn('similarities', stats.phase_times)
+
+    def test_profile_from_env(self):
+        with mock.patch.dict(os.environ, {PROFILE_ENV_VARIABLE: str(self.path)}):
+            diff_lines_with_similarities('a\nb', 'b\na')
+        self.assertTrue(self.path.exists())
+        self.assertTrue(self.path.with_suffix('.collapsed').exists())
+        calls = sum(v[0] for (_, _, func), v in pstats.Stats(str(self.path)).stats.items() if func == '_diff')
+        self.assertEqual(1, calls)
+
+        # profiles with the same output path are accumulated
+        with mock.patch.dict(os.environ, {PROFILE_ENV_VARIABLE: str(self.path)}):
+            diff_lines_with_similarities('a\nb', 'b\na')
+        calls = sum(v[0] for (_, _, func), v in pstats.Stats(str(self.path)).stats.items() if func == '_diff')
+        self.assertEqual(2, calls)
@@ -0,0 +1,104 @@
+import io
+import random
+import unittest
+from unittest import mock
+
+from mdiff import HeckelSequenceMatcher, DisplacementSequenceMatcher, diff_lines_with_similarities
+from mdiff.progress import CancellationToken, DiffCancelledException, current_monitor
+from mdiff.text_diff import extract_similarities
+from mdiff.visualisation.terminal import ConsoleProgressBar
+
+
+def random_sequences(n, seed=0):
+    rnd = random.Random(seed)
+    a = [rnd.randint(0, n // 2) for _ in range(n)]
+    b = a[:]
+    rnd.shuffle(b)
+    b[n // 3: n // 2] = sorted(b[n // 3: n // 2])
+    return a, b
+
+
+class ProgressRecorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, phase, done, total):
+        self.calls.append((phase, done, total))
+
+    def phases(self):
+        return list(dict.fromkeys(i[0] for i in self.calls))
+
+
+@mock.patch('mdiff.progress.CHUNK_SIZE', 7)
+class TestProgress(unittest.TestCase):
+
+    def test_chunked_run_gives_the_same_result(self):
+        for sm_class in (HeckelSequenceMatcher, DisplacementSequenceMatcher):
+            for seed in range(5):
+                with self.subTest(sm=sm_class.__name__, seed=seed):
+                    a, b = random_sequences(100, seed)
+                    expected = sm_class(a, b).get_opcodes()
+                    recorder = ProgressRecorder()
+                    self.assertEqual(expected, sm_class(a, b).get_opcodes(progress=recorder))
+                    self.assertEqual(['symbol_table', 'anchors', 'lis', 'opcodes'], recorder.phases())
+
+    def test_progress_is_monotonic_and_complete(self):
+        a, b = random_sequences(100)
+        recorder = ProgressRecorder()
+        HeckelSequenceMatcher(a, b).get_opcodes(progress=recorder)
+        for phase in recorder.phases():
+            calls = [(done, total) for p, done, total in recorder.calls if p == phase]
+            self.assertEqual(sorted(calls), calls)
+            self.assertEqual(calls[-1][0], calls[-1][1])
+        self.assertIn(('symbol_table', 7, 200), recorder.calls)
+        self.assertIsNone(current_monitor())
+
+    def test_cancellation(self):
+        a, b = random_sequences(100)
+        token = CancellationToken()
+
+        def cancel_on_anchors(phase, done, total):
+            if phase == 'anchors':
+                token.cancel()
+
+        with self.assertRaises(DiffCancelledException):
+            HeckelSequenceMatcher(a, b).get_opcodes(progress=cancel_on_anchors, cancel=token)
+        with self.assertRaises(DiffCancelledException):
+            DisplacementSequenceMatcher().compute(a, b, cancel=token)
+
+    def test_diff_lines_with_similarities(self):
+        a = '\n'.join(f'line {i}' for i in range(50))
+        b = '\n'.join(f'line {i}x' for i in range(50))
+        recorder = ProgressRecorder()
+        expected = diff_lines_with_similarities(a, b, cutoff=0.5)
+        result = diff_lines_with_similarities(a, b, cutoff=0.5, inline_sm=HeckelSequenceMatcher(), progress=recorder)
+        self.assertEqual(expected, result)
+        self.assertEqual(['symbol_table', 'anchors', 'lis', 'opcodes', 'similarities'], recorder.phases())
+        # in-line diffs don't report progress
+        self.assertEqual(('similarities', 50, 50), recorder.calls[-1])
+
+        token = CancellationToken()
+        token.cancel()
+        with self.assertRaises(DiffCancelledException):
+            diff_lines_with_similarities(a, b, cutoff=0.5, cancel=token)
+
+    def test_extract_similarities(self):
+        a = [f'line {i}' for i in range(20)]
+        b = [f'line {i}x' for i in range(20)]
+        opcodes = HeckelSequenceMatcher(a, b).get_opcodes()
+        recorder = ProgressRecorder()
+        list(extract_similarities(opcodes, a, b, cutoff=0.5, progress=recorder))
+        self.assertEqual([('similarities', 0, 20), ('similarities', 20, 20)], recorder.calls)
+
+
+class TestConsoleProgressBar(unittest.TestCase):
+
+    def test_progress_bar(self):
+        stream = io.StringIO()
+        bar = ConsoleProgressBar(width=10, stream=stream, min_interval=60)
+        bar('anchors', 0, 4)
+        bar('anchors', 1, 4)  # throttled
+        bar('anchors', 4, 4)
+        self.assertEqual('\ranchors        [..........]   0%\ranchors        [##########] 100%', stream.getvalue())
+        bar.close()
+        self.assertTrue(stream.getvalue().endswith('\r'))
@@ -0,0 +1,103 @@
+import gzip
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff.cli import cli_diff
+from mdiff.differ import QuietFilesDiffer
+from mdiff.utils import files_identical
+from tests.utils import TempDirTestCase
+
+runner = CliRunner()
+
+
+class TestFilesIdentical(TempDirTestCase):
+
+    def test_files_identical(self):
+        a = self.write('a.txt', b'abc\n' * 1000)
+        self.assertTrue(files_identical(a, a))
+        self.assertTrue(files_identical(a, self.write('b.txt', b'abc\n' * 1000)))
+        self.assertFalse(files_identical(a, self.write('c.txt', b'abc\n' * 999)))
+        with mock.patch('mdiff.utils.READ_CHUNK_SIZE', 7):
+            self.assertFalse(files_identical(a, self.write('d.txt', b'abc\n' * 999 + b'abd\n')))
+
+    def test_stops_at_first_differing_chunk(self):
+        a = self.write('a.txt', b'x' + b'abc\n' * 1000)
+        b = self.write('b.txt', b'y' + b'abc\n' * 1000)
+        reads = []
+        real_open = open
+
+        def counting_open(*args, **kwargs):
+            file = real_open(*args, **kwargs)
+            file_read = file.read
+            file.read = lambda size: reads.append(size) or file_read(size)
+            return file
+
+        with mock.patch('mdiff.utils.READ_CHUNK_SIZE', 16), mock.patch('builtins.open', counting_open):
+            self.assertFalse(files_identical(a, b))
+        self.assertEqual(2, len(reads))
+
+
+class TestQuietFilesDiffer(TempDirTestCase):
+
+    def differ(self, a: bytes, b: bytes, **kwargs) -> bool:
+        return QuietFilesDiffer(self.write('a.txt', a), self.write('b.txt', b), **kwargs).run()
+
+    def test_lines_comparison(self):
+        self.assertFalse(self.differ(b'a\nb\n', b'a\nb\n', case_sensitive=True))
+        self.assertTrue(self.differ(b'a\nb\n', b'a\nc\n', case_sensitive=True))
+        self.assertTrue(self.differ(b'a\nb\n', b'a\nb\nc', case_sensitive=True))
+        # lines are compared, so line endings don't matter (the same way as they don't in diff)
+        self.assertFalse(self.differ(b'a\r\nb', b'a\nb\n', case_sensitive=True, binary=True))
+        self.assertFalse(self.differ(b'a\nB\n', b'A\nb\n', case_sensitive=False))
+        self.assertFalse(self.differ(b'a\n\xff\n', b'A\n\xff\n', case_sensitive=False, binary=True))
+
+    def test_compressed_files(self):
+        self.assertFalse(self.differ(gzip.compress(b'a\nb\n', 1), gzip.compress(b'a\nb\n', 9), case_sensitive=True))
+
+    def test_multiset_and_sort(self):
+        self.assertFalse(self.differ(b'a\nb\nb\n', b'b\na\nb\n', case_sensitive=True, multiset=True))
+        self.assertTrue(self.differ(b'a\nb\nb\n', b'b\na\n', case_sensitive=True, multiset=True))
+        self.assertFalse(self.differ(b'a\nb\nb\n', b'b\na\nB\n', case_sensitive=False, sort='yes'))
+        self.assertTrue(self.differ(b'a\nb\n', b'b\na\n', case_sensitive=True))
+
+
+class TestQuietCli(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = typer.Typer()
+        self.app.command()(cli_diff)
+
+    def invoke(self, a: Path, b: Path, *options: str):
+        return runner.invoke(self.app, [str(a), str(b), *options])
+
+    def test_exit_codes(self):
+        a = self.write('a.txt', b'a\nb\n')
+        b = self.write('b.txt', b'a\nc\n')
+        for option in ('--quiet', '--brief', '-q'):
+            with self.subTest(option=option):
+                result = self.invoke(a, a, option)
+                self.assertEqual((0, ''), (result.exit_code, result.stdout))
+                result = self.invoke(a, b, option)
+                self.assertEqual(1, result.exit_code)
+                self.assertEqual(f'Files {a} and {b} differ\n', result.stdout)
+        bad_gzip = self.write('c.txt', b'\x1f\x8b\x08broken')
+        self.assertEqual(2, self.invoke(a, bad_gzip, '--quiet').exit_code)
+        self.assertEqual(2, self.invoke(a, self.tmp_path / 'missing.txt', '--quiet').exit_code)
+
+    def test_identical_files_are_not_diffed(self):
+        a = self.write('a.txt', b'a\nb\n')
+        b = self.write('b.txt', b'a\nb\n')
+        with mock.patch('mdiff.cli.ConsoleTextDiffer') as differ:
+            result = self.invoke(a, b)
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual(f'Files {a} and {b} are identical\n', result.stdout)
+        differ.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from pathlib import Path
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff import diff_lines_with_similarities, HeckelSequenceMatcher, DisplacementSequenceMatcher
+from mdiff.cli import cli_diff
+from mdiff.stats import DiffStats, collect_stats, current_stats, suspended_stats
+from mdiff.utils import read_file
+
+
+class TestDiffStats(unittest.TestCase):
+
+    def setUp(self):
+        self.a = read_file(Path('tests/resources/compares/comp5/a.txt'))
+        self.b = read_file(Path('tests/resources/compares/comp5/b.txt'))
+
+    def test_stats_are_not_collected_by_default(self):
+        self.assertIsNone(current_stats())
+        with collect_stats() as stats:
+            self.assertIs(stats, current_stats())
+            with suspended_stats():
+                self.assertIsNone(current_stats())
+        self.assertIsNone(current_stats())
+
+    def test_collected_stats(self):
+        expected = diff_lines_with_similarities(self.a, self.b, cutoff=0.6)
+        with collect_stats() as stats:
+            result = diff_lines_with_similarities(self.a, self.b, cutoff=0.6, inline_sm=HeckelSequenceMatcher())
+        self.assertEqual(expected, result)
+
+        a_lines, b_lines, opcodes = result
+        self.assertEqual(len(set(a_lines) | set(b_lines)), stats.symbol_table_size)
+        self.assertEqual(len([i for i in set(a_lines) if a_lines.count(i) == b_lines.count(i) == 1]),
+                         stats.unique_anchors)
+        self.assertEqual(sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal'), stats.lis_length)
+        self.assertGreater(stats.ratio_calls, 0)
+        self.assertEqual(len(opcodes), stats.peak_opcodes)
+        self.assertEqual(['line_opcodes', 'line_opcodes/symbol_table', 'line_opcodes/anchors', 'line_opcodes/lis',
+                          'line_opcodes/opcodes', 'similarities', 'similarities/inline'], list(stats.phase_times))
+        self.assertGreaterEqual(stats.phase_times['similarities'], stats.phase_times['similarities/inline'])
+
+    def test_displacement_stats(self):
+        with collect_stats() as stats:
+            DisplacementSequenceMatcher('abcbd', 'dbcxa').get_opcodes()
+        self.assertEqual(5, stats.symbol_table_size)
+        self.assertEqual(3, stats.unique_anchors)
+
+    def test_stats_accumulate_into_passed_object(self):
+        stats = DiffStats()
+        for _ in range(2):
+            with collect_stats(stats):
+                diff_lines_with_similarities(self.a, self.b, cutoff=0.6)
+        with collect_stats() as single_run_stats:
+            diff_lines_with_similarities(self.a, self.b, cutoff=0.6)
+        self.assertEqual(2 * single_run_stats.ratio_calls, stats.ratio_calls)
+
+    def test_cli_stats(self):
+        app = typer.Typer()
+        app.command()(cli_diff)
+        runner = CliRunner(mix_stderr=False)
+        result = runner.invoke(app, ['tests/resources/compares/comp5/a.txt', 'tests/resources/compares/comp5/b.txt',
+                                     '--cutoff', '0.6', '--stats'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('Phase times:', result.stderr)
+        self.assertIn('render', result.stderr)
+        self.assertIn('ratio() calls:', result.stderr)
+        self.assertNotIn('Phase times:', result.stdout)
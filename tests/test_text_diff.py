@@ -1,25 +1,108 @@
 import unittest
-from difflib import SequenceMatcher
 from pathlib import Path
 
-from mdiff import diff_lines_with_similarities, HeckelSequenceMatcher
+from mdiff import diff_lines_with_similarities, HeckelSequenceMatcher, CompositeOpCode
 from mdiff.seqmatch.heckel import DisplacementSequenceMatcher
-from mdiff.utils import read_file
+from mdiff.text_diff import DiffSession
+from mdiff.utils import read_file, read_file_bytes
 
 
 class TestTextDiff(unittest.TestCase):
 
+    def assert_valid_diff(self, a_lines, b_lines, opcodes):
+        """Checks that opcodes cover every line exactly once and equal opcodes point to the same lines."""
+        a_covered = []
+        b_covered = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag != 'moved':
+                a_covered.extend(range(i1, i2))
+            if tag != 'move':
+                b_covered.extend(range(j1, j2))
+            if tag == 'equal':
+                self.assertEqual(a_lines[i1:i2], b_lines[j1:j2])
+        self.assertEqual(list(range(len(a_lines))), sorted(a_covered))
+        self.assertEqual(list(range(len(b_lines))), sorted(b_covered))
+        # similar lines are presented as single line replace opcodes with in-line diff
+        for opcode in opcodes:
+            if isinstance(opcode, CompositeOpCode) and opcode.children_opcodes:
+                self.assertEqual(('replace', 1, 1), (opcode.tag, opcode.i2 - opcode.i1, opcode.j2 - opcode.j1))
+                a_line, b_line = a_lines[opcode.i1], b_lines[opcode.j1]
+                self.assertEqual(len(a_line), max(i.i2 for i in opcode.children_opcodes))
+                self.assertEqual(len(b_line), max(i.j2 for i in opcode.children_opcodes))
+
     def test1(self):
         a = read_file(Path('tests/resources/compares/comp3/a.txt'))
         b = read_file(Path('tests/resources/compares/comp3/b.txt'))
         a_lines, b_lines, opcodes = diff_lines_with_similarities(a, b)
-        sm = SequenceMatcher(a=a_lines, b=b_lines)
-        hopcodes = sm.get_opcodes()
-        x = 1
+        self.assertEqual(a.splitlines(), a_lines)
+        self.assertEqual(b.splitlines(), b_lines)
+        self.assert_valid_diff(a_lines, b_lines, opcodes)
+        # 'qwerty' -> 'werty' is presented as similar lines
+        similar = [i for i in opcodes if isinstance(i, CompositeOpCode) and i.children_opcodes]
+        self.assertEqual([('qwerty', 'werty')], [(a_lines[i.i1], b_lines[i.j1]) for i in similar])
 
     def test2(self):
         a = read_file(Path('tests/resources/compares/comp5/a.txt'))
         b = read_file(Path('tests/resources/compares/comp5/b.txt'))
         a_lines, b_lines, opcodes = diff_lines_with_similarities(a, b)
-        sm = SequenceMatcher(a=a_lines, b=b_lines)
-        hopcodes = sm.get_opcodes()
\ No newline at end of file
+        self.assert_valid_diff(a_lines, b_lines, opcodes)
+        # with cutoff 1.0 there are no in-line diffs
+        _, _, opcodes = diff_lines_with_similarities(a, b, cutoff=1.0)
+        self.assert_valid_diff(a_lines, b_lines, opcodes)
+        self.assertFalse(any(isinstance(i, CompositeOpCode) and i.children_opcodes for i in opcodes))
+
+    def test_bytes(self):
+        a = read_file_bytes(Path('tests/resources/compares/comp3/a.txt'))
+        b = read_file_bytes(Path('tests/resources/compares/comp3/b.txt'))
+        a_lines, b_lines, opcodes = diff_lines_with_similarities(a, b)
+        self.assertEqual(a.splitlines(), a_lines)
+        self.assert_valid_diff(a_lines, b_lines, opcodes)
+        str_result = diff_lines_with_similarities(a.decode(), b.decode())
+        self.assertEqual(str_result[2], opcodes)
+        # memoryview buffers and undecodable bytes are compared the same way
+        a_lines, b_lines, opcodes = diff_lines_with_similarities(memoryview(b'caf\xe9\nx'),
+                                                                 bytearray(b'caf\xc3\xa9\nx'))
+        self.assertEqual([b'caf\xe9', b'x'], a_lines)
+        self.assert_valid_diff(a_lines, b_lines, opcodes)
+        self.assertEqual('replace', opcodes[0].tag)
+
+
+class CountingHeckelSequenceMatcher(HeckelSequenceMatcher):
+    calls = 0
+
+    def get_opcodes(self):
+        CountingHeckelSequenceMatcher.calls += 1
+        return super().get_opcodes()
+
+
+class TestDiffSession(unittest.TestCase):
+
+    def setUp(self):
+        self.a = read_file(Path('tests/resources/compares/comp2/a.txt'))
+        self.b = read_file(Path('tests/resources/compares/comp2/b.txt'))
+        CountingHeckelSequenceMatcher.calls = 0
+
+    def test_session_diff_equals_diff_lines_with_similarities(self):
+        session = DiffSession(self.a, self.b)
+        for cutoff in (0.5, 0.75, 1.0):
+            for case_sensitive in (True, False):
+                expected = diff_lines_with_similarities(self.a, self.b, cutoff=cutoff, case_sensitive=case_sensitive)
+                result = session.diff(cutoff=cutoff, case_sensitive=case_sensitive)
+                self.assertEqual(expected, result)
+                self.assertEqual([i.children_opcodes for i in expected[2] if isinstance(i, CompositeOpCode)],
+                                 [i.children_opcodes for i in result[2] if isinstance(i, CompositeOpCode)])
+
+    def test_line_opcodes_reused_across_cutoff_changes(self):
+        session = DiffSession(self.a, self.b)
+        for cutoff in (0.5, 0.6, 0.75, 0.9):
+            session.diff(cutoff=cutoff, line_sm=CountingHeckelSequenceMatcher())
+        self.assertEqual(1, CountingHeckelSequenceMatcher.calls)
+        session.diff(cutoff=0.5, line_sm=CountingHeckelSequenceMatcher(), case_sensitive=False)
+        self.assertEqual(2, CountingHeckelSequenceMatcher.calls)
+
+    def test_similarity_ratios_reused_across_cutoff_changes(self):
+        session = DiffSession(self.a, self.b)
+        session.diff(cutoff=0.5)
+        best_matches = dict(session._best_matches)
+        session.diff(cutoff=0.5, inline_sm=DisplacementSequenceMatcher())
+        self.assertEqual(best_matches, session._best_matches)
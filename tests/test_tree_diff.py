@@ -0,0 +1,152 @@
+import io
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+
+import typer
+from typer.testing import CliRunner
+
+from mdiff import diff_trees, TreeEntry
+from mdiff.cli import cli_diff
+from mdiff.differ import FileDiffOptions, TreeConsoleDiffer
+from mdiff.tree_diff import list_files, line_sketch, sketch_similarity, UNCHANGED, MODIFIED, ADDED, REMOVED, RENAMED
+from tests.utils import TempDirTestCase
+
+runner = CliRunner()
+
+
+class TreeTestCase(TempDirTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.a = self.tmp_path / 'a'
+        self.b = self.tmp_path / 'b'
+        self.a.mkdir()
+        self.b.mkdir()
+        lines = [f'line {i}' for i in range(100)]
+        similar = list(lines)
+        similar[10] = 'changed line'
+        self.write('a/same.txt', 'same\n')
+        self.write('b/same.txt', 'same\n')
+        self.write('a/dir/modified.txt', 'a\nb\n')
+        self.write('b/dir/modified.txt', 'a\nc\n')
+        self.write('a/removed.txt', 'removed\n')
+        self.write('b/new/added.txt', 'added\n')
+        self.write('a/old/moved.txt', 'moved content\n')
+        self.write('b/new/moved.txt', 'moved content\n')
+        self.write('b/new/copy.txt', 'moved content\n')
+        self.write('a/big.txt', '\n'.join(lines))
+        self.write('b/big2.txt', '\n'.join(similar))
+
+
+class TestDiffTrees(TreeTestCase):
+
+    def test_list_files(self):
+        self.assertEqual({'same.txt': 5, 'dir/modified.txt': 4, 'removed.txt': 8, 'old/moved.txt': 14,
+                          'big.txt': 789}, list_files(self.a))
+
+    def test_diff_trees(self):
+        entries = diff_trees(self.a, self.b)
+        similarity = entries[0].similarity
+        self.assertEqual([
+            TreeEntry(RENAMED, 'big.txt', 'big2.txt', similarity),
+            TreeEntry(MODIFIED, 'dir/modified.txt', 'dir/modified.txt'),
+            TreeEntry(ADDED, None, 'new/added.txt'),
+            TreeEntry(ADDED, None, 'new/copy.txt'),
+            # file with the same name is paired with identical moved file
+            TreeEntry(RENAMED, 'old/moved.txt', 'new/moved.txt'),
+            TreeEntry(REMOVED, 'removed.txt', None),
+            TreeEntry(UNCHANGED, 'same.txt', 'same.txt'),
+        ], entries)
+        self.assertTrue(0.9 < similarity < 1.0)
+
+    def test_min_similarity(self):
+        entries = diff_trees(self.a, self.b, min_similarity=1.1, workers=1)
+        self.assertIn(TreeEntry(REMOVED, 'big.txt', None), entries)
+        self.assertIn(TreeEntry(ADDED, None, 'big2.txt'), entries)
+        self.assertIn(TreeEntry(RENAMED, 'old/moved.txt', 'new/moved.txt'), entries)
+
+    def test_sketch_similarity(self):
+        self.write('a/c.txt', '\n'.join(f'line {i}' for i in range(1000)))
+        self.write('b/c.txt', '\n'.join(f'line {i}' for i in range(500)))
+        x = line_sketch(self.a / 'c.txt', size=64)
+        y = line_sketch(self.b / 'c.txt', size=64)
+        self.assertEqual(64, len(x))
+        self.assertEqual(1.0, sketch_similarity(x, x, size=64))
+        self.assertAlmostEqual(0.5, sketch_similarity(x, y, size=64), delta=0.2)
+        self.assertEqual(1.0, sketch_similarity([], []))
+
+
+class TestTreeConsoleDiffer(TreeTestCase):
+
+    def run_differ(self, **kwargs):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            different = TreeConsoleDiffer(self.a, self.b, FileDiffOptions(color_mode='fore'), **kwargs).run()
+        return different, output.getvalue()
+
+    def test_output_order(self):
+        different, output = self.run_differ(jobs=1)
+        self.assertTrue(different)
+        headers = [i for i in output.splitlines() if i.split(':')[0] in ('Added', 'Removed', 'Renamed', 'Modified')]
+        self.assertEqual(['Renamed: big.txt -> big2.txt (similarity 98%)',
+                          'Modified: dir/modified.txt',
+                          'Added: new/added.txt',
+                          'Added: new/copy.txt',
+                          'Renamed: old/moved.txt -> new/moved.txt',
+                          'Removed: removed.txt'], headers)
+        self.assertIn('changed line', output)
+        # diffs generated by worker processes are printed in the same order
+        self.assertEqual((different, output), self.run_differ(jobs=2))
+
+    def test_quiet(self):
+        different, output = self.run_differ(quiet=True)
+        self.assertTrue(different)
+        self.assertEqual(6, len(output.splitlines()))
+        self.assertFalse(TreeConsoleDiffer(self.a, self.a, FileDiffOptions(), quiet=True).run())
+
+    def test_binary_files(self):
+        self.write('a/dir/modified.txt', 'a\0b\n')
+        _, output = self.run_differ(jobs=1)
+        self.assertIn('Modified: dir/modified.txt\nBinary files differ\n', output)
+
+    def test_unreadable_file(self):
+        self.write('a/dir/modified.txt', b'caf\xe9\n')
+        for jobs in (1, 2):
+            with self.subTest(jobs=jobs):
+                output, errors = io.StringIO(), io.StringIO()
+                differ = TreeConsoleDiffer(self.a, self.b, FileDiffOptions(color_mode='fore'), jobs=jobs)
+                with redirect_stdout(output), redirect_stderr(errors):
+                    self.assertTrue(differ.run())
+                message = f"mdiff: {self.a / 'dir/modified.txt'}: 'utf-8' codec can't decode byte 0xe9"
+                self.assertEqual(1, len(differ.errors))
+                self.assertTrue(differ.errors[0].startswith(message))
+                self.assertEqual(differ.errors[0] + '\n', errors.getvalue())
+                # comparison continues with the next files
+                self.assertIn('Modified: dir/modified.txt\nAdded: new/added.txt', output.getvalue())
+                self.assertIn('changed line', output.getvalue())
+
+
+class TestTreeCli(TreeTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.app = typer.Typer()
+        self.app.command()(cli_diff)
+
+    def test_exit_codes(self):
+        result = runner.invoke(self.app, [str(self.a), str(self.b), '-j', '1'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('Modified: dir/modified.txt', result.stdout)
+        result = runner.invoke(self.app, [str(self.a), str(self.b), '--quiet'])
+        self.assertEqual(1, result.exit_code)
+        self.assertEqual(0, runner.invoke(self.app, [str(self.a), str(self.a), '--quiet']).exit_code)
+        self.assertEqual(2, runner.invoke(self.app, [str(self.a), str(self.b / 'same.txt')]).exit_code)
+        self.write('b/dir/modified.txt', b'caf\xe9\n')
+        result = runner.invoke(self.app, [str(self.a), str(self.b), '-j', '1'])
+        self.assertEqual(2, result.exit_code)
+        self.assertIn(f"mdiff: {self.b / 'dir/modified.txt'}: ", result.output)
+        self.assertIn('Removed: removed.txt', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
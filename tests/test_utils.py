@@ -1,8 +1,11 @@
 import unittest
 from enum import Enum
+from pathlib import Path
+from tempfile import TemporaryDirectory
 
 from mdiff.utils import CompositeDelegationMixin, sort_seq_by_other_seq, sort_seq_by_other_seq_indexes, \
-    sort_string_seq_by_other
+    sort_string_seq_by_other, sort_seq_by_other_seq_order, sort_lines, sort_text_lines, SortMode, split_lines, \
+    join_lines, decode_line, iter_file_lines
 
 
 class TestCompositeDelegationMixin(unittest.TestCase):
@@ -89,3 +92,49 @@ class TestSortSequenceByOther(unittest.TestCase):
         result = sort_string_seq_by_other(a, b, case_sensitive=False)
         expected = ['a', 'b', 'C', 'A']
         self.assertEqual(expected, result)
+
+    def test_sort_sequence_order(self):
+        self.assertEqual([], sort_seq_by_other_seq_order([], [1, 2]))
+        self.assertEqual([0, 1], sort_seq_by_other_seq_order([2, 1], []))
+        self.assertEqual([1, 2, 0, 3], sort_seq_by_other_seq_order(['F', 'E', 'D', 'E'], ['A', 'B', 'E', 'D']))
+        self.assertEqual([2, 0, 1], sort_seq_by_other_seq_order(['a', 'b', 'C'], ['c', 'A', 'B'], key=str.lower))
+        self.assertEqual([], sort_string_seq_by_other([], ['a']))
+
+    def test_sort_sequence_with_many_duplicates(self):
+        a = ['x'] * 100000 + ['y']
+        b = ['y'] + ['x'] * 100000
+        self.assertEqual(b, sort_seq_by_other_seq(a, b))
+
+    def test_sort_lines(self):
+        a = ['b', 'c', 'a']
+        b = ['c', 'B', 'd']
+        self.assertEqual((a, b), sort_lines(a, b, SortMode.NO))
+        self.assertEqual((['a', 'b', 'c'], ['B', 'c', 'd']), sort_lines(a, b, SortMode.YES))
+        self.assertEqual((a, ['B', 'c', 'd']), sort_lines(a, b, SortMode.BY_SOURCE, case_sensitive=False))
+        self.assertEqual((['c', 'b', 'a'], b), sort_lines(a, b, SortMode.BY_TARGET, case_sensitive=False))
+        self.assertEqual(('b\nc\na\n', 'B\nc\nd'), sort_text_lines('b\nc\na\n', 'c\nB\nd', 'by-source', False))
+
+
+class TestBytesLines(unittest.TestCase):
+
+    def test_split_and_join_lines(self):
+        self.assertEqual(['a', 'b'], split_lines('a\r\nb'))
+        self.assertEqual([b'a', b'\xff'], split_lines(b'a\n\xff'))
+        self.assertEqual([b'a', b'b'], split_lines(bytearray(b'a\nb')))
+        self.assertEqual([b'a\n', b'b'], split_lines(memoryview(b'a\nb'), keepends=True))
+        self.assertEqual(b'a\nb', join_lines([b'a', b'b'], b''))
+        self.assertEqual('a\nb', join_lines(['a', 'b'], ''))
+
+    def test_decode_line(self):
+        self.assertEqual('caf\ufffd', decode_line(b'caf\xe9'))
+        self.assertEqual('café', decode_line('café'))
+
+    def test_iter_file_lines_binary(self):
+        with TemporaryDirectory() as tmp:
+            p = Path(tmp) / 'a.txt'
+            p.write_bytes(b'a\r\n\xff\nlast')
+            self.assertEqual([b'a', b'\xff', b'last'], list(iter_file_lines(p, binary=True)))
+
+    def test_sort_bytes_lines(self):
+        self.assertEqual((b'a\nb\nc', b'B\nc\nd'), sort_text_lines(b'b\nc\na', b'c\nB\nd', 'yes', False))
+
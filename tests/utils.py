@@ -0,0 +1,33 @@
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Union
+
+
+def covered_indexes(opcodes):
+    a_idx = []
+    b_idx = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag in ('equal', 'delete', 'replace', 'move'):
+            a_idx.extend(range(i1, i2))
+        if tag in ('equal', 'insert', 'replace', 'moved'):
+            b_idx.extend(range(j1, j2))
+    return a_idx, b_idx
+
+
+class TempDirTestCase(unittest.TestCase):
+    """Test case with temporary directory (tmp_path) removed after every test."""
+
+    def setUp(self):
+        self.tmp = TemporaryDirectory()
+        self.tmp_path = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: Union[str, Path], data: Union[str, bytes]) -> Path:
+        """Writes text (UTF-8 encoded, without newline translation) or bytes into file of temporary directory."""
+        p = self.tmp_path / name
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(data.encode() if isinstance(data, str) else data)
+        return p